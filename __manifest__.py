@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'AI Chat Assistant',
-    'version': '1.0.0',
+    'version': '1.0.1',
     'category': 'Tools',
     'summary': 'Assistant de Chat IA pour Odoo avec support marketing multilingue',
     'description': """
@@ -30,15 +30,33 @@ Installation :
         'base',
         'web',
     ],
+    'external_dependencies': {
+        'python': ['numpy'],
+    },
     'data': [
         'security/ir.model.access.csv',
         'views/chatbot_views.xml',
         'views/chatbot_templates.xml',
+        'views/recommendation_rule_views.xml',
+        'views/chat_stage_views.xml',
+        'views/slow_turn_views.xml',
+        'views/message_archive_views.xml',
+        'views/knowledge_import_views.xml',
+        'views/knowledge_duplicate_views.xml',
+        'data/ir_cron_data.xml',
+        'data/recommendation_rules_data.xml',
         'data/demo_knowledge_base.xml',
         'data/fallback_database_entries.xml',
         'data/specific_responses_data.xml',
         'data/multilingual_responses_data.xml',
     ],
+    'assets': {
+        # Chargé à la demande par la bulle (voir views/chatbot_templates.xml)
+        'ai_chat_assistant.chat_widget': [
+            'ai_chat_assistant/static/src/css/chat_widget.css',
+            'ai_chat_assistant/static/src/js/chat_widget.js',
+        ],
+    },
     'installable': True,
     'application': True,
     'auto_install': False,
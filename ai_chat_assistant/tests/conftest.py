@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les utilitaires de tools/ ne dépendent pas d'Odoo : les rendre importables
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
@@ -0,0 +1,221 @@
+import base64
+import io
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from tools.activity_buffer import ActivityBuffer
+from tools.admission import AdmissionController
+from tools.answer_template import compile_answer_template
+from tools.base64_stream import open_base64
+from tools.history_cursor import decode_cursor, encode_cursor, is_before
+from tools.metrics import MetricsFileStore, MetricsRegistry, merge_snapshots, render_prometheus
+from tools.prefix_index import PrefixIndex
+from tools.timing import StageTimer
+from tools.ttl_cache import TTLCache
+
+INSIGHTS = frozenset(['total_sent', 'avg_open_rate'])
+
+
+def test_ttl_cache_expires():
+    cache = TTLCache(ttl=0.05)
+    assert cache.get_or_compute('k', lambda: 1) == 1
+    assert cache.get_or_compute('k', lambda: 2) == 1
+    time.sleep(0.06)
+    assert cache.get_or_compute('k', lambda: 3) == 3
+
+
+def test_ttl_cache_single_flight():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+               for _i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+
+def test_ttl_cache_maxsize():
+    cache = TTLCache(ttl=60, maxsize=2)
+    for key in 'abc':
+        cache.set(key, key)
+    assert cache.get('a') is None
+    assert cache.get('c') == 'c'
+
+
+def test_answer_template_fields():
+    assert compile_answer_template('Envoyés: {total_sent:,}', INSIGHTS) == frozenset(['total_sent'])
+    assert compile_answer_template('<p>Pas de données</p>', INSIGHTS) == frozenset()
+    # Accolades CSS : pas un template d'insights
+    assert compile_answer_template('<style>p { color: red; }</style>', INSIGHTS) is None
+    assert compile_answer_template('{unknown}', INSIGHTS) is None
+
+
+def test_activity_buffer_coalesces():
+    buffer = ActivityBuffer()
+    assert buffer.touch('db', 1, 10, interval=60) is False
+    assert buffer.touch('db', 1, 5, interval=60) is False
+    buffer.touch('db', 2, 7, interval=60)
+    assert buffer.drain('db') == {1: 10, 2: 7}
+    assert buffer.drain('db') == {}
+    assert buffer.touch('db', 1, 11, interval=0) is True
+
+
+def test_admission_token_buckets():
+    admission = AdmissionController()
+    limits = dict(user_rate=1.0, user_burst=2, global_rate=100.0, global_burst=3, max_inflight=0)
+    assert admission.acquire('db', ('db', 1), now=0.0, **limits) == (True, 0.0)
+    assert admission.acquire('db', ('db', 1), now=0.0, **limits) == (True, 0.0)
+    admitted, retry_after = admission.acquire('db', ('db', 1), now=0.0, **limits)
+    assert not admitted and retry_after == 1.0
+    # Un autre utilisateur garde son propre seau, jusqu'à épuisement du seau global
+    assert admission.acquire('db', ('db', 2), now=0.0, **limits)[0]
+    assert not admission.acquire('db', ('db', 3), now=0.0, **limits)[0]
+    # Recharge après une seconde
+    assert admission.acquire('db', ('db', 1), now=1.0, **limits)[0]
+
+
+def test_admission_evicts_least_recently_used_buckets():
+    admission = AdmissionController(max_buckets=2)
+    limits = dict(user_rate=0.001, user_burst=1, global_rate=100.0, global_burst=100, max_inflight=0)
+    assert admission.acquire('db', 'busy', now=0.0, **limits)[0]
+    # Des utilisateurs de passage remplissent la table pendant que « busy » insiste
+    for now, user in enumerate(['a', 'b', 'c'], 1):
+        assert admission.acquire('db', user, now=float(now), **limits)[0]
+        assert not admission.acquire('db', 'busy', now=float(now), **limits)[0]
+    assert admission.stats()['users'] == 2
+
+
+def test_admission_inflight_limit():
+    admission = AdmissionController()
+    limits = dict(user_rate=100.0, user_burst=100, global_rate=100.0, global_burst=100, max_inflight=1)
+    assert admission.acquire('db', ('db', 1), now=0.0, **limits)[0]
+    assert not admission.acquire('db', ('db', 2), now=0.0, **limits)[0]
+    admission.release()
+    assert admission.acquire('db', ('db', 2), now=0.0, **limits)[0]
+
+
+def test_stage_timer_counts_queries():
+    class Cursor(object):
+        sql_log_count = 0
+
+    cursor = Cursor()
+    timer = StageTimer(cursor)
+    with timer.span('retrieval'):
+        cursor.sql_log_count += 3
+    try:
+        with timer.span('formatting'):
+            raise ValueError
+    except ValueError:
+        pass
+    assert [(stage, queries) for stage, _duration, queries in timer.stages] == [('retrieval', 3), ('formatting', 0)]
+    assert set(timer.as_dict()) == {'retrieval', 'formatting'}
+
+
+def test_metrics_merge_and_render():
+    first, second = MetricsRegistry(buckets=(0.1, 1.0)), MetricsRegistry(buckets=(0.1, 1.0))
+    first.inc('ai_chat_requests_total', {'route': '/ai_chat/process', 'source': 'direct_match'})
+    second.inc('ai_chat_requests_total', {'route': '/ai_chat/process', 'source': 'direct_match'}, 2)
+    first.observe('ai_chat_request_duration_seconds', 0.05)
+    second.observe('ai_chat_request_duration_seconds', 5.0)
+    merged = merge_snapshots([first.snapshot(), None, second.snapshot()])
+    text = render_prometheus(merged, [('ai_chat_kb_entries', {'language': 'fr'}, 12)])
+    assert 'ai_chat_requests_total{route="/ai_chat/process",source="direct_match"} 3' in text
+    assert 'ai_chat_request_duration_seconds_bucket{le="0.1"} 1' in text
+    assert 'ai_chat_request_duration_seconds_bucket{le="+Inf"} 2' in text
+    assert 'ai_chat_request_duration_seconds_count 2' in text
+    assert '# TYPE ai_chat_kb_entries gauge' in text
+
+
+def test_metrics_file_store_retires_dead_workers(tmp_path):
+    store = MetricsFileStore(str(tmp_path))
+    registry = MetricsRegistry()
+    registry.inc('ai_chat_requests_total', {'route': '/r'})
+    store.dump(registry.snapshot())
+    # Fichier d'un worker terminé (pid inexistant) : cumulé puis supprimé
+    store._write(f'{store.prefix}999999999.json', registry.snapshot())
+    merged = merge_snapshots(store.collect())
+    assert merged['counters'] == [['ai_chat_requests_total', {'route': '/r'}, 2]]
+    assert not (tmp_path / f'{store.prefix}999999999.json').exists()
+    assert merge_snapshots(store.collect())['counters'][0][2] == 2
+
+
+def test_minhash_clusters_near_duplicates():
+    pytest.importorskip('numpy')
+    from tools.minhash import UnionFind, find_clusters
+    texts = {
+        1: "Comment améliorer le taux d'ouverture de mes emails ?",
+        2: "<p>Comment ameliorer le taux d'ouverture de mes e-mails</p>",
+        3: "Comment améliorer le taux d'ouverture de mes emails ?!",
+        4: "Quelle est la meilleure heure pour envoyer une campagne ?",
+        5: "",
+    }
+    clusters = find_clusters(texts, threshold=0.7)
+    assert [ids for ids, _similarity in clusters] == [[1, 2, 3]]
+    assert 0.7 <= clusters[0][1] <= 1.0
+
+    union = UnionFind()
+    for item in range(1000):
+        union.union(item, item + 1)
+    assert union.find(1000) == 0
+
+
+def test_prefix_index_ranks_word_prefixes():
+    index = PrefixIndex([
+        (1, "Quel est mon taux d'ouverture ?", (1, 50)),
+        (2, "Comment améliorer le taux de clic", (3, 0)),
+        (3, "Créer une campagne email", (1, 90)),
+    ])
+    # Préfixe court (pré-calculé) : priorité puis utilisation
+    assert index.search('tau') == [2, 1]
+    # Préfixe long : plage du tableau trié, accents et ponctuation ignorés
+    assert index.search("TAUX D'OUV") == [1]
+    assert index.search('creer une') == [3]
+    assert index.search('campagne', limit=0) == []
+    assert index.search('inconnu') == []
+
+
+def test_base64_stream_decodes_by_chunks():
+    raw = ''.join(f"question {i};réponse {i}\n" for i in range(500)).encode('utf-8')
+    encoded = base64.encodebytes(raw)  # lignes de 76 caractères
+    # Morceaux non alignés sur les fins de ligne : les restes sont reportés
+    assert open_base64(encoded, chunk_size=30).read() == raw
+    assert open_base64(encoded.decode('ascii')).read() == raw
+    lines = io.TextIOWrapper(open_base64(encoded, chunk_size=64), encoding='utf-8')
+    assert next(lines) == "question 0;réponse 0\n"
+    assert open_base64(b'').read() == b''
+
+
+def test_history_cursor_keeps_same_second_messages():
+    # Question et réponse enregistrées dans la même seconde, de part et d'autre d'une page
+    messages = [
+        (1, datetime(2024, 5, 1, 10, 0, 0, 120000)),
+        (2, datetime(2024, 5, 1, 10, 0, 0, 480000)),
+        (3, datetime(2024, 5, 1, 10, 0, 1, 50000)),
+    ]
+    newest_first = sorted(messages, key=lambda m: (m[1], m[0]), reverse=True)
+    seen, cursor = [], None
+    while True:
+        page = [m for m in newest_first if cursor is None or is_before(m[1], m[0], cursor)][:2]
+        seen.extend(record_id for record_id, _timestamp in page)
+        if len(page) < 2:
+            break
+        # Aller-retour JSON du curseur, comme entre le serveur et le widget
+        encoded = encode_cursor(page[-1][1], page[-1][0])
+        cursor = decode_cursor(encoded['before_timestamp'], str(encoded['before_id']))
+    assert seen == [3, 2, 1]
+    # Ancien curseur tronqué à la seconde : toujours accepté
+    assert decode_cursor('2024-05-01 10:00:00', 7) == (datetime(2024, 5, 1, 10, 0, 0), 7)
+
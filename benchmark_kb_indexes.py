@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark des index de ai.knowledge.base (plans avant / après, 100k lignes)
+
+Crée une table temporaire reproduisant les colonnes filtrées de
+ai_knowledge_base, la remplit, puis compare les plans EXPLAIN ANALYZE des
+requêtes fréquentes sans index et avec les index créés par
+AIKnowledgeBase.init(). Rien n'est écrit dans les tables du module.
+
+Usage :
+    python3 benchmark_kb_indexes.py "dbname=odoo user=odoo host=localhost" [nombre_de_lignes]
+"""
+import sys
+import time
+
+import psycopg2
+
+ROWS = 100000
+
+# Mêmes définitions que AIKnowledgeBase.init()
+INDEXES = [
+    "CREATE INDEX ai_kb_bench_active_language_category_idx ON ai_kb_bench (language, category) WHERE is_active",
+    "CREATE INDEX ai_kb_bench_question_hash_idx ON ai_kb_bench USING hash (question)",
+    "CREATE INDEX ai_kb_bench_active_order_idx ON ai_kb_bench "
+    "(priority DESC, usage_count DESC, create_date DESC) WHERE is_active",
+]
+
+ORDER = "ORDER BY priority DESC, usage_count DESC, create_date DESC"
+
+# (nom, requête) : domaines de _get_database_fallback, /ai_chat/get_fallback,
+# de l'index de recherche et des recherches limitées triées selon _order
+QUERIES = [
+    ("fallback par question + langue (_get_database_fallback)",
+     f"SELECT id FROM ai_kb_bench WHERE is_active AND question = 'fallback_performance' "
+     f"AND language IN ('fr', 'multi') {ORDER} LIMIT 1"),
+    ("fallback par question exacte (/ai_chat/get_fallback)",
+     "SELECT id FROM ai_kb_bench WHERE question = 'fallback_general' AND language = 'ar' LIMIT 1"),
+    ("entrées actives d'une catégorie (limit 5)",
+     f"SELECT id FROM ai_kb_bench WHERE is_active AND language IN ('fr', 'multi') "
+     f"AND category = 'troubleshooting' {ORDER} LIMIT 5"),
+    ("recherche limitée triée selon _order",
+     f"SELECT id FROM ai_kb_bench WHERE is_active {ORDER} LIMIT 5"),
+    ("chargement de l'index de recherche d'une langue",
+     "SELECT id FROM ai_kb_bench WHERE is_active AND language IN ('ar', 'multi')"),
+]
+
+
+def populate(cr, rows):
+    cr.execute("""
+        CREATE TEMP TABLE ai_kb_bench (
+            id serial PRIMARY KEY,
+            question text NOT NULL,
+            category varchar NOT NULL,
+            language varchar NOT NULL,
+            priority integer,
+            usage_count integer,
+            is_active boolean,
+            create_date timestamp
+        )
+    """)
+    # Répartition réaliste : peu d'entrées arabes, beaucoup de « general », 10 % inactives
+    cr.execute("""
+        INSERT INTO ai_kb_bench (question, category, language, priority, usage_count, is_active, create_date)
+        SELECT 'Question ' || md5(i::text) || ' ' || repeat('texte ', (i %% 20)),
+               (ARRAY['general', 'general', 'general', 'marketing', 'campaigns', 'analytics',
+                      'recommendations', 'troubleshooting'])[1 + i %% 8],
+               (ARRAY['fr', 'fr', 'en', 'en', 'multi', 'ar'])[1 + i %% 6],
+               1 + (i * 7) %% 10,
+               (i * 13) %% 500,
+               i %% 10 <> 0,
+               NOW() - (i || ' minutes')::interval
+          FROM generate_series(1, %s) AS i
+    """, [rows])
+    cr.execute("""
+        INSERT INTO ai_kb_bench (question, category, language, priority, usage_count, is_active, create_date)
+        SELECT q, 'general', l, 5, 0, TRUE, NOW()
+          FROM unnest(ARRAY['fallback_general', 'fallback_performance', 'fallback_campaigns']) AS q,
+               unnest(ARRAY['fr', 'en', 'ar']) AS l
+    """)
+    cr.execute("ANALYZE ai_kb_bench")
+
+
+def explain(cr, query):
+    """(nœuds de parcours, plan complet, temps d'exécution)
+
+    La première ligne du plan est souvent le nœud Limit ou Sort : les nœuds
+    « Scan » montrent si l'index est réellement utilisé.
+    """
+    cr.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) " + query)
+    plan = [row[0] for row in cr.fetchall()]
+    scans = [line.strip().lstrip('-> ') for line in plan if 'Scan' in line]
+    execution = next((line for line in plan if line.startswith('Execution Time')), '')
+    return scans, plan, execution
+
+
+def run(dsn, rows):
+    connection = psycopg2.connect(dsn)
+    cr = connection.cursor()
+    try:
+        print(f"🗄️ Remplissage de {rows} lignes...")
+        start = time.perf_counter()
+        populate(cr, rows)
+        print(f"   fait en {time.perf_counter() - start:.1f}s")
+
+        before = {name: explain(cr, query) for name, query in QUERIES}
+        for statement in INDEXES:
+            cr.execute(statement)
+        cr.execute("ANALYZE ai_kb_bench")
+        after = {name: explain(cr, query) for name, query in QUERIES}
+
+        print("=" * 80)
+        for name, _query in QUERIES:
+            print(f"📊 {name}")
+            for label, (scans, plan, execution) in (("sans index", before[name]), ("avec index", after[name])):
+                print(f"   {label} : {execution}")
+                for scan in scans:
+                    print(f"      parcours : {scan}")
+                for line in plan:
+                    print(f"      | {line}")
+            print("-" * 80)
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    run(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else ROWS)
@@ -1,29 +1,305 @@
 # -*- coding: utf-8 -*-
-from odoo import http, fields
+from odoo import api, http, fields
 from odoo.http import request
+from odoo.tools import config, consteq
+from odoo.tools.misc import hmac as hmac_tool
+import functools
 import json
 import logging
+import math
+import os
+import secrets
+import time
+
+from ..models.ai_chat_request import CLIENT_REQUEST_ID_MAX_LENGTH
+from ..models.ai_knowledge_base import EXPORT_FORMATS
+from ..tools.admission import AdmissionController
+from ..tools.history_cursor import decode_cursor, encode_cursor
+from ..tools.metrics import MetricsFileStore, get_registry, merge_snapshots, render_prometheus
+from ..tools.timing import StageTimer
+from ..tools.ttl_cache import TTLCache, all_caches
 
 _logger = logging.getLogger(__name__)
 
+# Actions rapides : chaque gestionnaire n'est appelé que pour l'action demandée
+QUICK_ACTION_HANDLERS = {
+    'marketing_overview': '_get_marketing_overview',
+    'view_campaigns': '_get_campaigns_summary',
+    'get_analytics': '_get_analytics_summary',
+    'view_active_campaigns': '_format_campaigns_summary',
+    'get_improvement_suggestions': '_format_recommendations',
+}
+
+# Réponse d'une action rapide dont le gestionnaire a échoué (jamais mise en cache)
+QUICK_ACTION_FALLBACKS = {
+    '_get_marketing_overview': "📊 Aperçu marketing en cours de chargement...",
+    '_get_campaigns_summary': "📈 Données des campagnes en cours de chargement...",
+    '_format_campaigns_summary': "📈 Données des campagnes en cours de chargement...",
+    '_format_recommendations': "💡 Chargement des recommandations...",
+}
+
+# Confiance associée au niveau de correspondance retourné par _retrieve_best
+RETRIEVAL_CONFIDENCE = {
+    'direct_match': 0.95,
+    'keyword_match': 0.75,
+    'category_match': 0.60,
+    'general_fallback': 0.30,
+}
+
+# Rendu des actions rapides par (base, société, utilisateur, langue de l'environnement, action) :
+# les gestionnaires lisent avec les règles d'accès de l'appelant, les messages des règles sont traduits
+QUICK_ACTION_CACHE_TTL = 30
+_quick_action_cache = TTLCache(QUICK_ACTION_CACHE_TTL, maxsize=512, name='quick_action')
+
+# Contrôle d'admission des routes de chat : paramètre système -> valeur par défaut
+ADMISSION_PARAMS = {
+    'user_rate': ('ai_chat_assistant.admission_user_rate', 1.0),        # requêtes/s par utilisateur
+    'user_burst': ('ai_chat_assistant.admission_user_burst', 5),
+    'global_rate': ('ai_chat_assistant.admission_global_rate', 20.0),   # requêtes/s par worker
+    'global_burst': ('ai_chat_assistant.admission_global_burst', 40),
+    'max_inflight': ('ai_chat_assistant.admission_max_inflight', 4),    # 0 = illimité
+}
+_admission = AdmissionController()
+
+
+def _admission_settings(env):
+    params = env['ir.config_parameter'].sudo()
+    settings = {}
+    for name, (key, default) in ADMISSION_PARAMS.items():
+        try:
+            settings[name] = type(default)(params.get_param(key, default))
+        except (TypeError, ValueError):
+            _logger.warning("Paramètre %s invalide, valeur par défaut utilisée", key)
+            settings[name] = default
+    return settings
+
+
+def admission_controlled(method):
+    """Refuser rapidement (avec retry_after) les requêtes au-delà des limites de chat"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        env = request.env
+        admitted, retry_after = _admission.acquire(
+            env.cr.dbname, (env.cr.dbname, env.uid), **_admission_settings(env)
+        )
+        if not admitted:
+            _logger.info("Requête de chat refusée (utilisateur %s), réessayer dans %.1fs", env.uid, retry_after)
+            return {
+                'success': False,
+                'rate_limited': True,
+                'retry_after': math.ceil(retry_after),
+                'error': 'Trop de requêtes, veuillez patienter quelques secondes.'
+            }
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _admission.release()
+    return wrapper
+
+
+def idempotent(method):
+    """Rejouer la réponse enregistrée quand le widget renvoie le même client_request_id"""
+    @functools.wraps(method)
+    def wrapper(self, *args, client_request_id=None, **kwargs):
+        if not isinstance(client_request_id, str) or not 0 < len(client_request_id) <= CLIENT_REQUEST_ID_MAX_LENGTH:
+            return method(self, *args, **kwargs)
+        requests_log = request.env['ai.chat.request']
+        claimed, stored = requests_log._claim(client_request_id, request.httprequest.path)
+        if not claimed:
+            _logger.info("Requête de chat %s déjà traitée : réponse rejouée", client_request_id)
+            if stored is None:
+                return {
+                    'success': False,
+                    'rate_limited': True,
+                    'in_progress': True,
+                    'retry_after': 1,
+                    'error': 'Requête déjà en cours de traitement.'
+                }
+            return dict(stored, replayed=True)
+        result = method(self, *args, **kwargs)
+        requests_log._store(client_request_id, result)
+        return result
+    return wrapper
+
+
+# Export des métriques : jeton requis par /ai_chat/metrics (route désactivée si vide)
+METRICS_TOKEN_PARAM = 'ai_chat_assistant.metrics_token'
+# Fréquence (s) d'écriture des compteurs d'un worker sur disque
+METRICS_DUMP_INTERVAL = 10
+METRICS_DESCRIPTIONS = {
+    'ai_chat_requests_total': "Requêtes de chat par route et source de la réponse",
+    'ai_chat_request_duration_seconds': "Durée des requêtes de chat par route",
+    'ai_chat_index_build_seconds': "Durée de construction de l'index de recherche par langue",
+    'ai_chat_cache_hits_total': "Lectures trouvées dans les caches mémoire (tous workers)",
+    'ai_chat_cache_misses_total': "Lectures absentes des caches mémoire (tous workers)",
+    'ai_chat_cache_hit_ratio': "Taux de succès des caches mémoire",
+    'ai_chat_kb_entries': "Entrées actives de la base de connaissances par langue",
+}
+
+
+def _metrics_store(dbname):
+    return MetricsFileStore(os.path.join(config['data_dir'], 'ai_chat_metrics', dbname))
+
+
+def _dump_metrics(dbname):
+    """Écrire les compteurs du worker (statistiques des caches incluses)"""
+    registry = get_registry(dbname)
+    for cache in all_caches():
+        stats = cache.stats()
+        registry.set_counter('ai_chat_cache_hits_total', {'cache': cache.name}, stats['hits'])
+        registry.set_counter('ai_chat_cache_misses_total', {'cache': cache.name}, stats['misses'])
+    try:
+        _metrics_store(dbname).dump(registry.snapshot())
+    except OSError as e:
+        _logger.warning("Impossible d'écrire les métriques du worker: %s", e)
+
+
+def metered(method):
+    """Compter la requête (route, source) et mesurer sa durée"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = method(self, *args, **kwargs)
+        dbname = request.env.cr.dbname
+        route = request.httprequest.path
+        if isinstance(result, dict):
+            if result.get('rate_limited'):
+                source = 'rate_limited'
+            elif result.get('replayed'):
+                source = 'replayed'
+            else:
+                source = result.get('source') or ('ok' if result.get('success') else 'error')
+        else:
+            source = 'ok'
+        registry = get_registry(dbname)
+        registry.inc('ai_chat_requests_total', {'route': route, 'source': source})
+        registry.observe('ai_chat_request_duration_seconds', time.perf_counter() - start, {'route': route})
+        if registry.due(METRICS_DUMP_INTERVAL):
+            _dump_metrics(dbname)
+        return result
+    return wrapper
+
+
+# Autocomplétion des questions pendant la frappe
+SUGGEST_LIMIT = 5
+SUGGEST_MAX_LIMIT = 10
+
+# Pagination de l'historique d'une session
+HISTORY_PAGE_SIZE = 30
+HISTORY_MAX_PAGE_SIZE = 100
+
+# Portée HMAC des jetons de session émis par /ai_chat/bootstrap
+SESSION_TOKEN_SCOPE = 'ai_chat_assistant.session'
+
+# Message de bienvenue selon la langue de l'utilisateur
+WELCOME_MESSAGES = {
+    'ar_SA': """🤖 مرحباً بك في مساعد الذكاء الاصطناعي للتسويق!
+
+مرحبا، كيف يمكنني مساعدتك؟
+
+يمكنني مساعدتك في:
+• تحليل أداء الحملات التسويقية
+• تقديم توصيات التحسين  
+• الإجابة على أسئلة التسويق
+• تحليل البيانات والمقاييس
+
+اسأل أي سؤال أو اختر من الاقتراحات أدناه!""",
+    'fr_FR': """🤖 Bienvenue dans l'Assistant IA Marketing !
+
+Salut, comment puis-je vous aider ?
+
+Je peux vous assister avec :
+• Analyse des performances de campagnes
+• Recommandations d'optimisation
+• Questions sur le marketing
+• Analyse de données et métriques
+
+Posez votre question ou choisissez parmi les suggestions ci-dessous !""",
+    'en_US': """🤖 Welcome to the AI Marketing Assistant!
+
+Hi, how can I help you?
+
+I can assist you with:
+• Campaign performance analysis
+• Optimization recommendations  
+• Marketing questions
+• Data analysis and metrics
+
+Ask any question or choose from the suggestions below!"""
+}
+
+
 class AIChatController(http.Controller):
 
+    @http.route('/ai_chat/metrics', type='http', auth='public', methods=['GET'], csrf=False)
+    def export_metrics(self, token=None, **kwargs):
+        """Métriques au format texte Prometheus, fusionnées sur tous les workers"""
+        expected = request.env['ir.config_parameter'].sudo().get_param(METRICS_TOKEN_PARAM)
+        if not expected or not token or not consteq(token, expected):
+            return request.not_found()
+
+        dbname = request.env.cr.dbname
+        _dump_metrics(dbname)
+        merged = merge_snapshots(_metrics_store(dbname).collect())
+
+        counters = {}
+        for name, labels, value in merged['counters']:
+            if name in ('ai_chat_cache_hits_total', 'ai_chat_cache_misses_total'):
+                counters[(name, labels['cache'])] = value
+        gauges = []
+        for cache in sorted({cache for _name, cache in counters}):
+            hits = counters.get(('ai_chat_cache_hits_total', cache), 0)
+            misses = counters.get(('ai_chat_cache_misses_total', cache), 0)
+            ratio = hits / (hits + misses) if hits + misses else 0
+            gauges.append(('ai_chat_cache_hit_ratio', {'cache': cache}, round(ratio, 4)))
+        for language, count in request.env['ai.knowledge.base'].sudo()._read_group(
+                [('is_active', '=', True)], ['language'], ['__count']):
+            gauges.append(('ai_chat_kb_entries', {'language': language or 'none'}, count))
+
+        body = render_prometheus(merged, gauges, METRICS_DESCRIPTIONS)
+        return request.make_response(body, headers=[('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')])
+
+    @http.route('/ai_chat/bootstrap', type='json', auth='user', methods=['POST'])
+    def bootstrap_chat(self, **kwargs):
+        """Initialiser le widget en un seul appel, sans créer de session
+
+        La session n'est enregistrée qu'au premier vrai message, à partir du
+        jeton signé retourné ici.
+        """
+        try:
+            user = request.env.user
+            user_lang = user.lang or 'en_US'
+            language = user_lang[:2] if user_lang[:2] in ('fr', 'ar') else 'en'
+            return {
+                'success': True,
+                'session_token': self._sign_session_token(secrets.token_hex(16)),
+                'welcome_message': WELCOME_MESSAGES.get(user_lang, WELCOME_MESSAGES['en_US']),
+                'quick_actions': request.env['ai.chat.message']._get_language_specific_quick_actions(language),
+                'language': language,
+                'kb_version': request.env['ai.knowledge.base']._get_kb_version(),
+                'user_name': user.name
+            }
+
+        except Exception as e:
+            _logger.error("Erreur bootstrap_chat: %s", e, exc_info=True)
+            return {
+                'success': False,
+                'error': 'Impossible d\'initialiser le chat.'
+            }
+
     @http.route('/ai_chat/process', type='json', auth='user', methods=['POST'])
-    def process_chat_message(self, message, session_id=None, language='en', **kwargs):
+    @metered
+    @idempotent
+    @admission_controlled
+    def process_chat_message(self, message, session_id=None, language='en', session_token=None, **kwargs):
         """Traiter un message de chat avec intégration complète"""
         try:
-            # Créer ou obtenir la session
-            if not session_id or session_id.startswith('fallback_'):
-                session = self._create_chat_session()
-                session_id = session.id
-            else:
-                session = request.env['ai.chat.session'].browse(int(session_id))
-                if not session.exists():
-                    session = self._create_chat_session()
-                    session_id = session.id
+            # La session est créée au premier message seulement
+            session = self._get_or_create_session(session_id, session_token)
+            session_id = session.id
 
-            # Mettre à jour la dernière activité
-            session.write({'last_activity': fields.Datetime.now()})
+            # Noter la dernière activité (écrite en lot, pas un UPDATE par message)
+            request.env['ai.chat.session']._touch_activity(session.id)
             
             # Traiter le message avec IA
             response_data = request.env['ai.chat.message'].create_chat_response(
@@ -36,7 +312,10 @@ class AIChatController(http.Controller):
                 'session_id': session_id,
                 'quick_actions': response_data.get('quick_actions', []),
                 'confidence': response_data.get('confidence', 0),
-                'category': response_data.get('category', 'general')
+                'category': response_data.get('category', 'general'),
+                'source': response_data.get('source', 'knowledge_base'),
+                'cacheable': response_data.get('cacheable', False),
+                'kb_version': request.env['ai.knowledge.base']._get_kb_version()
             }
             
         except Exception as e:
@@ -141,178 +420,65 @@ class AIChatController(http.Controller):
             return 'fr'
 
     @http.route('/ai_chat/get_response', type='json', auth='user', methods=['POST'])
+    @metered
+    @idempotent
+    @admission_controlled
     def get_ai_response(self, message, language=None, session_id=None, **kwargs):
         """Endpoint principal pour récupérer les réponses IA 100% base de données - TOUJOURS une réponse de la base"""
+        timer = StageTimer(request.env.cr)
         try:
             # Détection automatique de la langue si non spécifiée
             if not language:
-                language = self._detect_language(message)
+                with timer.span('language_detection'):
+                    language = self._detect_language(message)
             
             _logger.info("🤖 Traitement message: %s, langue détectée: %s", message, language)
             
-            # Utiliser le modèle de recherche amélioré
+            # Une seule recherche classée sur l'index : directe, mots-clés, catégorie ou générale
             knowledge_base = request.env['ai.knowledge.base']
-            
-            # 1. Recherche directe exacte
-            entries = knowledge_base.search_knowledge(message, language)
-            
-            if entries:
-                best_entry = entries[0] if isinstance(entries, list) else entries
-                _logger.info("✅ Réponse directe trouvée en base de données")
-                best_entry.increment_usage()
-                return {
-                    'success': True,
-                    'answer': best_entry.answer,
-                    'confidence': 0.95,
-                    'category': best_entry.category,
-                    'language': language,
-                    'source': 'direct_match'
-                }
-            
-            # 2. Recherche par mots-clés si pas de correspondance exacte
-            _logger.info("🔍 Recherche par mots-clés dans la base")
-            keyword_entries = self._search_by_keywords(message, language)
-            
-            if keyword_entries:
-                best_keyword_entry = keyword_entries[0]
-                _logger.info("✅ Réponse par mots-clés trouvée en base")
-                best_keyword_entry.increment_usage()
-                return {
+            diagnostics = {}
+            with timer.span('retrieval'):
+                entry, source = knowledge_base._retrieve_best(message, language, diagnostics=diagnostics)
+            
+            if entry:
+                _logger.info("✅ Réponse trouvée en base de données (%s)", source)
+                if source != 'general_fallback':
+                    with timer.span('usage'):
+                        entry.increment_usage()
+                result = {
                     'success': True,
-                    'answer': best_keyword_entry.answer,
-                    'confidence': 0.75,
-                    'category': best_keyword_entry.category,
+                    'answer': entry.answer,
+                    'confidence': RETRIEVAL_CONFIDENCE[source],
+                    'category': entry.category,
                     'language': language,
-                    'source': 'keyword_match'
+                    'source': source,
+                    # Réponse de la base sans insights : le widget peut la garder jusqu'au changement de version
+                    'cacheable': source != 'general_fallback',
+                    'kb_version': knowledge_base._get_kb_version()
                 }
-            
-            # 3. Recherche par catégorie si pas de mots-clés
-            _logger.info("🔍 Recherche par catégorie dans la base")
-            category = self._detect_message_category(message)
-            category_entries = knowledge_base.search([
-                ('is_active', '=', True),
-                ('category', '=', category),
-                ('language', 'in', [language, 'multi'])
-            ], limit=1)
-            
-            if category_entries:
-                category_entry = category_entries[0]
-                _logger.info("✅ Réponse par catégorie trouvée en base")
-                category_entry.increment_usage()
-                return {
-                    'success': True,
-                    'answer': category_entry.answer,
-                    'confidence': 0.60,
-                    'category': category_entry.category,
-                    'language': language,
-                    'source': 'category_match'
-                }
-            
-            # 4. Dernière option : prendre n'importe quelle entrée active dans la langue
-            _logger.info("🔍 Recherche d'entrée générale dans la base")
-            any_entry = knowledge_base.search([
-                ('is_active', '=', True),
-                ('language', 'in', [language, 'multi'])
-            ], limit=1)
-            
-            if any_entry:
-                general_entry = any_entry[0]
-                _logger.info("✅ Réponse générale trouvée en base")
-                return {
+            else:
+                # Si vraiment aucune entrée en base (ne devrait jamais arriver)
+                _logger.warning("⚠️ Aucune entrée trouvée en base de données - créer une entrée d'urgence")
+                with timer.span('fallback'):
+                    answer = self._create_emergency_database_response(message, language)
+                result = {
                     'success': True,
-                    'answer': general_entry.answer,
-                    'confidence': 0.30,
-                    'category': general_entry.category,
+                    'answer': answer,
+                    'confidence': 0.10,
+                    'category': 'general',
                     'language': language,
-                    'source': 'general_fallback'
+                    'source': 'emergency',
+                    'cacheable': False
                 }
-            
-            # 5. Si vraiment aucune entrée en base (ne devrait jamais arriver)
-            _logger.warning("⚠️ Aucune entrée trouvée en base de données - créer une entrée d'urgence")
-            return {
-                'success': True,
-                'answer': self._create_emergency_database_response(message, language),
-                'confidence': 0.10,
-                'category': 'general',
-                'language': language,
-                'source': 'emergency'
-            }
+            request.env['ai.chat.message.stage']._record('get_response', timer)
+            request.env['ai.chat.slow.turn']._capture_if_slow('get_response', timer, message, language, diagnostics)
+            return result
                 
         except Exception as e:
             _logger.error("🚨 Erreur get_ai_response: %s", e, exc_info=True)
             # Même en cas d'erreur, essayer de donner une réponse de la base
             return self._emergency_database_fallback(language)
 
-    def _search_by_keywords(self, message, language):
-        """Rechercher par mots-clés dans la base de données"""
-        try:
-            knowledge_base = request.env['ai.knowledge.base']
-            message_lower = message.lower()
-            
-            # Chercher les entrées qui contiennent des mots de la question
-            words = message_lower.split()
-            main_words = [w for w in words if len(w) > 3]  # Mots significatifs seulement
-            
-            if not main_words:
-                return []
-            
-            # Construire une requête de recherche
-            domain = [
-                ('is_active', '=', True),
-                ('language', 'in', [language, 'multi'])
-            ]
-            
-            # Ajouter condition OR pour chaque mot important
-            word_conditions = []
-            for word in main_words:
-                word_conditions.extend([
-                    ('question', 'ilike', word),
-                    ('answer', 'ilike', word)
-                ])
-            
-            if word_conditions:
-                entries = knowledge_base.search(domain, limit=5)
-                # Filtrer manuellement pour améliorer la pertinence
-                relevant_entries = []
-                for entry in entries:
-                    score = 0
-                    entry_text = (entry.question + ' ' + entry.answer).lower()
-                    for word in main_words:
-                        if word in entry_text:
-                            score += 1
-                    if score > 0:
-                        relevant_entries.append(entry)
-                
-                # Trier par score de pertinence
-                relevant_entries.sort(key=lambda e: sum(1 for w in main_words 
-                                                       if w in (e.question + ' ' + e.answer).lower()), 
-                                     reverse=True)
-                return relevant_entries[:3]
-            
-            return []
-            
-        except Exception as e:
-            _logger.error("Erreur _search_by_keywords: %s", e)
-            return []
-
-    def _detect_message_category(self, message):
-        """Détecter la catégorie du message"""
-        message_lower = message.lower()
-        
-        # Marketing patterns
-        if any(word in message_lower for word in ['campagne', 'campaign', 'marketing', 'promotion', 'حملة']):
-            return 'campaigns'
-        
-        # Analytics patterns  
-        if any(word in message_lower for word in ['performance', 'analytics', 'rapport', 'statistique', 'taux', 'أداء', 'تحليل']):
-            return 'analytics'
-            
-        # Recommendations patterns
-        if any(word in message_lower for word in ['conseil', 'recommandation', 'améliorer', 'optimiser', 'نصيحة', 'تحسين']):
-            return 'recommendations'
-            
-        return 'general'
-
     def _create_emergency_database_response(self, message, language):
         """Créer une réponse d'urgence mais basée sur la base de données"""
         try:
@@ -408,68 +574,99 @@ class AIChatController(http.Controller):
         }
 
     @http.route('/ai_chat/marketing/insights', type='json', auth='user', methods=['GET'])
-    def get_marketing_insights(self):
-        """Obtenir des insights marketing"""
+    def get_marketing_insights(self, period=None, **kwargs):
+        """Obtenir des insights marketing (et les totaux d'une période si demandée)"""
         try:
-            insights = request.env['ai.knowledge.base'].get_marketing_insights()
-            return {'success': True, 'insights': insights}
+            knowledge_base = request.env['ai.knowledge.base']
+            insights = knowledge_base.get_marketing_insights()
+            result = {'success': True, 'insights': insights, 'snapshot_date': insights.get('snapshot_date')}
+            if period:
+                result['period'] = knowledge_base.get_period_insights(period)
+            return result
         except Exception as e:
             _logger.error("Erreur get_marketing_insights: %s", e)
             return {'success': False, 'error': str(e)}
 
     @http.route('/ai_chat/recommendations', type='json', auth='user', methods=['GET'])
-    def get_ai_recommendations(self):
-        """Obtenir des recommandations IA"""
+    def get_ai_recommendations(self, offset=0, limit=5, **kwargs):
+        """Obtenir des recommandations IA (paginées, classées par impact)"""
         try:
-            recommendations = request.env['ai.knowledge.base'].get_campaign_recommendations()
-            return {'success': True, 'recommendations': recommendations}
+            page = request.env['ai.knowledge.base'].get_campaign_recommendations_page(
+                offset=max(int(offset), 0), limit=min(max(int(limit), 1), 100)
+            )
+            return {'success': True, 'recommendations': page['recommendations'], 'total': page['total']}
         except Exception as e:
             _logger.error("Erreur get_ai_recommendations: %s", e)
             return {'success': False, 'error': str(e)}
 
     @http.route('/ai_chat/campaigns/analysis', type='json', auth='user', methods=['POST'])
-    def analyze_campaign(self, campaign_id=None, **kwargs):
-        """Analyser une campagne spécifique"""
+    def analyze_campaign(self, campaign_id=None, campaign_ids=None, **kwargs):
+        """Analyser une campagne spécifique, ou plusieurs en un seul appel (campaign_ids)"""
         try:
-            if not campaign_id:
+            ids = campaign_ids if campaign_ids else ([campaign_id] if campaign_id else [])
+            try:
+                ids = [int(cid) for cid in ids]
+            except (TypeError, ValueError):
+                return {'success': False, 'error': 'ID de campagne invalide'}
+            if not ids:
                 return {'success': False, 'error': 'ID de campagne requis'}
             
-            # Logique d'analyse de campagne
-            analysis = {
-                'campaign_id': campaign_id,
-                'metrics': {
-                    'open_rate': 25.5,
-                    'click_rate': 3.2,
-                    'conversion_rate': 1.8,
-                    'total_sent': 1000,
-                    'total_opened': 255,
-                    'total_clicked': 32
-                },
-                'recommendations': [
-                    'Améliorer l\'objet pour augmenter le taux d\'ouverture',
-                    'Optimiser le call-to-action pour plus de conversions'
-                ]
-            }
+            analyses = request.env['ai.knowledge.base'].analyze_campaigns(ids)
+            not_found = [cid for cid in ids if cid not in analyses]
             
-            return {'success': True, 'analysis': analysis}
+            if campaign_ids:
+                return {'success': True, 'analyses': analyses, 'not_found': not_found}
+            
+            if not_found:
+                return {'success': False, 'error': 'Campagne introuvable'}
+            return {'success': True, 'analysis': analyses[ids[0]]}
             
         except Exception as e:
             _logger.error("Erreur analyze_campaign: %s", e)
             return {'success': False, 'error': str(e)}
 
+    @http.route('/ai_chat/suggest', type='json', auth='user', methods=['POST'])
+    @metered
+    def suggest_questions(self, prefix='', language=None, limit=SUGGEST_LIMIT, **kwargs):
+        """Questions de la base commençant par ce qui est tapé (index en mémoire, sans requête SQL)
+
+        Pas de contrôle d'admission : la frappe est déjà espacée côté widget et
+        la réponse ne coûte qu'une recherche dans un tableau trié.
+        """
+        try:
+            language = language or (request.env.user.lang or 'en_US')[:2]
+            limit = max(1, min(int(limit or SUGGEST_LIMIT), SUGGEST_MAX_LIMIT))
+            return {
+                'success': True,
+                'suggestions': request.env['ai.knowledge.base'].suggest_questions(prefix or '', language, limit),
+                'kb_version': request.env['ai.knowledge.base']._get_kb_version()
+            }
+
+        except Exception as e:
+            _logger.error("Erreur suggest_questions: %s", e, exc_info=True)
+            return {
+                'success': False,
+                'suggestions': []
+            }
+
     @http.route('/ai_chat/quick_action', type='json', auth='user', methods=['POST'])
+    @metered
+    @admission_controlled
     def execute_quick_action(self, action, **kwargs):
         """Exécuter une action rapide"""
         try:
-            responses = {
-                'marketing_overview': self._get_marketing_overview(),
-                'view_campaigns': self._get_campaigns_summary(),
-                'get_analytics': self._get_analytics_summary(),
-                'view_active_campaigns': self._format_campaigns_summary(),
-                'get_improvement_suggestions': self._format_recommendations()
-            }
-            
-            response = responses.get(action, 'Action non reconnue.')
+            handler_name = QUICK_ACTION_HANDLERS.get(action)
+            if handler_name:
+                env = request.env
+                cache_key = (env.cr.dbname, env.company.id, env.uid, env.lang, action)
+                try:
+                    response = _quick_action_cache.get_or_compute(cache_key, getattr(self, handler_name))
+                except Exception as e:
+                    # Un échec n'est pas mis en cache : l'appel suivant réessaie
+                    _logger.error("Erreur %s: %s", handler_name, e)
+                    response = QUICK_ACTION_FALLBACKS.get(handler_name, 'Action momentanément indisponible.')
+            else:
+                response = 'Action non reconnue.'
             
             return {
                 'success': True,
@@ -484,51 +681,111 @@ class AIChatController(http.Controller):
                 'error': 'Erreur lors de l\'exécution de l\'action.'
             }
 
-    @http.route('/ai_chat/session/create', type='json', auth='user', methods=['POST'])
-    def create_chat_session(self, **kwargs):
-        """Créer une nouvelle session de chat"""
-        try:
-            session = self._create_chat_session()
-            
-            # Message de bienvenue selon la langue de l'utilisateur
-            user_lang = request.env.user.lang or 'en_US'
-            welcome_messages = {
-                'ar_SA': """🤖 مرحباً بك في مساعد الذكاء الاصطناعي للتسويق!
-
-مرحبا، كيف يمكنني مساعدتك؟
+    @http.route('/ai_chat/session/<int:session_id>/messages', type='json', auth='user', methods=['POST'])
+    def get_session_messages(self, session_id, before_timestamp=None, before_id=None, limit=HISTORY_PAGE_SIZE, **kwargs):
+        """Historique d'une session, page par page du plus récent au plus ancien
 
-يمكنني مساعدتك في:
-• تحليل أداء الحملات التسويقية
-• تقديم توصيات التحسين  
-• الإجابة على أسئلة التسويق
-• تحليل البيانات والمقاييس
+        Pagination par clé (timestamp, id) : la page suivante commence strictement
+        avant le dernier message reçu (next_cursor), sans OFFSET.
+        """
+        try:
+            session = request.env['ai.chat.session'].browse(session_id).exists()
+            if not session or (session.user_id != request.env.user and not request.env.user.has_group('base.group_system')):
+                return {'success': False, 'error': 'Session introuvable.'}
+
+            limit = max(1, min(int(limit or HISTORY_PAGE_SIZE), HISTORY_MAX_PAGE_SIZE))
+            domain = [('session_id', '=', session.id)]
+            if before_timestamp and before_id:
+                # Curseur avec microsecondes : fields.Datetime.to_datetime les tronquerait
+                before_timestamp, before_id = decode_cursor(before_timestamp, before_id)
+                domain += ['|', ('timestamp', '<', before_timestamp),
+                           '&', ('timestamp', '=', before_timestamp), ('id', '<', before_id)]
+
+            rows = request.env['ai.chat.message'].search_read(
+                domain, ['message_type', 'message', 'timestamp', 'confidence_score'],
+                order='timestamp desc, id desc', limit=limit + 1
+            )
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            next_cursor = None
+            if has_more:
+                next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id'])
+
+            # Ordre chronologique pour l'affichage
+            messages = [{
+                'id': row['id'],
+                'type': row['message_type'],
+                'text': row['message'],
+                'timestamp': fields.Datetime.to_string(row['timestamp']),
+                'confidence': row['confidence_score'],
+            } for row in reversed(rows)]
 
-اسأل أي سؤال أو اختر من الاقتراحات أدناه!""",
-                'fr_FR': """🤖 Bienvenue dans l'Assistant IA Marketing !
+            return {
+                'success': True,
+                'session_id': session.id,
+                'messages': messages,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
 
-Salut, comment puis-je vous aider ?
+        except Exception as e:
+            _logger.error("Erreur get_session_messages: %s", e, exc_info=True)
+            return {
+                'success': False,
+                'error': 'Impossible de charger l\'historique.'
+            }
 
-Je peux vous assister avec :
-• Analyse des performances de campagnes
-• Recommandations d'optimisation
-• Questions sur le marketing
-• Analyse de données et métriques
+    @http.route('/ai_chat/export/messages', type='http', auth='user', methods=['GET'])
+    def export_messages(self, format='jsonl', date_from=None, date_to=None, language=None, source=None,
+                        message_type=None, min_confidence=None, max_confidence=None, **kwargs):
+        """Export gzip (JSONL ou CSV) de l'historique, diffusé au fil de la lecture (administrateurs)"""
+        if not request.env.user.has_group('base.group_system'):
+            return request.not_found()
+        if format not in EXPORT_FORMATS:
+            return request.make_response("Format inconnu (jsonl ou csv)", status=400)
+        # Filtres validés avant la réponse : une erreur dans le flux donnerait un .gz tronqué après un 200
+        try:
+            date_from = fields.Datetime.to_datetime(date_from) if date_from else None
+            date_to = fields.Datetime.to_datetime(date_to) if date_to else None
+        except ValueError:
+            return request.make_response("Date invalide (AAAA-MM-JJ ou AAAA-MM-JJ HH:MM:SS)", status=400)
+        try:
+            filters = {
+                'date_from': date_from,
+                'date_to': date_to,
+                'language': language,
+                'source': source,
+                'message_type': message_type,
+                'min_confidence': float(min_confidence) if min_confidence else None,
+                'max_confidence': float(max_confidence) if max_confidence else None,
+            }
+        except ValueError:
+            return request.make_response("Seuil de confiance invalide", status=400)
 
-Posez votre question ou choisissez parmi les suggestions ci-dessous !""",
-                'en_US': """🤖 Welcome to the AI Marketing Assistant!
+        # La réponse est lue après la fin de la requête : le flux ouvre son propre curseur
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
 
-Hi, how can I help you?
+        def stream():
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                yield from env['ai.chat.message']._export_logs(format, **filters)
 
-I can assist you with:
-• Campaign performance analysis
-• Optimization recommendations  
-• Marketing questions
-• Data analysis and metrics
+        filename = f"ai_chat_messages_{fields.Date.today()}.{format}.gz"
+        return request.make_response(stream(), headers=[
+            ('Content-Type', 'application/gzip'),
+            ('Content-Disposition', f'attachment; filename="{filename}"'),
+        ])
 
-Ask any question or choose from the suggestions below!"""
-            }
+    @http.route('/ai_chat/session/create', type='json', auth='user', methods=['POST'])
+    def create_chat_session(self, **kwargs):
+        """Créer une nouvelle session de chat (conservé pour compatibilité, voir /ai_chat/bootstrap)"""
+        try:
+            session = self._create_chat_session()
             
-            welcome_message = welcome_messages.get(user_lang, welcome_messages['en_US'])
+            user_lang = request.env.user.lang or 'en_US'
+            welcome_message = WELCOME_MESSAGES.get(user_lang, WELCOME_MESSAGES['en_US'])
             
             return {
                 'success': True,
@@ -544,7 +801,7 @@ Ask any question or choose from the suggestions below!"""
                 'error': 'Impossible de créer une session de chat.'
             }
 
-    def _create_chat_session(self):
+    def _create_chat_session(self, token=None):
         """Créer une nouvelle session de chat"""
         session_name = f"Chat - {request.env.user.name} - {fields.Datetime.now().strftime('%Y-%m-%d %H:%M')}"
         
@@ -554,20 +811,48 @@ Ask any question or choose from the suggestions below!"""
             'start_time': fields.Datetime.now(),
             'last_activity': fields.Datetime.now(),
             'state': 'active',
-            'session_type': 'marketing'
+            'session_type': 'marketing',
+            'token': token
         })
         
         return session
 
+    def _sign_session_token(self, nonce):
+        """Jeton de session « nonce.signature », lié à l'utilisateur courant"""
+        signature = hmac_tool(request.env(su=True), SESSION_TOKEN_SCOPE, (request.env.uid, nonce))
+        return f"{nonce}.{signature}"
+
+    def _verify_session_token(self, session_token):
+        """Nonce du jeton s'il a été signé pour l'utilisateur courant, sinon None"""
+        if not session_token or not isinstance(session_token, str) or '.' not in session_token:
+            return None
+        nonce, signature = session_token.split('.', 1)
+        expected = hmac_tool(request.env(su=True), SESSION_TOKEN_SCOPE, (request.env.uid, nonce))
+        return nonce if consteq(signature, expected) else None
+
+    def _get_or_create_session(self, session_id, session_token):
+        """Session du message : par identifiant, sinon par jeton (créée au premier message)"""
+        Session = request.env['ai.chat.session']
+        if session_id and str(session_id).isdigit():
+            session = Session.browse(int(session_id)).exists()
+            if session and session.user_id == request.env.user:
+                return session
+
+        nonce = self._verify_session_token(session_token)
+        if nonce:
+            session = Session.search([('token', '=', nonce), ('user_id', '=', request.env.uid)], limit=1)
+            return session or self._create_chat_session(token=nonce)
+
+        # Client sans jeton (ancien widget, identifiant fallback_) : nouvelle session
+        return self._create_chat_session()
+
     def _get_marketing_overview(self):
-        """Obtenir un aperçu marketing"""
-        try:
-            insights = request.env['ai.knowledge.base'].get_marketing_insights()
-            
-            if insights.get('error'):
-                return f"❌ Erreur lors de la récupération des données: {insights['error']}"
-            
-            overview = f"""📊 **Aperçu Marketing**
+        """Obtenir un aperçu marketing (lève une exception en cas d'échec)"""
+        insights = request.env['ai.knowledge.base'].get_marketing_insights()
+        if insights.get('error'):
+            raise ValueError(insights['error'])
+
+        overview = f"""📊 **Aperçu Marketing**
 
 📈 **Statistiques Générales:**
 • Total campagnes: {insights.get('total_campaigns', 0)}
@@ -577,39 +862,31 @@ Ask any question or choose from the suggestions below!"""
 
 🎯 **Campagnes Actives:** {len(insights.get('active_campaigns', []))}
 
-💡 **Recommandation:** Continuez à surveiller vos métriques pour identifier les opportunités d'amélioration !"""
-            
-            return overview
-            
-        except Exception as e:
-            _logger.error("Erreur _get_marketing_overview: %s", e)
-            return "📊 Aperçu marketing en cours de chargement..."
+💡 **Recommandation:** Continuez à surveiller vos métriques pour identifier les opportunités d'amélioration !
+
+🕒 Données du {insights.get('snapshot_date') or 'N/A'}"""
+        return overview
 
     def _get_campaigns_summary(self):
-        """Obtenir un résumé des campagnes"""
-        try:
-            insights = request.env['ai.knowledge.base'].get_marketing_insights()
-            campaigns = insights.get('active_campaigns', [])
-            
-            if not campaigns:
-                return "📭 Aucune campagne active pour le moment."
-            
-            summary = "📈 **Campagnes Actives:**\n\n"
-            
-            for campaign in campaigns[:5]:  # Limiter à 5 campagnes
-                open_rate = (campaign.get('opened', 0) / campaign.get('sent', 1) * 100) if campaign.get('sent', 0) > 0 else 0
-                summary += f"""🎯 **{campaign.get('name', 'Sans nom')}**
+        """Obtenir un résumé des campagnes (lève une exception en cas d'échec)"""
+        insights = request.env['ai.knowledge.base'].get_marketing_insights()
+        campaigns = insights.get('active_campaigns', [])
+
+        if not campaigns:
+            return "📭 Aucune campagne active pour le moment."
+
+        summary = "📈 **Campagnes Actives:**\n\n"
+
+        for campaign in campaigns[:5]:  # Limiter à 5 campagnes
+            open_rate = (campaign.get('opened', 0) / campaign.get('sent', 1) * 100) if campaign.get('sent', 0) > 0 else 0
+            summary += f"""🎯 **{campaign.get('name', 'Sans nom')}**
    • État: {campaign.get('state', 'N/A')}
    • Envoyés: {campaign.get('sent', 0):,}
    • Ouverts: {campaign.get('opened', 0):,} ({open_rate:.1f}%)
    • Réponses: {campaign.get('replied', 0):,}
 
 """
-            return summary
-            
-        except Exception as e:
-            _logger.error("Erreur _get_campaigns_summary: %s", e)
-            return "📈 Données des campagnes en cours de chargement..."
+        return summary
 
     def _get_analytics_summary(self):
         """Obtenir un résumé des analytics"""
@@ -630,30 +907,25 @@ Ask any question or choose from the suggestions below!"""
         return self._get_campaigns_summary()
 
     def _format_recommendations(self):
-        """Formater les recommandations (compatibilité)"""
-        try:
-            recommendations = request.env['ai.knowledge.base'].get_campaign_recommendations()
-            
-            if not recommendations:
-                return "✅ Vos campagnes semblent bien optimisées ! Continuez le bon travail."
-            
-            formatted = "💡 **Recommandations AI:**\n\n"
-            
-            for rec in recommendations[:5]:  # Limiter à 5 recommandations
-                icon = "⚠️" if rec.get('type') == 'warning' else "✅" if rec.get('type') == 'success' else "💡"
-                formatted += f"{icon} {rec.get('message', 'Recommandation non disponible')}\n\n"
-            
-            return formatted
-            
-        except Exception as e:
-            _logger.error("Erreur _format_recommendations: %s", e)
-            return "💡 Chargement des recommandations..."
+        """Formater les recommandations (compatibilité ; lève une exception en cas d'échec)"""
+        recommendations = request.env['ai.knowledge.base'].get_campaign_recommendations()
+
+        if not recommendations:
+            return "✅ Vos campagnes semblent bien optimisées ! Continuez le bon travail."
+
+        formatted = "💡 **Recommandations AI:**\n\n"
+
+        for rec in recommendations[:5]:  # Limiter à 5 recommandations
+            icon = "⚠️" if rec.get('type') == 'warning' else "✅" if rec.get('type') == 'success' else "💡"
+            formatted += f"{icon} {rec.get('message', 'Recommandation non disponible')}\n\n"
+
+        return formatted
 
     # Routes supplémentaires pour compatibilité
     @http.route('/ai_chat/marketing/insights', type='json', auth='user')
-    def marketing_insights_compat(self):
+    def marketing_insights_compat(self, period=None, **kwargs):
         """Route de compatibilité pour les insights marketing"""
-        return self.get_marketing_insights()
+        return self.get_marketing_insights(period=period)
 
     @http.route('/ai_chat/campaigns/active', type='json', auth='user')
     def get_active_campaigns(self):
@@ -661,7 +933,7 @@ Ask any question or choose from the suggestions below!"""
         try:
             insights = request.env['ai.knowledge.base'].get_marketing_insights()
             campaigns = insights.get('active_campaigns', [])
-            return {'success': True, 'campaigns': campaigns}
+            return {'success': True, 'campaigns': campaigns, 'snapshot_date': insights.get('snapshot_date')}
         except Exception as e:
             _logger.error("Erreur get_active_campaigns: %s", e)
             return {'success': False, 'error': str(e)}
\ No newline at end of file
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Remplir les nouvelles colonnes indexées de ai_chat_message depuis metadata (JSON)
+
+Une seule requête UPDATE ... FROM sur les messages bot ; les métadonnées
+illisibles sont ignorées au lieu de faire échouer la mise à jour.
+"""
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        CREATE OR REPLACE FUNCTION pg_temp.ai_chat_try_jsonb(value text) RETURNS jsonb AS $$
+        BEGIN
+            RETURN value::jsonb;
+        EXCEPTION WHEN others THEN
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    cr.execute("""
+        UPDATE ai_chat_message m
+           SET knowledge_base_id = kb.id,
+               source = COALESCE(parsed.data->>'source',
+                                 CASE WHEN kb.id IS NOT NULL THEN 'knowledge_base' END),
+               fallback_type = parsed.data->>'fallback_type',
+               intent = parsed.data->>'intent',
+               final_language = parsed.data->>'final_language'
+          FROM (
+                SELECT id, pg_temp.ai_chat_try_jsonb(metadata) AS data
+                  FROM ai_chat_message
+                 WHERE message_type = 'bot'
+                   AND metadata LIKE '{%%'
+          ) parsed
+     LEFT JOIN ai_knowledge_base kb
+            ON kb.id = CASE WHEN parsed.data->>'knowledge_base_id' ~ '^[0-9]{1,9}$'
+                            THEN (parsed.data->>'knowledge_base_id')::integer END
+         WHERE m.id = parsed.id
+           AND parsed.data IS NOT NULL
+    """)
+    _logger.info("ai_chat_message : %s message(s) bot renseigné(s) depuis metadata", cr.rowcount)
@@ -1 +1,10 @@
 from . import ai_knowledge_base
+from . import ai_marketing_snapshot
+from . import ai_recommendation_rule
+from . import ai_marketing_daily_stat
+from . import ai_chat_stage
+from . import ai_chat_slow_turn
+from . import ai_chat_message_archive
+from . import ai_knowledge_import
+from . import ai_knowledge_duplicate
+from . import ai_chat_request
\ No newline at end of file
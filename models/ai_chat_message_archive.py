@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+from datetime import timedelta
+
+_logger = logging.getLogger(__name__)
+
+# Paramètres système de la rétention (valeurs par défaut entre parenthèses)
+SESSION_IDLE_HOURS_PARAM = 'ai_chat_assistant.session_idle_hours'            # (24) 0 = jamais fermer
+MESSAGE_RETENTION_DAYS_PARAM = 'ai_chat_assistant.message_retention_days'    # (180) 0 = tout garder
+RETENTION_BATCH_SIZE_PARAM = 'ai_chat_assistant.retention_batch_size'        # (5000) lignes par lot
+RETENTION_MAX_BATCHES_PARAM = 'ai_chat_assistant.retention_max_batches'      # (200) lots par passage
+
+# Colonnes recopiées de ai_chat_message (metadata n'est pas conservé : ses clés
+# utiles ont déjà leurs colonnes)
+ARCHIVED_COLUMNS = [
+    'session_id', 'message_type', 'message', 'user_id', 'timestamp', 'response_time',
+    'confidence_score', 'knowledge_base_id', 'source', 'fallback_type', 'intent', 'final_language',
+]
+
+
+class AIChatMessageArchive(models.Model):
+    _name = 'ai.chat.message.archive'
+    _description = 'Message de Chat AI archivé'
+    _order = 'timestamp desc, id desc'
+    _log_access = False
+
+    original_id = fields.Integer(string='ID d\'origine', readonly=True)
+    # Identifiants simples : l'archive survit aux sessions, entrées et utilisateurs supprimés
+    session_id = fields.Integer(string='ID Session', index=True, readonly=True)
+    message_type = fields.Selection([
+        ('user', 'Utilisateur'),
+        ('bot', 'Bot AI')
+    ], string='Type de message', readonly=True)
+    message = fields.Text(string='Message', readonly=True)
+    user_id = fields.Integer(string='ID Utilisateur', readonly=True)
+    timestamp = fields.Datetime(string='Horodatage', index=True, readonly=True)
+    response_time = fields.Float(string='Temps de réponse (s)', readonly=True)
+    confidence_score = fields.Float(string='Score de confiance', readonly=True)
+    knowledge_base_id = fields.Integer(string='ID Entrée utilisée', index=True, readonly=True)
+    source = fields.Char(string='Source', readonly=True)
+    fallback_type = fields.Char(string='Type de fallback', readonly=True)
+    intent = fields.Char(string='Intention', readonly=True)
+    final_language = fields.Char(string='Langue de réponse', readonly=True)
+    archived_on = fields.Datetime(string='Archivé le', readonly=True)
+
+    @api.model
+    def _get_retention_settings(self):
+        params = self.env['ir.config_parameter'].sudo()
+        return {
+            'idle_hours': int(params.get_param(SESSION_IDLE_HOURS_PARAM, 24)),
+            'retention_days': int(params.get_param(MESSAGE_RETENTION_DAYS_PARAM, 180)),
+            'batch_size': max(int(params.get_param(RETENTION_BATCH_SIZE_PARAM, 5000)), 1),
+            'max_batches': max(int(params.get_param(RETENTION_MAX_BATCHES_PARAM, 200)), 1),
+        }
+
+    @api.model
+    def _cron_apply_retention(self):
+        """Cron : fermer les sessions inactives puis archiver les anciens messages par lots"""
+        settings = self._get_retention_settings()
+        now = fields.Datetime.now()
+
+        if settings['idle_hours'] > 0:
+            closed = self._close_idle_sessions(now - timedelta(hours=settings['idle_hours']))
+            self.env.cr.commit()
+            _logger.info("Rétention chat : %s session(s) inactive(s) fermée(s)", closed)
+
+        if settings['retention_days'] > 0:
+            cutoff = now - timedelta(days=settings['retention_days'])
+            archived = self._archive_messages(cutoff, settings['batch_size'], settings['max_batches'])
+            purged = self._purge_stage_timings(cutoff, settings['batch_size'], settings['max_batches'])
+            _logger.info("Rétention chat : %s message(s) archivé(s), %s mesure(s) d'étape supprimée(s)",
+                         archived, purged)
+
+    @api.model
+    def _close_idle_sessions(self, idle_before):
+        """Fermer en une requête les sessions actives sans activité depuis idle_before"""
+        self.env.cr.execute("""
+            UPDATE ai_chat_session
+               SET state = 'closed', write_date = NOW() AT TIME ZONE 'UTC', write_uid = %s
+             WHERE state = 'active'
+               AND COALESCE(last_activity, start_time, create_date) < %s
+        """, [self.env.uid, idle_before])
+        self.env['ai.chat.session'].invalidate_model(['state'])
+        return self.env.cr.rowcount
+
+    @api.model
+    def _archive_messages(self, cutoff, batch_size, max_batches):
+        """Déplacer les messages antérieurs à cutoff vers l'archive, un lot par transaction
+
+        Chaque lot est un seul DELETE ... RETURNING inséré dans l'archive : les
+        verrous ne portent que sur batch_size lignes et sont relâchés au commit.
+        Les lignes verrouillées par une transaction en cours sont laissées au
+        passage suivant (SKIP LOCKED).
+        """
+        columns = ', '.join(ARCHIVED_COLUMNS)
+        total = 0
+        for _batch in range(max_batches):
+            self.env.cr.execute(f"""
+                WITH moved AS (
+                    DELETE FROM ai_chat_message
+                     WHERE id IN (SELECT id
+                                    FROM ai_chat_message
+                                   WHERE timestamp < %s
+                                ORDER BY timestamp
+                                   LIMIT %s
+                                     FOR UPDATE SKIP LOCKED)
+                 RETURNING id, {columns}
+                )
+                INSERT INTO ai_chat_message_archive (original_id, {columns}, archived_on)
+                SELECT id, {columns}, NOW() AT TIME ZONE 'UTC' FROM moved
+            """, [cutoff, batch_size])
+            moved = self.env.cr.rowcount
+            self.env.cr.commit()
+            total += moved
+            if moved < batch_size:
+                break
+        self.env['ai.chat.message'].invalidate_model()
+        return total
+
+    @api.model
+    def _purge_stage_timings(self, cutoff, batch_size, max_batches):
+        """Supprimer par lots les durées d'étapes plus anciennes que cutoff"""
+        total = 0
+        for _batch in range(max_batches):
+            self.env.cr.execute("""
+                DELETE FROM ai_chat_message_stage
+                 WHERE id IN (SELECT id
+                                FROM ai_chat_message_stage
+                               WHERE create_date < %s
+                               LIMIT %s
+                                 FOR UPDATE SKIP LOCKED)
+            """, [cutoff, batch_size])
+            deleted = self.env.cr.rowcount
+            self.env.cr.commit()
+            total += deleted
+            if deleted < batch_size:
+                break
+        self.env['ai.chat.message.stage'].invalidate_model()
+        return total
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import json
+import logging
+from datetime import timedelta
+
+_logger = logging.getLogger(__name__)
+
+# Durée de conservation (heures) des réponses rejouables, en paramètre système
+REQUEST_RETENTION_HOURS_PARAM = 'ai_chat_assistant.request_retention_hours'   # (1)
+CLIENT_REQUEST_ID_MAX_LENGTH = 64
+
+
+class AIChatRequest(models.Model):
+    """Réponses déjà envoyées, par identifiant de requête client
+
+    Un renvoi du widget (réseau coupé après traitement) reçoit la réponse
+    enregistrée au lieu de recréer les messages et de recompter l'utilisation.
+    La ligne est insérée dans la transaction de la requête : un doublon
+    concurrent attend sur l'index unique, puis rejoue la réponse validée.
+    """
+    _name = 'ai.chat.request'
+    _description = 'Requête de chat déjà traitée (idempotence)'
+    _order = 'received_at desc, id desc'
+    _log_access = False
+
+    user_id = fields.Many2one('res.users', string='Utilisateur', required=True, ondelete='cascade', readonly=True)
+    client_request_id = fields.Char(string='ID de requête client', required=True, readonly=True)
+    route = fields.Char(string='Route', readonly=True)
+    response = fields.Text(string='Réponse (JSON)', readonly=True)
+    received_at = fields.Datetime(string='Reçue le', index=True, readonly=True)
+
+    _sql_constraints = [
+        ('user_client_request_uniq', 'unique(user_id, client_request_id)',
+         'Cette requête client a déjà été traitée.'),
+    ]
+
+    @api.model
+    def _claim(self, client_request_id, route):
+        """(True, None) si la requête est nouvelle, sinon (False, réponse enregistrée ou None)"""
+        self.env.cr.execute("""
+            INSERT INTO ai_chat_request (user_id, client_request_id, route, received_at)
+            VALUES (%s, %s, %s, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (user_id, client_request_id) DO NOTHING
+            RETURNING id
+        """, [self.env.uid, client_request_id, route])
+        if self.env.cr.fetchone():
+            return True, None
+        self.env.cr.execute("""
+            SELECT response FROM ai_chat_request WHERE user_id = %s AND client_request_id = %s
+        """, [self.env.uid, client_request_id])
+        row = self.env.cr.fetchone()
+        try:
+            return False, json.loads(row[0]) if row and row[0] else None
+        except ValueError:
+            return False, None
+
+    @api.model
+    def _store(self, client_request_id, result):
+        """Enregistrer une réponse réussie ; sinon libérer l'identifiant pour un nouvel essai"""
+        if isinstance(result, dict) and result.get('success'):
+            self.env.cr.execute("""
+                UPDATE ai_chat_request SET response = %s WHERE user_id = %s AND client_request_id = %s
+            """, [json.dumps(result, default=str), self.env.uid, client_request_id])
+        else:
+            self.env.cr.execute("""
+                DELETE FROM ai_chat_request WHERE user_id = %s AND client_request_id = %s
+            """, [self.env.uid, client_request_id])
+
+    @api.model
+    def _cron_cleanup(self):
+        """Cron : supprimer les réponses plus anciennes que la durée de conservation"""
+        hours = int(self.env['ir.config_parameter'].sudo().get_param(REQUEST_RETENTION_HOURS_PARAM, 1))
+        self.env.cr.execute("""
+            DELETE FROM ai_chat_request WHERE received_at < %s
+        """, [fields.Datetime.now() - timedelta(hours=max(hours, 1))])
+        _logger.info("Idempotence chat : %s requête(s) expirée(s) supprimée(s)", self.env.cr.rowcount)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import json
+import logging
+
+from .ai_chat_stage import PIPELINES
+
+_logger = logging.getLogger(__name__)
+
+# Budget de latence d'un tour de chat (ms) ; 0 désactive la capture
+SLOW_TURN_BUDGET_PARAM = 'ai_chat_assistant.slow_turn_budget_ms'
+SLOW_TURN_BUDGET_DEFAULT = 1000
+# Nombre de tours lents conservés (tampon circulaire)
+SLOW_TURN_MAX_ROWS_PARAM = 'ai_chat_assistant.slow_turn_max_rows'
+SLOW_TURN_MAX_ROWS_DEFAULT = 500
+
+
+class AIChatSlowTurn(models.Model):
+    _name = 'ai.chat.slow.turn'
+    _description = 'Tour de chat lent (diagnostic)'
+    _order = 'id desc'
+    _rec_name = 'message'
+
+    pipeline = fields.Selection(PIPELINES, string='Traitement', required=True, readonly=True)
+    message = fields.Text(string='Message', readonly=True)
+    language = fields.Char(string='Langue', readonly=True)
+    user_id = fields.Many2one('res.users', string='Utilisateur', readonly=True, ondelete='set null')
+    bot_message_id = fields.Many2one('ai.chat.message', string='Réponse', readonly=True, ondelete='set null')
+    duration_ms = fields.Float(string='Durée (ms)', digits=(16, 1), readonly=True)
+    budget_ms = fields.Float(string='Budget (ms)', digits=(16, 1), readonly=True)
+    query_count = fields.Integer(string='Requêtes SQL', readonly=True)
+    index_size = fields.Integer(string='Entrées indexées', readonly=True)
+    candidate_count = fields.Integer(string='Candidats', readonly=True)
+    intent = fields.Char(string='Intention', readonly=True)
+    intent_confidence = fields.Float(string='Confiance intention', readonly=True)
+    query_analysis = fields.Text(string='Analyse de la requête', readonly=True)
+    stage_durations = fields.Text(string='Durées par étape (ms)', readonly=True)
+    top_candidates = fields.Text(string='Meilleurs candidats', readonly=True,
+                                 help="Score et composantes du score (_score_entry) des meilleurs candidats")
+    relevance = fields.Text(string='Validation de pertinence', readonly=True,
+                            help="Résultat de _validate_response_relevance pour la réponse retenue")
+
+    @api.model
+    def _capture_if_slow(self, pipeline, timer, message, language, diagnostics, relevance=None, bot_message=None):
+        """Enregistrer le tour s'il dépasse le budget de latence"""
+        params = self.env['ir.config_parameter'].sudo()
+        try:
+            budget = float(params.get_param(SLOW_TURN_BUDGET_PARAM, SLOW_TURN_BUDGET_DEFAULT))
+        except ValueError:
+            budget = SLOW_TURN_BUDGET_DEFAULT
+        duration_ms = timer.total_ms()
+        if budget <= 0 or duration_ms < budget:
+            return self.browse()
+
+        try:
+            diagnostics = diagnostics or {}
+            analysis = diagnostics.get('query_analysis') or {}
+            top_candidates = self.env['ai.knowledge.base']._explain_candidates(message, diagnostics) if diagnostics else []
+            # Savepoint : une erreur SQL (création ou purge) ne laisse pas la transaction du chat avortée
+            with self.env.cr.savepoint():
+                turn = self.sudo().create({
+                    'pipeline': pipeline,
+                    'message': message,
+                    'language': language,
+                    'user_id': self.env.uid,
+                    'bot_message_id': bot_message.id if bot_message else False,
+                    'duration_ms': duration_ms,
+                    'budget_ms': budget,
+                    'query_count': timer.total_queries(),
+                    'index_size': diagnostics.get('index_size', 0),
+                    'candidate_count': diagnostics.get('candidate_count', 0),
+                    'intent': analysis.get('intent'),
+                    'intent_confidence': analysis.get('intent_confidence', 0),
+                    'query_analysis': json.dumps(analysis, ensure_ascii=False, indent=2, default=str),
+                    'stage_durations': json.dumps(timer.as_dict(), indent=2),
+                    'top_candidates': json.dumps(top_candidates, ensure_ascii=False, indent=2),
+                    'relevance': json.dumps(relevance, ensure_ascii=False, indent=2, default=str) if relevance else False,
+                })
+                self._trim(int(params.get_param(SLOW_TURN_MAX_ROWS_PARAM, SLOW_TURN_MAX_ROWS_DEFAULT)))
+            _logger.info("Tour de chat lent (%.0f ms > %.0f ms) capturé: %s", duration_ms, budget, turn.id)
+            return turn
+        except Exception as e:
+            # Le diagnostic ne doit jamais faire échouer la réponse
+            _logger.warning("Impossible de capturer le tour lent: %s", e)
+            return self.browse()
+
+    @api.model
+    def _trim(self, max_rows):
+        """Ne garder que les max_rows tours les plus récents"""
+        self.env.cr.execute("""
+            DELETE FROM ai_chat_slow_turn
+             WHERE id <= (SELECT id FROM ai_chat_slow_turn ORDER BY id DESC OFFSET %s LIMIT 1)
+        """, [max(max_rows, 1)])
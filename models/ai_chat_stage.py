@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, tools
+import logging
+
+_logger = logging.getLogger(__name__)
+
+PIPELINES = [
+    ('chat', 'Chat (/ai_chat/process)'),
+    ('get_response', 'Réponse directe (/ai_chat/get_response)'),
+]
+
+# Fenêtre du rapport de percentiles
+STAGE_REPORT_DAYS = 7
+
+
+class AIChatMessageStage(models.Model):
+    _name = 'ai.chat.message.stage'
+    _description = 'Durée d\'une étape de traitement du chat'
+    _order = 'id desc'
+
+    message_id = fields.Many2one('ai.chat.message', string='Message bot', index=True, ondelete='cascade',
+                                 help="Vide pour les réponses qui ne sont pas enregistrées (get_response)")
+    pipeline = fields.Selection(PIPELINES, string='Traitement', required=True)
+    sequence = fields.Integer(string='Ordre')
+    stage = fields.Char(string='Étape', required=True)
+    duration_ms = fields.Float(string='Durée (ms)', digits=(16, 2))
+    query_count = fields.Integer(string='Requêtes SQL')
+    create_date = fields.Datetime(index=True)
+
+    @api.model
+    def _record(self, pipeline, timer, message=None):
+        """Enregistrer toutes les étapes d'un chronomètre en un seul create"""
+        if not timer.stages:
+            return self.browse()
+        try:
+            # Savepoint : un INSERT en échec ne laisse pas la transaction du chat avortée
+            with self.env.cr.savepoint():
+                return self.sudo().create([{
+                    'message_id': message.id if message else False,
+                    'pipeline': pipeline,
+                    'sequence': sequence,
+                    'stage': stage,
+                    'duration_ms': duration_ms,
+                    'query_count': query_count,
+                } for sequence, (stage, duration_ms, query_count) in enumerate(timer.stages)])
+        except Exception as e:
+            # La mesure ne doit jamais faire échouer la réponse
+            _logger.warning("Impossible d'enregistrer les durées d'étapes: %s", e)
+            return self.browse()
+
+
+class AIChatStageReport(models.Model):
+    _name = 'ai.chat.stage.report'
+    _description = 'Latence par étape du chat (percentiles)'
+    _auto = False
+    _order = 'pipeline, p95_ms desc'
+
+    pipeline = fields.Selection(PIPELINES, string='Traitement', readonly=True)
+    stage = fields.Char(string='Étape', readonly=True)
+    sample_count = fields.Integer(string='Mesures', readonly=True)
+    avg_ms = fields.Float(string='Moyenne (ms)', digits=(16, 2), readonly=True)
+    p50_ms = fields.Float(string='p50 (ms)', digits=(16, 2), readonly=True)
+    p95_ms = fields.Float(string='p95 (ms)', digits=(16, 2), readonly=True)
+    p99_ms = fields.Float(string='p99 (ms)', digits=(16, 2), readonly=True)
+    max_ms = fields.Float(string='Max (ms)', digits=(16, 2), readonly=True)
+    avg_query_count = fields.Float(string='Requêtes SQL (moy.)', digits=(16, 1), readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT ROW_NUMBER() OVER (ORDER BY pipeline, stage) AS id,
+                       pipeline,
+                       stage,
+                       COUNT(*) AS sample_count,
+                       AVG(duration_ms) AS avg_ms,
+                       percentile_cont(0.50) WITHIN GROUP (ORDER BY duration_ms) AS p50_ms,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) AS p95_ms,
+                       percentile_cont(0.99) WITHIN GROUP (ORDER BY duration_ms) AS p99_ms,
+                       MAX(duration_ms) AS max_ms,
+                       AVG(query_count) AS avg_query_count
+                  FROM ai_chat_message_stage
+                 WHERE create_date >= (NOW() AT TIME ZONE 'UTC') - INTERVAL '{STAGE_REPORT_DAYS} days'
+              GROUP BY pipeline, stage
+            )
+        """)
@@ -1,11 +1,64 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
+from odoo.exceptions import AccessError, UserError
+from odoo.tools.sql import create_index
+import csv
+import io
 import logging
 import json
+import re
+import time
+import uuid
+import zlib
+from collections import namedtuple
 from datetime import datetime, timedelta
 
+from ..tools.activity_buffer import ActivityBuffer
+from ..tools.answer_template import compile_answer_template
+from ..tools.metrics import get_registry
+from ..tools.prefix_index import PrefixIndex
+from ..tools.timing import StageTimer
+from ..tools.ttl_cache import TTLCache
+from .ai_marketing_daily_stat import PERIOD_INSIGHT_FIELDS
+from .ai_marketing_snapshot import INSIGHT_FIELDS
+from .ai_recommendation_rule import GENERIC_RECOMMENDATIONS
+
 _logger = logging.getLogger(__name__)
 
+ANSWER_TEMPLATE_FIELDS = INSIGHT_FIELDS | PERIOD_INSIGHT_FIELDS
+
+# Champs dont la modification ne nécessite pas de reconstruire l'index de recherche
+INDEX_NEUTRAL_FIELDS = frozenset(['usage_count'])
+
+# Export de l'historique (_export_logs) : colonnes, formats et lignes lues par FETCH
+EXPORT_COLUMNS = [
+    'id', 'session_id', 'message_type', 'user_id', 'timestamp', 'message', 'response_time',
+    'confidence_score', 'knowledge_base_id', 'source', 'fallback_type', 'intent', 'final_language',
+]
+EXPORT_FORMATS = ('jsonl', 'csv')
+EXPORT_CHUNK_SIZE = 5000
+
+# Candidats conservés par _score_index pour le diagnostic des tours lents
+EXPLAINED_CANDIDATES = 5
+
+# Entrée de l'index de recherche en mémoire (textes déjà normalisés)
+IndexedEntry = namedtuple('IndexedEntry', [
+    'id', 'question', 'question_lower', 'question_words', 'answer_lower', 'answer_length',
+    'category', 'language', 'priority', 'usage_count', 'keyword_names',
+])
+
+# Index par (base, version de la base de connaissances, langue)
+_search_index_cache = TTLCache(3600, maxsize=64, name='search_index')
+
+# Autocomplétion des questions par (base, version de la base de connaissances, langue)
+_suggest_index_cache = TTLCache(3600, maxsize=64, name='suggest_index')
+# Questions techniques (fallback_general...) jamais proposées à l'utilisateur
+INTERNAL_QUESTION_RE = re.compile(r'^fallback_')
+
+# Dernière activité des sessions, écrite en lot (intervalle en secondes en paramètre système)
+ACTIVITY_FLUSH_PARAM = 'ai_chat_assistant.activity_flush_interval'
+_activity_buffer = ActivityBuffer()
+
 class AIKnowledgeBase(models.Model):
     _name = 'ai.knowledge.base'
     _description = 'Base de connaissances pour l\'Assistant IA'
@@ -34,7 +87,42 @@ class AIKnowledgeBase(models.Model):
     usage_count = fields.Integer(string='Nombre d\'utilisations', default=0, readonly=True)
     is_active = fields.Boolean(string='Actif', default=True)
     campaign_references = fields.Text(string='Références Campagnes', help="Références aux campagnes ou données marketing")
-    
+    external_key = fields.Char(string='Clé externe', index=True, copy=False,
+                               help="Identifiant stable de l'entrée dans les fichiers d'import (mise à jour au lieu de doublon)")
+
+    _sql_constraints = [
+        ('external_key_uniq', 'unique(external_key)', 'Cette clé externe est déjà utilisée par une autre entrée.'),
+    ]
+
+    def init(self):
+        """Index des recherches fréquentes (voir benchmark_kb_indexes.py)"""
+        # Entrées actives par langue / catégorie (index de recherche, fallbacks, get_fallback)
+        create_index(self.env.cr, 'ai_knowledge_base_active_language_category_idx', self._table,
+                     ['language', 'category'], where='is_active')
+        # Égalité sur question (fallback_general, fallback_performance...) : hash, la question étant un texte long
+        create_index(self.env.cr, 'ai_knowledge_base_question_hash_idx', self._table,
+                     ['question'], method='hash')
+        # Recherches limitées triées selon _order
+        create_index(self.env.cr, 'ai_knowledge_base_active_order_idx', self._table,
+                     ['priority DESC', 'usage_count DESC', 'create_date DESC'], where='is_active')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._bump_kb_version()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if set(vals) - INDEX_NEUTRAL_FIELDS:
+            self._bump_kb_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._bump_kb_version()
+        return res
+
     def action_view_usage(self):
         """Action pour voir l'utilisation de cette entrée"""
         return {
@@ -42,7 +130,7 @@ class AIKnowledgeBase(models.Model):
             'name': f'Utilisation: {self.question}',
             'res_model': 'ai.chat.message',
             'view_mode': 'list,form',
-            'domain': [('metadata', 'ilike', f'"knowledge_base_id": {self.id}')],
+            'domain': [('knowledge_base_id', '=', self.id)],
             'context': {'default_session_id': False}
         }
 
@@ -178,164 +266,357 @@ class AIKnowledgeBase(models.Model):
         }
 
     @api.model
-    def search_knowledge(self, query, language='multi', category=None, limit=5):
-        """Rechercher dans la base de connaissances avec correspondance exacte du sujet"""
-        import re
+    def search_knowledge(self, query, language='multi', category=None, limit=5, diagnostics=None):
+        """Rechercher dans la base de connaissances avec correspondance exacte du sujet
+
+        :param dict diagnostics: si fourni, rempli par _score_index (candidats, analyse)
+        """
+        scored_entries = self._score_index(query, language, category=category, diagnostics=diagnostics)
+        
+        # Filtrer les doublons et retourner les résultats
+        seen_ids = set()
+        unique_ids = []
+        
+        for score, entry, is_specific in scored_entries:
+            if entry.id not in seen_ids and len(unique_ids) < limit:
+                seen_ids.add(entry.id)
+                unique_ids.append(entry.id)
         
+        return list(self.browse(unique_ids))
+
+    @api.model
+    def _retrieve_best(self, query, language, diagnostics=None):
+        """Meilleure entrée et niveau de correspondance, calculés en une passe sur l'index
+
+        Remplace la cascade directe / mots-clés / catégorie / générale : tout est
+        évalué sur le même index en mémoire, sans aller-retour supplémentaire
+        vers la base, qu'il y ait correspondance ou non.
+
+        :return: (enregistrement ai.knowledge.base ou recordset vide, source)
+        """
+        index = self._get_search_index(language)
+        if not index:
+            return self.browse(), 'emergency'
+        
+        # 1. Correspondance directe (même score que search_knowledge)
+        scored_entries = self._score_index(query, language, index=index, diagnostics=diagnostics)
+        if scored_entries:
+            return self.browse(scored_entries[0][1].id), 'direct_match'
+        
+        # 2-4. Mots-clés, catégorie et entrée générale en une seule passe (index trié selon _order)
+        main_words = [w for w in query.lower().split() if len(w) > 3]
+        category = self._detect_message_category(query)
+        best_keyword, best_keyword_hits = None, 0
+        category_entry = None
+        for entry in index:
+            if main_words:
+                text = entry.question_lower + ' ' + entry.answer_lower
+                hits = sum(1 for word in main_words if word in text)
+                if hits > best_keyword_hits:
+                    best_keyword, best_keyword_hits = entry, hits
+            if category_entry is None and entry.category == category:
+                category_entry = entry
+        
+        if best_keyword:
+            return self.browse(best_keyword.id), 'keyword_match'
+        if category_entry:
+            return self.browse(category_entry.id), 'category_match'
+        return self.browse(index[0].id), 'general_fallback'
+
+    @api.model
+    def _detect_message_category(self, message):
+        """Détecter la catégorie du message"""
+        message_lower = message.lower()
+        
+        # Marketing patterns
+        if any(word in message_lower for word in ['campagne', 'campaign', 'marketing', 'promotion', 'حملة']):
+            return 'campaigns'
+        
+        # Analytics patterns  
+        if any(word in message_lower for word in ['performance', 'analytics', 'rapport', 'statistique', 'taux', 'أداء', 'تحليل']):
+            return 'analytics'
+            
+        # Recommendations patterns
+        if any(word in message_lower for word in ['conseil', 'recommandation', 'améliorer', 'optimiser', 'نصيحة', 'تحسين']):
+            return 'recommendations'
+            
+        return 'general'
+
+    @api.model
+    def _score_index(self, query, language, category=None, index=None, diagnostics=None):
+        """Scorer les entrées de l'index pour la requête, triées par score décroissant
+
+        :param dict diagnostics: si fourni, reçoit l'analyse de la requête, la taille
+            de l'index, le nombre de candidats et les meilleurs candidats (sans coût
+            supplémentaire ; le détail des scores est calculé par _explain_candidates)
+        """
         # D'abord extraire l'intention et les entités de la question
         query_analysis = self._extract_intent_and_entities(query, language)
         
-        domain = [('is_active', '=', True)]
+        if index is None:
+            index = self._get_search_index(language)
         
         # Filtre par langue - prioriser la langue spécifique puis multilingue
         if language != 'multi':
-            # Rechercher d'abord dans la langue spécifique
-            domain_specific = domain + [('language', '=', language)]
-            domain_multi = domain + [('language', '=', 'multi')]
+            specific_entries = [e for e in index if e.language == language]
+            multi_entries = [e for e in index if e.language == 'multi']
         else:
-            domain_specific = domain
-            domain_multi = []
+            specific_entries = index
+            multi_entries = []
         
         # Filtre par catégorie
         if category:
-            if domain_specific:
-                domain_specific.append(('category', '=', category))
-            if domain_multi:
-                domain_multi.append(('category', '=', category))
+            specific_entries = [e for e in specific_entries if e.category == category]
+            multi_entries = [e for e in multi_entries if e.category == category]
         
         # Recherche textuelle
         query_lower = query.lower().strip()
         query_words = re.findall(r'\b\w+\b', query_lower)
         
-        def calculate_entry_score(entry, is_specific_language=True):
-            """Calculer le score pour une entrée avec validation de pertinence thématique"""
-            score = 0
-            entry_question_lower = entry.question.lower()
-            entry_answer_lower = entry.answer.lower()
-            
-            # 0. VALIDATION DE PERTINENCE THÉMATIQUE (nouveau)
-            # Vérifier si l'entrée correspond à l'intention détectée
-            intent_match_bonus = self._calculate_intent_relevance(
-                query_analysis, entry, entry_question_lower, entry_answer_lower
-            )
-            score += intent_match_bonus
-            
-            # Si pas de correspondance thématique minimum, réduire drastiquement
-            if intent_match_bonus < 5 and query_analysis['intent_confidence'] > 0.6:
-                score -= 50  # Pénalité pour manque de pertinence thématique
-            
-            # 1. Correspondance exacte complète (très haute priorité)
-            if query_lower == entry_question_lower:
-                score += 120  # Augmenté pour correspondance parfaite
-            elif query_lower in entry_question_lower:
-                # Correspondance partielle dans la question
-                if entry_question_lower.startswith(query_lower):
-                    score += 60  # Commence par la requête
-                elif entry_question_lower.endswith(query_lower):
-                    score += 50  # Se termine par la requête
-                else:
-                    score += 35  # Contient la requête
-            
-            # 2. Correspondance exacte inversée (question contient la requête)
-            if entry_question_lower in query_lower:
-                score += 35
-            
-            # 3. Score basé sur les mots individuels dans la question
-            question_words = re.findall(r'\b\w+\b', entry_question_lower)
-            matching_words = 0
-            for word in query_words:
-                if len(word) > 2:  # Ignorer les mots trop courts
-                    if word in question_words:
-                        matching_words += 1
-                        score += 8
-                    # Correspondance partielle de mot (stemming basique)
-                    elif any(qw.startswith(word[:4]) or word.startswith(qw[:4]) for qw in question_words if len(qw) > 3):
-                        score += 3
-            
-            # Bonus pour pourcentage de mots correspondants
-            if query_words and matching_words > 0:
-                match_percentage = matching_words / len(query_words)
-                score += match_percentage * 15
-            
-            # 4. Score basé sur les mots-clés
-            keyword_matches = 0
-            for keyword in entry.keywords:
-                keyword_lower = keyword.name.lower()
-                if keyword_lower in query_lower:
-                    keyword_matches += 1
-                    if keyword_lower == query_lower:
-                        score += 25  # Correspondance exacte du mot-clé
-                    else:
-                        score += 12  # Correspondance partielle
-                
-                # Correspondance de mots individuels avec les mots-clés
-                for word in query_words:
-                    if len(word) > 2 and word in keyword_lower:
-                        score += 6
-            
-            # 5. Score basé sur la réponse (plus faible priorité)
-            if query_lower in entry_answer_lower:
-                score += 5
-            
-            # Correspondance de mots dans la réponse
-            answer_word_matches = sum(1 for word in query_words 
-                                    if len(word) > 2 and word in entry_answer_lower)
-            score += answer_word_matches * 2
-            
-            # 6. Bonus pour langue spécifique vs multilingue
-            if is_specific_language:
-                score += 20
-            
-            # 7. Bonus pour priorité et usage
-            score += entry.priority * 2
-            score += min(entry.usage_count * 0.2, 8)  # Max 8 points bonus
-            
-            # 8. Bonus pour catégorie correspondante
-            if category and entry.category == category:
-                score += 15
-            
-            # 9. Pénalité pour réponses trop courtes ou vagues
-            if len(entry.answer) < 50:
-                score -= 5
-            
-            # 10. Bonus pour réponses détaillées
-            if len(entry.answer) > 200:
-                score += 5
-            
-            return score
-        
         # Collecter et scorer les entrées
         scored_entries = []
         
         # D'abord rechercher dans la langue spécifique
-        if domain_specific:
-            specific_entries = self.search(domain_specific)
-            for entry in specific_entries:
-                score = calculate_entry_score(entry, True)
-                if score > 0:
-                    scored_entries.append((score, entry, True))
+        for entry in specific_entries:
+            score = self._score_entry(entry, query_lower, query_words, query_analysis, category, True)
+            if score > 0:
+                scored_entries.append((score, entry, True))
         
         # Puis dans les entrées multilingues si nécessaire
-        if domain_multi and (not scored_entries or scored_entries[0][0] < 50):
-            multi_entries = self.search(domain_multi)
+        if multi_entries and (not scored_entries or scored_entries[0][0] < 50):
             for entry in multi_entries:
-                score = calculate_entry_score(entry, False)
+                score = self._score_entry(entry, query_lower, query_words, query_analysis, category, False)
                 if score > 0:
                     scored_entries.append((score, entry, False))
         
         # Trier par score décroissant
         scored_entries.sort(key=lambda x: x[0], reverse=True)
         
-        # Filtrer les doublons et retourner les résultats
-        seen_ids = set()
-        unique_entries = []
-        
-        for score, entry, is_specific in scored_entries:
-            if entry.id not in seen_ids and len(unique_entries) < limit:
-                seen_ids.add(entry.id)
-                unique_entries.append(entry)
-        
-        return unique_entries
+        if diagnostics is not None:
+            diagnostics.update({
+                'query_analysis': query_analysis,
+                'category': category,
+                'index_size': len(index),
+                'candidate_count': len(scored_entries),
+                'top': scored_entries[:EXPLAINED_CANDIDATES],
+            })
+        return scored_entries
+
+    @api.model
+    def _explain_candidates(self, query, diagnostics):
+        """Détail des composantes du score des meilleurs candidats d'une recherche"""
+        query_lower = query.lower().strip()
+        query_words = re.findall(r'\b\w+\b', query_lower)
+        explained = []
+        for score, entry, is_specific in diagnostics.get('top', []):
+            breakdown = {}
+            self._score_entry(entry, query_lower, query_words, diagnostics['query_analysis'],
+                              diagnostics.get('category'), is_specific, breakdown=breakdown)
+            explained.append({
+                'id': entry.id,
+                'question': entry.question,
+                'language': entry.language,
+                'score': round(score, 2),
+                'components': {name: round(value, 2) for name, value in breakdown.items()},
+            })
+        return explained
+
+    def _score_entry(self, entry, query_lower, query_words, query_analysis, category, is_specific_language=True,
+                     breakdown=None):
+        """Calculer le score pour une entrée de l'index avec validation de pertinence thématique
+
+        :param dict breakdown: si fourni, reçoit la contribution de chaque section au score
+        """
+        score = 0
+        entry_question_lower = entry.question_lower
+        entry_answer_lower = entry.answer_lower
+        
+        # 0. VALIDATION DE PERTINENCE THÉMATIQUE (nouveau)
+        # Vérifier si l'entrée correspond à l'intention détectée
+        intent_match_bonus = self._calculate_intent_relevance(
+            query_analysis, entry, entry_question_lower, entry_answer_lower
+        )
+        score += intent_match_bonus
+        
+        # Si pas de correspondance thématique minimum, réduire drastiquement
+        if intent_match_bonus < 5 and query_analysis['intent_confidence'] > 0.6:
+            score -= 50  # Pénalité pour manque de pertinence thématique
+        if breakdown is not None:
+            breakdown['intent'] = score
+        section_start = score
+        
+        # 1. Correspondance exacte complète (très haute priorité)
+        if query_lower == entry_question_lower:
+            score += 120  # Augmenté pour correspondance parfaite
+        elif query_lower in entry_question_lower:
+            # Correspondance partielle dans la question
+            if entry_question_lower.startswith(query_lower):
+                score += 60  # Commence par la requête
+            elif entry_question_lower.endswith(query_lower):
+                score += 50  # Se termine par la requête
+            else:
+                score += 35  # Contient la requête
+        
+        # 2. Correspondance exacte inversée (question contient la requête)
+        if entry_question_lower in query_lower:
+            score += 35
+        if breakdown is not None:
+            breakdown['question_match'] = score - section_start
+        section_start = score
+        
+        # 3. Score basé sur les mots individuels dans la question
+        question_words = entry.question_words
+        matching_words = 0
+        for word in query_words:
+            if len(word) > 2:  # Ignorer les mots trop courts
+                if word in question_words:
+                    matching_words += 1
+                    score += 8
+                # Correspondance partielle de mot (stemming basique)
+                elif any(qw.startswith(word[:4]) or word.startswith(qw[:4]) for qw in question_words if len(qw) > 3):
+                    score += 3
+        
+        # Bonus pour pourcentage de mots correspondants
+        if query_words and matching_words > 0:
+            match_percentage = matching_words / len(query_words)
+            score += match_percentage * 15
+        if breakdown is not None:
+            breakdown['question_words'] = score - section_start
+        section_start = score
+        
+        # 4. Score basé sur les mots-clés
+        for keyword_lower in entry.keyword_names:
+            if keyword_lower in query_lower:
+                if keyword_lower == query_lower:
+                    score += 25  # Correspondance exacte du mot-clé
+                else:
+                    score += 12  # Correspondance partielle
+            
+            # Correspondance de mots individuels avec les mots-clés
+            for word in query_words:
+                if len(word) > 2 and word in keyword_lower:
+                    score += 6
+        if breakdown is not None:
+            breakdown['keywords'] = score - section_start
+        section_start = score
+        
+        # 5. Score basé sur la réponse (plus faible priorité)
+        if query_lower in entry_answer_lower:
+            score += 5
+        
+        # Correspondance de mots dans la réponse
+        answer_word_matches = sum(1 for word in query_words 
+                                if len(word) > 2 and word in entry_answer_lower)
+        score += answer_word_matches * 2
+        if breakdown is not None:
+            breakdown['answer'] = score - section_start
+        section_start = score
+        
+        # 6. Bonus pour langue spécifique vs multilingue
+        if is_specific_language:
+            score += 20
+        if breakdown is not None:
+            breakdown['language'] = score - section_start
+        section_start = score
+        
+        # 7. Bonus pour priorité et usage
+        score += entry.priority * 2
+        score += min(entry.usage_count * 0.2, 8)  # Max 8 points bonus
+        if breakdown is not None:
+            breakdown['priority_usage'] = score - section_start
+        section_start = score
+        
+        # 8. Bonus pour catégorie correspondante
+        if category and entry.category == category:
+            score += 15
+        if breakdown is not None:
+            breakdown['category'] = score - section_start
+        section_start = score
+        
+        # 9. Pénalité pour réponses trop courtes ou vagues
+        if entry.answer_length < 50:
+            score -= 5
+        
+        # 10. Bonus pour réponses détaillées
+        if entry.answer_length > 200:
+            score += 5
+        if breakdown is not None:
+            breakdown['answer_length'] = score - section_start
+        
+        return score
+
+    @api.model
+    def _get_kb_version(self):
+        """Version de la base de connaissances (change à chaque modification des entrées)"""
+        return self.env['ai.knowledge.version']._get()
+
+    @api.model
+    def _bump_kb_version(self):
+        """Invalider l'index de recherche de tous les workers"""
+        if self.env.context.get('ai_kb_defer_index'):
+            return
+        self.env['ai.knowledge.version']._bump()
+
+    @api.model
+    def _get_search_index(self, language):
+        """Index en mémoire des entrées actives de la langue (et multilingues), trié selon _order"""
+        key = (self.env.cr.dbname, self._get_kb_version(), language)
+        return _search_index_cache.get_or_compute(key, lambda: self._build_search_index(language))
+
+    @api.model
+    def _get_suggest_index(self, language):
+        """Index de préfixes des questions actives, classées par priorité puis utilisation"""
+        key = (self.env.cr.dbname, self._get_kb_version(), language)
+        return _suggest_index_cache.get_or_compute(key, lambda: PrefixIndex([
+            ({'id': entry.id, 'question': entry.question}, entry.question, (entry.priority, entry.usage_count))
+            for entry in self._get_search_index(language)
+            if not INTERNAL_QUESTION_RE.match(entry.question)
+        ]))
+
+    @api.model
+    def suggest_questions(self, prefix, language, limit=8):
+        """Questions de la base commençant (à un début de mot) par prefix"""
+        return self._get_suggest_index(language).search(prefix, limit)
+
+    @api.model
+    def _build_search_index(self, language):
+        """Charger les entrées actives en deux requêtes et pré-calculer les textes normalisés"""
+        start = time.perf_counter()
+        domain = [('is_active', '=', True)]
+        if language != 'multi':
+            domain.append(('language', 'in', [language, 'multi']))
+        rows = self.sudo().search_read(domain, [
+            'question', 'answer', 'category', 'language', 'priority', 'usage_count', 'keywords'
+        ])
+        
+        keyword_ids = {kid for row in rows for kid in row['keywords']}
+        keyword_names = {
+            kw['id']: (kw['keyword'] or '').lower()
+            for kw in self.env['ai.knowledge.keyword'].sudo().browse(keyword_ids).read(['keyword'])
+        } if keyword_ids else {}
+        
+        index = []
+        for row in rows:
+            question = row['question'] or ''
+            answer = str(row['answer'] or '')
+            question_lower = question.lower()
+            index.append(IndexedEntry(
+                id=row['id'],
+                question=question,
+                question_lower=question_lower,
+                question_words=frozenset(re.findall(r'\b\w+\b', question_lower)),
+                answer_lower=answer.lower(),
+                answer_length=len(answer),
+                category=row['category'],
+                language=row['language'],
+                priority=row['priority'],
+                usage_count=row['usage_count'],
+                keyword_names=tuple(keyword_names[kid] for kid in row['keywords'] if kid in keyword_names),
+            ))
+        get_registry(self.env.cr.dbname).observe(
+            'ai_chat_index_build_seconds', time.perf_counter() - start, {'language': language}
+        )
+        return tuple(index)
 
     def _calculate_intent_relevance(self, query_analysis, entry, entry_question_lower, entry_answer_lower):
         """Calculer la pertinence thématique entre la question et l'entrée"""
@@ -702,122 +983,72 @@ class AIKnowledgeBase(models.Model):
 
     @api.model
     def get_marketing_insights(self):
-        """Obtenir des insights marketing"""
+        """Obtenir des insights marketing depuis l'instantané précalculé de la société"""
         try:
-            insights = {
-                'total_campaigns': 0,
-                'active_campaigns': [],
-                'avg_open_rate': 0,
-                'avg_reply_rate': 0,
-                'total_sent': 0,
-                'total_opened': 0,
-                'total_replied': 0,
-                'recommendations': []
-            }
-            
-            # Essayer d'obtenir des données de mass_mailing si disponible
-            if 'mailing.mailing' in self.env:
-                try:
-                    mailings = self.env['mailing.mailing'].search([])
-                    
-                    insights['total_campaigns'] = len(mailings)
-                    
-                    total_sent = sum(m.sent for m in mailings if m.sent > 0)
-                    total_opened = sum(m.opened for m in mailings if m.opened > 0)
-                    total_replied = sum(m.replied for m in mailings if m.replied > 0)
-                    
-                    insights.update({
-                        'total_sent': total_sent,
-                        'total_opened': total_opened,
-                        'total_replied': total_replied,
-                        'avg_open_rate': (total_opened / total_sent * 100) if total_sent > 0 else 0,
-                        'avg_reply_rate': (total_replied / total_sent * 100) if total_sent > 0 else 0,
-                    })
-                    
-                    # Campagnes actives
-                    active_campaigns = mailings.filtered(lambda m: m.state in ['running', 'done'])
-                    insights['active_campaigns'] = [{
-                        'id': c.id,
-                        'name': c.name,
-                        'state': c.state,
-                        'sent': c.sent,
-                        'opened': c.opened,
-                        'replied': c.replied
-                    } for c in active_campaigns[:5]]
-                    
-                except Exception as e:
-                    _logger.warning("Erreur accès mass_mailing: %s", e)
-            
-            return insights
-            
+            return self.env['ai.marketing.snapshot'].sudo()._get_insights(self.env.company)
         except Exception as e:
             _logger.error("Erreur get_marketing_insights: %s", e)
             return {'error': str(e)}
 
     @api.model
-    def get_campaign_recommendations(self):
-        """Générer des recommandations de campagne"""
-        recommendations = []
-        
-        try:
-            if 'mailing.mailing' in self.env:
-                mailings = self.env['mailing.mailing'].search([
-                    ('sent', '>', 0)
-                ], limit=10, order='create_date desc')
-                
-                for mailing in mailings:
-                    open_rate = (mailing.opened / mailing.sent * 100) if mailing.sent > 0 else 0
-                    reply_rate = (mailing.replied / mailing.sent * 100) if mailing.sent > 0 else 0
-                    
-                    if open_rate < 15:
-                        recommendations.append({
-                            'type': 'warning',
-                            'campaign_id': mailing.id,
-                            'campaign_name': mailing.name,
-                            'message': f"📉 Campagne '{mailing.name}' - Taux d'ouverture faible ({open_rate:.1f}%). Recommandation: Améliorer l'objet du mail.",
-                            'action': 'improve_subject'
-                        })
-                    
-                    if open_rate > 35:
-                        recommendations.append({
-                            'type': 'success',
-                            'campaign_id': mailing.id,
-                            'campaign_name': mailing.name,
-                            'message': f"🎯 Campagne '{mailing.name}' - Excellent taux d'ouverture ({open_rate:.1f}%)! Répliquez cette stratégie.",
-                            'action': 'replicate_strategy'
-                        })
-                    
-                    if open_rate > 20 and reply_rate < 5:
-                        recommendations.append({
-                            'type': 'info',
-                            'campaign_id': mailing.id,
-                            'campaign_name': mailing.name,
-                            'message': f"💡 Campagne '{mailing.name}' - Bon taux d'ouverture mais faible engagement. Améliorez le call-to-action.",
-                            'action': 'improve_cta'
-                        })
-        
-        except Exception as e:
-            _logger.warning("Erreur génération recommandations: %s", e)
+    def get_period_insights(self, timeframe=None):
+        """Obtenir les totaux marketing d'une période (aujourd'hui, semaine, mois...) depuis les agrégats quotidiens"""
+        return self.env['ai.marketing.daily.stat']._get_period_insights(timeframe, self.env.company)
+
+    @api.model
+    def analyze_campaigns(self, campaign_ids):
+        """Analyser une ou plusieurs campagnes (mailing.mailing) avec des requêtes agrégées"""
+        if 'mailing.mailing' not in self.env:
+            return {}
+        return self.env['ai.marketing.snapshot']._analyze_mailings(campaign_ids)
+
+    @api.model
+    def get_campaign_recommendations(self, offset=0, limit=5):
+        """Générer des recommandations de campagne classées par impact"""
+        return self.get_campaign_recommendations_page(offset=offset, limit=limit)['recommendations']
+
+    @api.model
+    def get_campaign_recommendations_page(self, offset=0, limit=5):
+        """Page de recommandations avec le nombre total, pour la pagination"""
+        if 'mailing.mailing' not in self.env:
             # Recommandations génériques si pas d'accès aux données
-            recommendations = [
-                {
-                    'type': 'info',
-                    'message': "📊 Analysez régulièrement vos métriques de campagne pour identifier les opportunités d'amélioration.",
-                    'action': 'analyze_metrics'
-                },
-                {
-                    'type': 'info', 
-                    'message': "🎯 Segmentez votre audience pour des messages plus personnalisés et un meilleur engagement.",
-                    'action': 'segment_audience'
-                },
-                {
-                    'type': 'info',
-                    'message': "📧 Testez différents objets de mail pour optimiser vos taux d'ouverture.",
-                    'action': 'test_subjects'
-                }
-            ]
+            return {'total': len(GENERIC_RECOMMENDATIONS), 'recommendations': GENERIC_RECOMMENDATIONS[offset:offset + limit]}
         
-        return recommendations[:5]  # Limiter à 5 recommandations
+        total, recommendations = self.env['ai.recommendation.rule'].sudo()._evaluate(
+            self.env.company, offset=offset, limit=limit
+        )
+        return {'total': total, 'recommendations': recommendations}
+
+class AIKnowledgeVersion(models.Model):
+    """Version de la base de connaissances (une seule ligne)
+
+    Table dédiée plutôt qu'un paramètre système : set_param viderait le cache
+    du registre dans tous les workers à chaque modification d'une entrée. La
+    mise à jour reste transactionnelle, contrairement à une séquence : un autre
+    worker ne voit la nouvelle version qu'une fois les entrées validées.
+    """
+    _name = 'ai.knowledge.version'
+    _description = 'Version de la base de connaissances'
+    _log_access = False
+
+    version = fields.Char(string='Version', readonly=True)
+
+    def init(self):
+        self.env.cr.execute(f"""
+            INSERT INTO {self._table} (version)
+            SELECT %s WHERE NOT EXISTS (SELECT 1 FROM {self._table})
+        """, [uuid.uuid4().hex[:12]])
+
+    @api.model
+    def _get(self):
+        self.env.cr.execute(f"SELECT version FROM {self._table} ORDER BY id LIMIT 1")
+        row = self.env.cr.fetchone()
+        return row[0] if row else '0'
+
+    @api.model
+    def _bump(self):
+        self.env.cr.execute(f"UPDATE {self._table} SET version = %s", [uuid.uuid4().hex[:12]])
+
 
 class AIKnowledgeKeyword(models.Model):
     _name = 'ai.knowledge.keyword'
@@ -861,6 +1092,22 @@ class AIKnowledgeKeyword(models.Model):
         default=True
     )
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['ai.knowledge.base']._bump_kb_version()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['ai.knowledge.base']._bump_kb_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env['ai.knowledge.base']._bump_kb_version()
+        return res
+
     @api.model
     def get_keyword_variants(self, keyword):
         """Récupérer les variantes d'un mot-clé"""
@@ -957,11 +1204,65 @@ class AIChatSession(models.Model):
     message_ids = fields.One2many('ai.chat.message', 'session_id', string='Messages')
     message_count = fields.Integer(string='Nombre de messages', compute='_compute_message_count')
     metadata = fields.Text(string='Métadonnées', help="Données JSON pour contexte supplémentaire")
+    token = fields.Char(string='Jeton', index=True, copy=False, readonly=True,
+                        help="Nonce du jeton émis par /ai_chat/bootstrap ; la session est créée au premier message")
+
+    _sql_constraints = [
+        ('token_uniq', 'unique(token)', 'Ce jeton de session est déjà utilisé.'),
+    ]
+
+    @api.model
+    def _touch_activity(self, session_id):
+        """Noter l'activité de la session ; écrite en lot au plus toutes les N secondes"""
+        interval = int(self.env['ir.config_parameter'].sudo().get_param(ACTIVITY_FLUSH_PARAM, 30))
+        dbname = self.env.cr.dbname
+        if _activity_buffer.touch(dbname, session_id, fields.Datetime.now(), interval):
+            self._flush_activity(_activity_buffer.drain(dbname))
+
+    @api.model
+    def _flush_activity(self, pending):
+        """Écrire last_activity de plusieurs sessions en une seule requête"""
+        if not pending:
+            return
+        session_ids, timestamps = zip(*pending.items())
+        self.env.cr.execute("""
+            UPDATE ai_chat_session s
+               SET last_activity = v.ts
+              FROM unnest(%s::int[], %s::timestamp[]) AS v(id, ts)
+             WHERE s.id = v.id
+               AND (s.last_activity IS NULL OR s.last_activity < v.ts)
+        """, [list(session_ids), list(timestamps)])
+        self.browse(session_ids).invalidate_recordset(['last_activity'])
+
+    @api.model
+    def _cron_sync_activity(self):
+        """Cron : rattraper last_activity depuis les derniers messages (tampons non vidés des workers)"""
+        since = fields.Datetime.now() - timedelta(minutes=30)
+        self.env.cr.execute("""
+            UPDATE ai_chat_session s
+               SET last_activity = m.last_ts
+              FROM (SELECT session_id, MAX(timestamp) AS last_ts
+                      FROM ai_chat_message
+                     WHERE timestamp > %s
+                  GROUP BY session_id) m
+             WHERE s.id = m.session_id
+               AND (s.last_activity IS NULL OR s.last_activity < m.last_ts)
+        """, [since])
+        self.invalidate_model(['last_activity'])
 
     @api.depends('message_ids')
     def _compute_message_count(self):
+        """Compter les messages de toutes les sessions en une seule requête groupée"""
+        counts = {}
+        if self.ids:
+            counts = {
+                session.id: count
+                for session, count in self.env['ai.chat.message']._read_group(
+                    [('session_id', 'in', self.ids)], ['session_id'], ['__count']
+                )
+            }
         for session in self:
-            session.message_count = len(session.message_ids)
+            session.message_count = counts.get(session.id, 0)
 
     def action_view_messages(self):
         """Action pour voir les messages de cette session"""
@@ -979,6 +1280,7 @@ class AIChatMessage(models.Model):
     _description = 'Message de Chat AI'
     _order = 'timestamp desc'
 
+    # Indexé avec timestamp et id (voir init), pour le comptage et l'historique paginé
     session_id = fields.Many2one('ai.chat.session', string='Session', required=True, ondelete='cascade')
     message_type = fields.Selection([
         ('user', 'Utilisateur'),
@@ -987,28 +1289,125 @@ class AIChatMessage(models.Model):
     
     message = fields.Text(string='Message', required=True)
     user_id = fields.Many2one('res.users', string='Utilisateur', required=True, default=lambda self: self.env.user)
-    timestamp = fields.Datetime(string='Horodatage', default=fields.Datetime.now)
+    timestamp = fields.Datetime(string='Horodatage', default=fields.Datetime.now, index=True)
     response_time = fields.Float(string='Temps de réponse (s)', help="Temps de réponse en secondes")
     confidence_score = fields.Float(string='Score de confiance', help="Score de confiance de la réponse IA")
     metadata = fields.Text(string='Métadonnées', help="Données JSON supplémentaires")
+    # Copies indexées des clés de metadata les plus filtrées (réponses du bot)
+    knowledge_base_id = fields.Many2one('ai.knowledge.base', string='Entrée utilisée', index=True, ondelete='set null')
+    source = fields.Char(string='Source', index=True)
+    fallback_type = fields.Char(string='Type de fallback', index=True)
+    intent = fields.Char(string='Intention', index=True)
+    final_language = fields.Char(string='Langue de réponse', index=True)
+    stage_ids = fields.One2many('ai.chat.message.stage', 'message_id', string='Durées par étape')
+
+    def init(self):
+        # Historique paginé par clé (session, timestamp, id) ; sert aussi au comptage par session
+        create_index(self.env.cr, 'ai_chat_message_session_timestamp_id_idx', self._table,
+                     ['session_id', 'timestamp DESC', 'id DESC'])
+
+    @api.model
+    def _export_logs(self, fmt='jsonl', date_from=None, date_to=None, language=None, source=None,
+                     message_type=None, min_confidence=None, max_confidence=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Exporter les messages en JSONL ou CSV compressé gzip, par morceaux d'octets
+
+        Les lignes sont lues par un curseur serveur (DECLARE / FETCH) et
+        compressées au fil de l'eau : la mémoire reste constante quel que soit
+        le nombre de messages. Depuis `odoo-bin shell` :
+
+            env['ai.chat.message']._export_logs_to_file('/tmp/chat.jsonl.gz', date_from='2024-01-01')
+
+        :return: générateur de morceaux gzip
+        """
+        if not self.env.is_superuser() and not self.env.user.has_group('base.group_system'):
+            raise AccessError("Seuls les administrateurs peuvent exporter l'historique du chat.")
+        if fmt not in EXPORT_FORMATS:
+            raise UserError(f"Format d'export inconnu : {fmt}")
+
+        conditions, params = [], []
+        for column, operator, value in [
+            ('timestamp', '>=', fields.Datetime.to_datetime(date_from) if date_from else None),
+            ('timestamp', '<', fields.Datetime.to_datetime(date_to) if date_to else None),
+            ('final_language', '=', language),
+            ('source', '=', source),
+            ('message_type', '=', message_type),
+            ('confidence_score', '>=', min_confidence),
+            ('confidence_score', '<=', max_confidence),
+        ]:
+            if value not in (None, False, ''):
+                conditions.append(f"{column} {operator} %s")
+                params.append(value)
+        where = ' AND '.join(conditions) or 'TRUE'
+
+        self.env.flush_all()
+        cr = self.env.cr
+        cursor_name = f"ai_chat_export_{uuid.uuid4().hex}"
+        cr.execute(f"""
+            DECLARE {cursor_name} NO SCROLL CURSOR FOR
+            SELECT {', '.join(EXPORT_COLUMNS)}
+              FROM ai_chat_message
+             WHERE {where}
+          ORDER BY id
+        """, params)
+
+        # wbits=31 : en-tête et contrôle gzip, lisible par gunzip / pandas
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        try:
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerow(EXPORT_COLUMNS)
+                yield compressor.compress(buffer.getvalue().encode())
+            while True:
+                cr.execute(f"FETCH FORWARD %s FROM {cursor_name}", [chunk_size])
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                buffer = io.StringIO()
+                if fmt == 'csv':
+                    csv.writer(buffer).writerows(rows)
+                else:
+                    for row in rows:
+                        buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False, default=str))
+                        buffer.write('\n')
+                data = compressor.compress(buffer.getvalue().encode())
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            if not cr.closed:
+                cr.execute(f"CLOSE {cursor_name}")
+
+    @api.model
+    def _export_logs_to_file(self, path, fmt='jsonl', **filters):
+        """Écrire l'export compressé dans un fichier ; retourne le nombre d'octets écrits"""
+        size = 0
+        with open(path, 'wb') as handle:
+            for chunk in self._export_logs(fmt, **filters):
+                handle.write(chunk)
+                size += len(chunk)
+        _logger.info("Export de l'historique du chat : %s octets écrits dans %s", size, path)
+        return size
 
     @api.model
     def create_chat_response(self, user_message, session_id, language='en'):
         """Créer une réponse de chat avec IA améliorée et respect de la langue"""
         start_time = datetime.now()
+        timer = StageTimer(self.env.cr)
         
         try:
             # Enregistrer le message utilisateur
-            user_msg = self.create({
-                'session_id': session_id,
-                'message_type': 'user',
-                'message': user_message,
-                'user_id': self.env.user.id,
-                'timestamp': start_time
-            })
+            with timer.span('persist_user'):
+                user_msg = self.create({
+                    'session_id': session_id,
+                    'message_type': 'user',
+                    'message': user_message,
+                    'user_id': self.env.user.id,
+                    'timestamp': start_time
+                })
             
             # Détecter la langue de façon obligatoire pour assurer la cohérence
-            detected_language = self._detect_language(user_message)
+            with timer.span('language_detection'):
+                detected_language = self._detect_language(user_message)
             
             # Utiliser la langue détectée en priorité sur celle fournie
             final_language = detected_language if detected_language else (language or 'en')
@@ -1016,54 +1415,63 @@ class AIChatMessage(models.Model):
             _logger.info("Message: '%s' | Langue détectée: '%s' | Langue finale: '%s'", user_message, detected_language, final_language)
             
             # Analyser la requête pour extraire l'intention et les entités
-            query_analysis = self.env['ai.knowledge.base']._extract_intent_and_entities(user_message, final_language)
+            with timer.span('intent_analysis'):
+                query_analysis = self.env['ai.knowledge.base']._extract_intent_and_entities(user_message, final_language)
             
             # Rechercher dans la base de connaissances avec langue stricte
-            knowledge_entries = self.env['ai.knowledge.base'].search_knowledge(
-                user_message, 
-                language=final_language,
-                limit=5  # Augmenter pour plus d'options
-            )
+            diagnostics = {}
+            with timer.span('retrieval'):
+                knowledge_entries = self.env['ai.knowledge.base'].search_knowledge(
+                    user_message, 
+                    language=final_language,
+                    limit=5,  # Augmenter pour plus d'options
+                    diagnostics=diagnostics
+                )
             
             response_data = {}
+            relevance_check = None
             
             if knowledge_entries:
                 best_match = knowledge_entries[0]
                 
                 # VALIDATION FINALE DE PERTINENCE
-                relevance_check = self._validate_response_relevance(
-                    user_message, best_match, query_analysis, final_language
-                )
+                with timer.span('validation'):
+                    relevance_check = self._validate_response_relevance(
+                        user_message, best_match, query_analysis, final_language
+                    )
                 
                 if not relevance_check['is_relevant']:
                     # Si pas pertinent, chercher une alternative ou utiliser fallback
                     _logger.info("Réponse non pertinente détectée, recherche alternative...")
                     
                     # Essayer avec des critères plus stricts
-                    alternative_entries = self.env['ai.knowledge.base'].search_knowledge(
-                        user_message,
-                        language=final_language,
-                        category=query_analysis['intent'].replace('get_', '').replace('create_', ''),
-                        limit=3
-                    )
+                    with timer.span('retrieval_alternative'):
+                        alternative_entries = self.env['ai.knowledge.base'].search_knowledge(
+                            user_message,
+                            language=final_language,
+                            category=query_analysis['intent'].replace('get_', '').replace('create_', ''),
+                            limit=3
+                        )
                     
                     best_alternative = None
-                    for entry in alternative_entries:
-                        alt_check = self._validate_response_relevance(
-                            user_message, entry, query_analysis, final_language
-                        )
-                        if alt_check['is_relevant']:
-                            best_alternative = entry
-                            break
+                    with timer.span('validation_alternative'):
+                        for entry in alternative_entries:
+                            alt_check = self._validate_response_relevance(
+                                user_message, entry, query_analysis, final_language
+                            )
+                            if alt_check['is_relevant']:
+                                best_alternative = entry
+                                break
                     
                     if best_alternative:
                         best_match = best_alternative
                         confidence = 0.75
                     else:
                         # Utiliser fallback intelligent spécifique au domaine DE LA BASE DE DONNÉES
-                        response_message = self._get_database_fallback(
-                            query_analysis, final_language
-                        )
+                        with timer.span('fallback'):
+                            response_message = self._get_database_fallback(
+                                query_analysis, final_language
+                            )
                         confidence = 0.4
                         quick_actions = self._get_language_specific_quick_actions(final_language)
                         
@@ -1080,16 +1488,12 @@ class AIChatMessage(models.Model):
                         
                         # Enregistrer directement le fallback et retourner
                         response_time = (datetime.now() - start_time).total_seconds()
-                        bot_msg = self.create({
-                            'session_id': session_id,
-                            'message_type': 'bot',
-                            'message': response_message,
-                            'user_id': self.env.user.id,
-                            'timestamp': datetime.now(),
-                            'response_time': response_time,
-                            'confidence_score': confidence,
-                            'metadata': json.dumps(response_data)
-                        })
+                        with timer.span('persist_bot'):
+                            bot_msg = self.create(self._bot_message_vals(
+                                session_id, response_message, response_time, confidence,
+                                response_data, query_analysis['intent']
+                            ))
+                        self._record_turn(timer, bot_msg, user_message, final_language, diagnostics, relevance_check)
                         
                         return {
                             'response': response_message,
@@ -1101,29 +1505,34 @@ class AIChatMessage(models.Model):
                 # Vérifier que la réponse est dans la bonne langue
                 if best_match.language != final_language and best_match.language != 'multi':
                     # Si la langue ne correspond pas, chercher spécifiquement dans cette langue
-                    lang_specific = self.env['ai.knowledge.base'].search_knowledge(
-                        user_message,
-                        language=final_language,
-                        limit=1
-                    )
+                    with timer.span('retrieval_language'):
+                        lang_specific = self.env['ai.knowledge.base'].search_knowledge(
+                            user_message,
+                            language=final_language,
+                            limit=1
+                        )
                     if lang_specific:
                         best_match = lang_specific[0]
                 
-                best_match.increment_usage()
-                
-                # Formater la réponse avec données dynamiques
-                response_message = self._format_response_with_data(
-                    best_match.answer, 
-                    best_match.category
-                )
+                with timer.span('usage'):
+                    best_match.increment_usage()
                 
-                # S'assurer que la réponse finale est dans la bonne langue
-                if not self._is_response_in_correct_language(response_message, final_language):
-                    response_message = self._translate_or_fallback_response(
-                        response_message, 
-                        final_language,
-                        user_message
+                # Formater la réponse avec données dynamiques (sur la période demandée le cas échéant)
+                timeframes = query_analysis['entities'].get('timeframes') or [None]
+                with timer.span('formatting'):
+                    response_message = self._format_response_with_data(
+                        best_match.answer, 
+                        best_match.category,
+                        timeframe=timeframes[0]
                     )
+                    
+                    # S'assurer que la réponse finale est dans la bonne langue
+                    if not self._is_response_in_correct_language(response_message, final_language):
+                        response_message = self._translate_or_fallback_response(
+                            response_message, 
+                            final_language,
+                            user_message
+                        )
                 
                 confidence = relevance_check['confidence_score']
                 quick_actions = self._get_language_specific_quick_actions(final_language)
@@ -1135,11 +1544,14 @@ class AIChatMessage(models.Model):
                     'category': best_match.category,
                     'confidence': confidence,
                     'quick_actions': quick_actions,
-                    'source_language': best_match.language
+                    'source_language': best_match.language,
+                    # Réponse fixe (sans insights en direct) : réutilisable par le cache du widget
+                    'cacheable': not compile_answer_template(best_match.answer or '', ANSWER_TEMPLATE_FIELDS)
                 }
             else:
                 # Réponse de fallback intelligente DE LA BASE DE DONNÉES
-                response_message = self._get_database_fallback(query_analysis, final_language)
+                with timer.span('fallback'):
+                    response_message = self._get_database_fallback(query_analysis, final_language)
                 confidence = 0.2
                 quick_actions = self._get_language_specific_quick_actions(final_language)
                 
@@ -1157,16 +1569,12 @@ class AIChatMessage(models.Model):
             response_time = (datetime.now() - start_time).total_seconds()
             
             # Enregistrer la réponse du bot
-            bot_msg = self.create({
-                'session_id': session_id,
-                'message_type': 'bot',
-                'message': response_message,
-                'user_id': self.env.user.id,
-                'timestamp': datetime.now(),
-                'response_time': response_time,
-                'confidence_score': confidence,
-                'metadata': json.dumps(response_data)
-            })
+            with timer.span('persist_bot'):
+                bot_msg = self.create(self._bot_message_vals(
+                    session_id, response_message, response_time, confidence,
+                    response_data, query_analysis['intent']
+                ))
+            self._record_turn(timer, bot_msg, user_message, final_language, diagnostics, relevance_check)
             
             return {
                 'response': response_message,
@@ -1186,16 +1594,50 @@ class AIChatMessage(models.Model):
                 'quick_actions': self._get_language_specific_quick_actions(error_language)
             }
 
-    def _format_response_with_data(self, template_response, category):
+    def _bot_message_vals(self, session_id, response_message, response_time, confidence, response_data, intent):
+        """Valeurs du message bot : métadonnées JSON et colonnes indexées correspondantes"""
+        return {
+            'session_id': session_id,
+            'message_type': 'bot',
+            'message': response_message,
+            'user_id': self.env.user.id,
+            'timestamp': datetime.now(),
+            'response_time': response_time,
+            'confidence_score': confidence,
+            'metadata': json.dumps(response_data),
+            'knowledge_base_id': response_data.get('knowledge_base_id', False),
+            'source': response_data.get('source', 'knowledge_base'),
+            'fallback_type': response_data.get('fallback_type', False),
+            'intent': intent,
+            'final_language': response_data.get('final_language', False),
+        }
+
+    def _record_turn(self, timer, bot_msg, user_message, language, diagnostics, relevance_check):
+        """Enregistrer les durées d'étapes et capturer le tour s'il est trop lent"""
+        self.env['ai.chat.message.stage']._record('chat', timer, bot_msg)
+        self.env['ai.chat.slow.turn']._capture_if_slow(
+            'chat', timer, user_message, language, diagnostics,
+            relevance=relevance_check, bot_message=bot_msg
+        )
+
+    def _format_response_with_data(self, template_response, category, timeframe=None):
         """Formater la réponse avec des données réelles"""
+        # Ne calculer les insights que si la réponse référence réellement des champs d'insights
+        used_fields = compile_answer_template(template_response or '', ANSWER_TEMPLATE_FIELDS)
+        if not used_fields:
+            return template_response
+        
+        knowledge_base = self.env['ai.knowledge.base']
+        insights = {}
+        if used_fields & INSIGHT_FIELDS:
+            insights.update(knowledge_base.get_marketing_insights())
+        if used_fields & PERIOD_INSIGHT_FIELDS:
+            # Agrégats quotidiens : quelques lignes lues, jamais les traces brutes
+            insights.update(knowledge_base.get_period_insights(timeframe))
         try:
-            if '{' in template_response:
-                # Obtenir les insights marketing réels
-                insights = self.env['ai.knowledge.base'].get_marketing_insights()
-                formatted_response = template_response.format(**insights)
-                return formatted_response
-        except Exception:
-            pass
+            return template_response.format(**insights)
+        except (KeyError, IndexError, ValueError, TypeError) as e:
+            _logger.warning("Réponse non formatable avec les insights: %s", e)
         
         return template_response
 
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, Command
+import logging
+import time
+
+from ..tools.minhash import find_clusters
+
+_logger = logging.getLogger(__name__)
+
+# Similarité de Jaccard estimée (question + réponse) à partir de laquelle deux entrées sont des doublons
+DUPLICATE_THRESHOLD_PARAM = 'ai_chat_assistant.duplicate_threshold'   # (0.8)
+
+
+class AIKnowledgeDuplicateCluster(models.Model):
+    _name = 'ai.knowledge.duplicate.cluster'
+    _description = 'Groupe de quasi-doublons de la base de connaissances'
+    _order = 'size desc, similarity desc, id'
+
+    entry_ids = fields.Many2many('ai.knowledge.base', string='Entrées')
+    master_id = fields.Many2one('ai.knowledge.base', string='Entrée conservée', ondelete='set null',
+                                help="Entrée gardée à la fusion : mots-clés et utilisations des autres y sont reportés")
+    size = fields.Integer(string='Taille', readonly=True)
+    similarity = fields.Float(string='Similarité estimée', digits=(3, 2), readonly=True,
+                              help="Plus faible similarité estimée entre deux entrées rapprochées du groupe")
+    state = fields.Selection([
+        ('open', 'À traiter'),
+        ('merged', 'Fusionné'),
+        ('ignored', 'Ignoré'),
+    ], string='État', default='open', required=True)
+
+    @api.model
+    def _cron_detect_duplicates(self):
+        self.action_detect_duplicates()
+
+    @api.model
+    def action_detect_duplicates(self):
+        """Recalculer les groupes à traiter (MinHash + LSH sur les entrées actives)"""
+        started = time.perf_counter()
+        threshold = float(self.env['ir.config_parameter'].sudo().get_param(DUPLICATE_THRESHOLD_PARAM, 0.8))
+        self.env['ai.knowledge.base'].flush_model(['question', 'answer', 'priority', 'usage_count', 'is_active'])
+        self.env.cr.execute("""
+            SELECT id, question, answer, priority, usage_count
+              FROM ai_knowledge_base
+             WHERE is_active
+        """)
+        texts, rank = {}, {}
+        for entry_id, question, answer, priority, usage_count in self.env.cr.fetchall():
+            texts[entry_id] = f"{question} {answer or ''}"
+            rank[entry_id] = (priority or 0, usage_count or 0, -entry_id)
+        clusters = find_clusters(texts, threshold=threshold)
+
+        # Les groupes déjà écartés ne sont pas signalés à nouveau
+        ignored = {tuple(sorted(cluster.entry_ids.ids)) for cluster in self.search([('state', '=', 'ignored')])}
+        self.search([('state', '=', 'open')]).unlink()
+        created = self.create([{
+            'entry_ids': [Command.set(entry_ids)],
+            'master_id': max(entry_ids, key=rank.get),
+            'size': len(entry_ids),
+            'similarity': similarity,
+        } for entry_ids, similarity in clusters if tuple(entry_ids) not in ignored])
+        _logger.info("Doublons base de connaissances : %s groupe(s) sur %s entrée(s) en %.1fs",
+                     len(created), len(texts), time.perf_counter() - started)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'reload',
+        }
+
+    def action_merge(self):
+        """Garder l'entrée principale, lui reporter mots-clés et utilisations, archiver les autres"""
+        knowledge_base = self.env['ai.knowledge.base'].with_context(ai_kb_defer_index=True)
+        for cluster in self.filtered(lambda c: c.state == 'open'):
+            master = knowledge_base.browse((cluster.master_id or cluster.entry_ids[:1]).id)
+            others = knowledge_base.browse((cluster.entry_ids - cluster.master_id).ids) - master
+            if master and others:
+                master.write({
+                    'keywords': [Command.link(keyword.id) for keyword in others.keywords],
+                    'priority': max([master.priority] + others.mapped('priority')),
+                    'usage_count': master.usage_count + sum(others.mapped('usage_count')),
+                })
+                others.write({'is_active': False})
+            cluster.state = 'merged'
+        # Une seule nouvelle version de la base pour tous les groupes fusionnés
+        self.env['ai.knowledge.base']._bump_kb_version()
+
+    def action_ignore(self):
+        self.write({'state': 'ignored'})
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api, Command
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+import csv
+import io
+import json
+import logging
+import time
+
+from ..tools.base64_stream import open_base64
+
+_logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_BATCH_SIZE = 1000
+# Lignes en erreur conservées dans le rapport (les suivantes sont seulement comptées)
+MAX_REPORTED_ERRORS = 50
+# Les mots-clés n'ont pas de langue « multi »
+KEYWORD_DEFAULT_LANGUAGE = 'fr'
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'oui', 'vrai'}
+
+
+def _guess_format(filename):
+    return 'jsonl' if (filename or '').lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+class AIKnowledgeImportWizard(models.TransientModel):
+    _name = 'ai.knowledge.import.wizard'
+    _description = 'Import en masse de la base de connaissances (CSV / JSON Lines)'
+
+    file = fields.Binary(string='Fichier', required=True)
+    filename = fields.Char(string='Nom du fichier')
+    file_format = fields.Selection([
+        ('auto', 'Selon l\'extension'),
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ], string='Format', default='auto', required=True)
+    batch_size = fields.Integer(string='Taille des lots', default=IMPORT_BATCH_SIZE)
+    state = fields.Selection([
+        ('draft', 'À importer'),
+        ('done', 'Terminé'),
+    ], default='draft')
+    created_count = fields.Integer(string='Entrées créées', readonly=True)
+    updated_count = fields.Integer(string='Entrées mises à jour', readonly=True)
+    skipped_count = fields.Integer(string='Lignes ignorées', readonly=True)
+    keyword_created_count = fields.Integer(string='Mots-clés créés', readonly=True)
+    duration = fields.Float(string='Durée (s)', readonly=True)
+    error_log = fields.Text(string='Erreurs', readonly=True)
+
+    def action_import(self):
+        self.ensure_one()
+        fmt = _guess_format(self.filename) if self.file_format == 'auto' else self.file_format
+        # Décodage base64 au fil de la lecture : pas de seconde copie complète du fichier
+        stats = self._import_stream(open_base64(self.file), fmt, self.batch_size)
+        self.write({
+            'state': 'done',
+            'file': False,
+            'created_count': stats['created'],
+            'updated_count': stats['updated'],
+            'skipped_count': stats['skipped'],
+            'keyword_created_count': stats['keywords_created'],
+            'duration': stats['duration'],
+            'error_log': '\n'.join(stats['errors']),
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    @api.model
+    def _import_file(self, path, fmt=None, batch_size=IMPORT_BATCH_SIZE):
+        """Importer un fichier du serveur (shell odoo, gros volumes sans passer par le navigateur)"""
+        with open(path, 'rb') as handle:
+            return self._import_stream(handle, fmt or _guess_format(path), batch_size)
+
+    @api.model
+    def _import_stream(self, fileobj, fmt, batch_size=IMPORT_BATCH_SIZE):
+        """Importer un flux CSV / JSON Lines par lots, sans le charger entièrement
+
+        Colonnes : external_key, question, answer (obligatoires), category,
+        language, priority, is_active, campaign_references et keywords (séparés
+        par « ; » en CSV, liste ou chaîne en JSON). Une clé externe déjà présente
+        met l'entrée à jour (en SQL, une requête par jeu de colonnes) ; les autres
+        sont créées par un seul create() par lot.
+        La version de la base (et donc l'index de recherche) ne change qu'une
+        fois, à la fin.
+        """
+        if fmt not in IMPORT_FORMATS:
+            raise UserError(f"Format d'import inconnu : {fmt}")
+        if not self.env.user.has_group('base.group_system'):
+            raise UserError("L'import de la base de connaissances est réservé aux administrateurs.")
+        batch_size = max(batch_size or IMPORT_BATCH_SIZE, 1)
+        stats = {'created': 0, 'updated': 0, 'skipped': 0, 'keywords_created': 0, 'errors': []}
+        started = time.perf_counter()
+        knowledge_base = self.env['ai.knowledge.base'].with_context(ai_kb_defer_index=True)
+        selections = {
+            name: set(knowledge_base._fields[name].get_values(self.env))
+            for name in ('category', 'language')
+        }
+        selections['keyword_language'] = set(
+            self.env['ai.knowledge.keyword']._fields['language'].get_values(self.env))
+
+        batch = []
+        for line_number, raw in self._read_rows(fileobj, fmt):
+            try:
+                batch.append(self._prepare_row(raw, selections))
+            except (ValueError, TypeError, OverflowError) as e:
+                # Une ligne invalide est ignorée sans annuler les lots déjà importés
+                self._report_error(stats, line_number, e)
+            if len(batch) >= batch_size:
+                self._import_batch(knowledge_base, batch, stats)
+                batch = []
+        if batch:
+            self._import_batch(knowledge_base, batch, stats)
+
+        # Une seule nouvelle version : l'index de recherche est reconstruit une fois
+        self.env['ai.knowledge.base']._bump_kb_version()
+        stats['duration'] = round(time.perf_counter() - started, 2)
+        _logger.info("Import base de connaissances : %s créée(s), %s mise(s) à jour, %s ignorée(s), "
+                     "%s mot(s)-clé(s) créé(s) en %ss", stats['created'], stats['updated'],
+                     stats['skipped'], stats['keywords_created'], stats['duration'])
+        return stats
+
+    @api.model
+    def _read_rows(self, fileobj, fmt):
+        """(numéro de ligne, dict ou texte JSON) lus au fil de l'eau"""
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(text, 1):
+                if line.strip():
+                    yield line_number, line
+
+    @api.model
+    def _prepare_row(self, raw, selections):
+        """(clé externe, valeurs, mots-clés ou None) ; ValueError si la ligne est invalide"""
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+            if not isinstance(raw, dict):
+                raise ValueError("objet JSON attendu")
+        key = str(raw.get('external_key') or '').strip()
+        if not key:
+            raise ValueError("external_key manquant")
+        vals = {}
+        for name in ('question', 'answer'):
+            value = str(raw.get(name) or '').strip()
+            if not value:
+                raise ValueError(f"{name} manquant")
+            vals[name] = value
+        for name, default in (('category', 'general'), ('language', 'multi')):
+            value = str(raw.get(name) or default).strip()
+            if value not in selections[name]:
+                raise ValueError(f"{name} invalide : {value}")
+            vals[name] = value
+        if raw.get('priority') not in (None, ''):
+            if isinstance(raw['priority'], bool) or not isinstance(raw['priority'], (int, float, str)):
+                raise ValueError("priority doit être un nombre")
+            vals['priority'] = int(raw['priority'])
+            if not -2 ** 31 <= vals['priority'] < 2 ** 31:
+                raise ValueError("priority hors limites")
+        if raw.get('is_active') not in (None, ''):
+            is_active = raw['is_active']
+            vals['is_active'] = is_active if isinstance(is_active, bool) else str(is_active).strip().lower() in TRUE_VALUES
+        if raw.get('campaign_references') is not None:
+            if not isinstance(raw['campaign_references'], str):
+                raise ValueError("campaign_references doit être une chaîne")
+            vals['campaign_references'] = raw['campaign_references'] or False
+
+        keywords = raw.get('keywords')
+        if keywords is not None:
+            if isinstance(keywords, str):
+                keywords = keywords.split(';')
+            elif not isinstance(keywords, list):
+                raise ValueError("keywords doit être une liste ou une chaîne")
+            language = vals['language'] if vals['language'] in selections['keyword_language'] else KEYWORD_DEFAULT_LANGUAGE
+            keywords = list(dict.fromkeys(
+                (str(keyword).strip(), language) for keyword in keywords if str(keyword).strip()
+            ))
+        return key, vals, keywords
+
+    @api.model
+    def _import_batch(self, knowledge_base, batch, stats):
+        # Une clé répétée dans le lot : la dernière ligne l'emporte
+        rows = {key: (vals, keywords) for key, vals, keywords in batch}
+        stats['skipped'] += len(batch) - len(rows)
+
+        keyword_ids = self._resolve_keywords(
+            {keyword for _vals, keywords in rows.values() for keyword in keywords or ()}, stats)
+        existing = {
+            record['external_key']: record['id']
+            for record in knowledge_base.search_read([('external_key', 'in', list(rows))], ['external_key'])
+        }
+
+        to_create, to_update = [], []
+        for key, (vals, keywords) in rows.items():
+            if keywords is not None:
+                keywords = [keyword_ids[keyword] for keyword in keywords]
+            if key in existing:
+                to_update.append((existing[key], vals, keywords))
+            else:
+                if keywords is not None:
+                    vals['keywords'] = [Command.set(keywords)]
+                vals['external_key'] = key
+                to_create.append(vals)
+        if to_create:
+            knowledge_base.create(to_create)
+            stats['created'] += len(to_create)
+        if to_update:
+            self._update_entries(knowledge_base, to_update)
+            stats['updated'] += len(to_update)
+
+        # Écrire le lot et vider le cache de l'ORM : mémoire constante quel que soit le fichier
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+    @api.model
+    def _update_entries(self, knowledge_base, updates):
+        """Mettre à jour les entrées existantes : un UPDATE par jeu de colonnes
+
+        Les valeurs passent par convert_to_column (nettoyage HTML de la réponse
+        compris). Les mots-clés fournis remplacent ceux de l'entrée. La version de
+        la base n'est changée qu'une fois, à la fin de l'import.
+        """
+        self.env.flush_all()
+        by_columns = {}
+        for record_id, vals, _keywords in updates:
+            by_columns.setdefault(tuple(sorted(vals)), []).append((record_id, vals))
+        for names, rows in by_columns.items():
+            columns = [knowledge_base._fields[name] for name in names]
+            values = SQL(", ").join(
+                SQL("(%s, %s)", record_id, SQL(", ").join(
+                    field.convert_to_column(vals[field.name], knowledge_base.browse(record_id))
+                    for field in columns
+                ))
+                for record_id, vals in rows
+            )
+            self.env.cr.execute(SQL(
+                """UPDATE %(table)s AS k
+                      SET %(assignments)s, write_uid = %(uid)s, write_date = NOW() AT TIME ZONE 'UTC'
+                     FROM (VALUES %(values)s) AS v(id, %(columns)s)
+                    WHERE k.id = v.id""",
+                table=SQL.identifier(knowledge_base._table),
+                assignments=SQL(", ").join(
+                    SQL("%s = v.%s", SQL.identifier(field.name), SQL.identifier(field.name)) for field in columns),
+                uid=self.env.uid,
+                values=values,
+                columns=SQL(", ").join(SQL.identifier(field.name) for field in columns),
+            ))
+
+        keywords_field = knowledge_base._fields['keywords']
+        with_keywords = [(record_id, keywords) for record_id, _vals, keywords in updates if keywords is not None]
+        if with_keywords:
+            relation = SQL.identifier(keywords_field.relation)
+            column1, column2 = SQL.identifier(keywords_field.column1), SQL.identifier(keywords_field.column2)
+            self.env.cr.execute(SQL(
+                "DELETE FROM %s WHERE %s IN %s",
+                relation, column1, tuple(record_id for record_id, _keywords in with_keywords),
+            ))
+            pairs = [(record_id, keyword_id) for record_id, keywords in with_keywords for keyword_id in keywords]
+            if pairs:
+                self.env.cr.execute(SQL(
+                    "INSERT INTO %s (%s, %s) VALUES %s ON CONFLICT DO NOTHING",
+                    relation, column1, column2, SQL(", ").join(SQL("(%s, %s)", *pair) for pair in pairs),
+                ))
+
+    @api.model
+    def _resolve_keywords(self, pairs, stats):
+        """{(mot-clé, langue): id} : une recherche, puis un create() pour les manquants"""
+        if not pairs:
+            return {}
+        # Les mots-clés archivés sont réutilisés plutôt que recréés
+        keyword_model = self.env['ai.knowledge.keyword'].with_context(ai_kb_defer_index=True, active_test=False)
+        found = {}
+        for record in keyword_model.search_read(
+                [('keyword', 'in', list({name for name, _language in pairs}))], ['keyword', 'language']):
+            found.setdefault((record['keyword'], record['language']), record['id'])
+        missing = [pair for pair in pairs if pair not in found]
+        if missing:
+            created = keyword_model.create([{'keyword': name, 'language': language} for name, language in missing])
+            found.update(zip(missing, created.ids))
+            stats['keywords_created'] += len(missing)
+        return found
+
+    @api.model
+    def _report_error(self, stats, line_number, error):
+        stats['skipped'] += 1
+        if len(stats['errors']) < MAX_REPORTED_ERRORS:
+            stats['errors'].append(f"Ligne {line_number} : {error}")
+        elif len(stats['errors']) == MAX_REPORTED_ERRORS:
+            stats['errors'].append("... erreurs suivantes non détaillées")
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+from datetime import timedelta
+
+from .ai_marketing_snapshot import _insights_cache, WATERMARK_OVERLAP
+
+_logger = logging.getLogger(__name__)
+
+# mailing_id réservé aux lignes agrégées au niveau société
+COMPANY_ROLLUP = 0
+
+# Période canonique -> (jours en arrière pour le début, jours en arrière pour la fin).
+# Les jours sont des jours UTC, comme les lignes agrégées (sent_datetime::date en UTC)
+TIMEFRAME_RANGES = {
+    'today': (0, 0),
+    'yesterday': (1, 1),
+    'week': (6, 0),
+    'month': (29, 0),
+    'year': (364, 0),
+}
+
+# Termes reconnus par l'extracteur d'entités (timeframes) -> période canonique
+TIMEFRAME_ALIASES = {
+    # Français
+    "aujourd'hui": 'today', 'quotidien': 'today', 'hier': 'yesterday',
+    'semaine': 'week', 'mois': 'month', 'mensuel': 'month', 'année': 'year',
+    # English
+    'today': 'today', 'daily': 'today', 'yesterday': 'yesterday',
+    'week': 'week', 'month': 'month', 'monthly': 'month', 'year': 'year',
+    # العربية
+    'اليوم': 'today', 'يومي': 'today', 'أمس': 'yesterday',
+    'أسبوع': 'week', 'شهر': 'month', 'شهري': 'month', 'سنة': 'year',
+}
+
+# Champs exposés par get_period_insights (utilisables dans les réponses : {period_sent})
+PERIOD_INSIGHT_FIELDS = frozenset([
+    'period', 'period_start', 'period_end', 'period_sent', 'period_opened', 'period_clicked',
+    'period_replied', 'period_open_rate', 'period_click_rate', 'period_reply_rate',
+])
+
+
+class AIMarketingDailyStat(models.Model):
+    _name = 'ai.marketing.daily.stat'
+    _description = 'Statistiques marketing quotidiennes'
+    _order = 'date desc, mailing_id'
+
+    date = fields.Date(string='Jour', required=True, index=True, help="Jour UTC des événements")
+    company_id = fields.Many2one('res.company', string='Société', required=True, ondelete='cascade')
+    mailing_id = fields.Integer(string='ID Mailing', required=True, default=COMPANY_ROLLUP,
+                                help="0 pour le total de la société, sinon l'identifiant mailing.mailing")
+    sent = fields.Integer(string='Envoyés')
+    opened = fields.Integer(string='Ouverts')
+    clicked = fields.Integer(string='Clics')
+    replied = fields.Integer(string='Réponses')
+
+    _sql_constraints = [
+        ('company_mailing_date_uniq', 'unique(company_id, mailing_id, date)',
+         'Une seule ligne par jour, société et campagne.'),
+    ]
+
+    @api.model
+    def _normalize_timeframe(self, timeframe):
+        """Convertir un terme de l'extracteur (semaine, month, شهر...) en période canonique"""
+        if not timeframe:
+            return None
+        return TIMEFRAME_ALIASES.get(timeframe.lower().strip())
+
+    @api.model
+    def _get_period_insights(self, timeframe, company=None):
+        """Totaux de la période lus depuis les lignes pré-agrégées de la société"""
+        company = company or self.env.company
+        period = self._normalize_timeframe(timeframe) or 'month'
+        # Bornes en UTC pour correspondre aux jours stockés (pas le fuseau de l'utilisateur)
+        today = fields.Date.today()
+        start_offset, end_offset = TIMEFRAME_RANGES[period]
+        date_from = today - timedelta(days=start_offset)
+        date_to = today - timedelta(days=end_offset)
+
+        def compute():
+            [(sent, opened, clicked, replied)] = self.sudo()._read_group([
+                ('company_id', '=', company.id),
+                ('mailing_id', '=', COMPANY_ROLLUP),
+                ('date', '>=', date_from),
+                ('date', '<=', date_to),
+            ], [], ['sent:sum', 'opened:sum', 'clicked:sum', 'replied:sum'])
+            sent, opened, clicked, replied = sent or 0, opened or 0, clicked or 0, replied or 0
+            return {
+                'period': period,
+                'period_start': fields.Date.to_string(date_from),
+                'period_end': fields.Date.to_string(date_to),
+                'period_sent': sent,
+                'period_opened': opened,
+                'period_clicked': clicked,
+                'period_replied': replied,
+                'period_open_rate': (opened / sent * 100) if sent > 0 else 0,
+                'period_click_rate': (clicked / sent * 100) if sent > 0 else 0,
+                'period_reply_rate': (replied / sent * 100) if sent > 0 else 0,
+            }
+
+        key = (self.env.cr.dbname, company.id, 'period', period, date_to)
+        return _insights_cache.get_or_compute(key, compute)
+
+    @api.model
+    def _cron_refresh_daily_stats(self):
+        """Cron : mettre à jour incrémentalement les agrégats quotidiens de chaque société"""
+        if 'mailing.mailing' not in self.env:
+            return
+        for company in self.env['res.company'].search([]):
+            try:
+                self._refresh_company(company)
+            except Exception as e:
+                _logger.error("Erreur agrégats quotidiens (%s): %s", company.name, e, exc_info=True)
+
+    @api.model
+    def _refresh_company(self, company):
+        """Recalculer les jours des mailings modifiés depuis le dernier passage"""
+        Watermark = self.env['ai.marketing.daily.stat.watermark']
+        watermark = Watermark._get(company)
+        now = fields.Datetime.now()
+        mailing_ids, last_write_date = self.env['ai.marketing.snapshot']._get_changed_mailings(company, watermark)
+        if mailing_ids:
+            cr = self.env.cr
+            ids = tuple(mailing_ids)
+            # Jours touchés : anciens jours des campagnes modifiées + nouveaux jours
+            cr.execute("""
+                DELETE FROM ai_marketing_daily_stat
+                 WHERE company_id = %s AND mailing_id IN %s
+             RETURNING date
+            """, [company.id, ids])
+            affected_days = {row[0] for row in cr.fetchall()}
+
+            cr.execute("""
+                INSERT INTO ai_marketing_daily_stat
+                       (company_id, mailing_id, date, sent, opened, clicked, replied,
+                        create_uid, write_uid, create_date, write_date)
+                SELECT %(company_id)s, e.mailing_id, e.day,
+                       SUM(e.sent), SUM(e.opened), SUM(e.clicked), SUM(e.replied),
+                       %(uid)s, %(uid)s, NOW() AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC'
+                  FROM (
+                        SELECT mass_mailing_id AS mailing_id, sent_datetime::date AS day,
+                               COUNT(*) AS sent, 0 AS opened, 0 AS clicked, 0 AS replied
+                          FROM mailing_trace
+                         WHERE mass_mailing_id IN %(ids)s AND sent_datetime IS NOT NULL
+                      GROUP BY 1, 2
+                     UNION ALL
+                        SELECT mass_mailing_id, open_datetime::date, 0, COUNT(*), 0, 0
+                          FROM mailing_trace
+                         WHERE mass_mailing_id IN %(ids)s AND open_datetime IS NOT NULL
+                           AND trace_status IN ('open', 'reply')
+                      GROUP BY 1, 2
+                     UNION ALL
+                        SELECT mass_mailing_id, links_click_datetime::date, 0, 0, COUNT(*), 0
+                          FROM mailing_trace
+                         WHERE mass_mailing_id IN %(ids)s AND links_click_datetime IS NOT NULL
+                      GROUP BY 1, 2
+                     UNION ALL
+                        SELECT mass_mailing_id, reply_datetime::date, 0, 0, 0, COUNT(*)
+                          FROM mailing_trace
+                         WHERE mass_mailing_id IN %(ids)s AND reply_datetime IS NOT NULL
+                           AND trace_status = 'reply'
+                      GROUP BY 1, 2
+                  ) e
+              GROUP BY e.mailing_id, e.day
+             RETURNING date
+            """, {'company_id': company.id, 'uid': self.env.uid, 'ids': ids})
+            affected_days.update(row[0] for row in cr.fetchall())
+
+            if affected_days:
+                self._rebuild_company_rows(company, affected_days)
+            self.invalidate_model()
+            _insights_cache.invalidate_matching(
+                lambda key: key[:3] == (cr.dbname, company.id, 'period')
+            )
+
+        # Plus grand write_date lu, sans dépasser le début de lecture moins la marge :
+        # une écriture validée après notre lecture (datée du début de sa transaction) est reprise
+        if last_write_date:
+            Watermark._set(company, min(last_write_date, now - WATERMARK_OVERLAP))
+        _logger.info("Agrégats quotidiens %s: %s mailing(s) recalculé(s)", company.name, len(mailing_ids))
+
+    @api.model
+    def _rebuild_company_rows(self, company, days):
+        """Recalculer les lignes société des jours donnés depuis les lignes par campagne"""
+        cr = self.env.cr
+        days = tuple(days)
+        cr.execute("""
+            DELETE FROM ai_marketing_daily_stat
+             WHERE company_id = %s AND mailing_id = %s AND date IN %s
+        """, [company.id, COMPANY_ROLLUP, days])
+        cr.execute("""
+            INSERT INTO ai_marketing_daily_stat
+                   (company_id, mailing_id, date, sent, opened, clicked, replied,
+                    create_uid, write_uid, create_date, write_date)
+            SELECT company_id, %(rollup)s, date, SUM(sent), SUM(opened), SUM(clicked), SUM(replied),
+                   %(uid)s, %(uid)s, NOW() AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC'
+              FROM ai_marketing_daily_stat
+             WHERE company_id = %(company_id)s AND mailing_id != %(rollup)s AND date IN %(days)s
+          GROUP BY company_id, date
+        """, {'rollup': COMPANY_ROLLUP, 'uid': self.env.uid, 'company_id': company.id, 'days': days})
+
+
+class AIMarketingDailyStatWatermark(models.Model):
+    """Filigrane des agrégats quotidiens, une ligne par société
+
+    Table dédiée plutôt qu'un paramètre système : set_param viderait le cache
+    du registre dans tous les workers à chaque passage du cron.
+    """
+    _name = 'ai.marketing.daily.stat.watermark'
+    _description = 'Filigrane des statistiques marketing quotidiennes'
+    _rec_name = 'company_id'
+    _log_access = False
+
+    company_id = fields.Many2one('res.company', string='Société', required=True, ondelete='cascade', readonly=True)
+    watermark = fields.Datetime(string='Dernier write_date traité', readonly=True)
+
+    _sql_constraints = [
+        ('company_uniq', 'unique(company_id)', 'Un seul filigrane par société.'),
+    ]
+
+    @api.model
+    def _get(self, company):
+        self.env.cr.execute("""
+            SELECT watermark FROM ai_marketing_daily_stat_watermark WHERE company_id = %s
+        """, [company.id])
+        row = self.env.cr.fetchone()
+        return row[0] if row else None
+
+    @api.model
+    def _set(self, company, watermark):
+        self.env.cr.execute("""
+            INSERT INTO ai_marketing_daily_stat_watermark (company_id, watermark)
+            VALUES (%s, %s)
+            ON CONFLICT (company_id) DO UPDATE SET watermark = EXCLUDED.watermark
+        """, [company.id, watermark])
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+import json
+from datetime import timedelta
+
+from ..tools.ttl_cache import TTLCache
+
+_logger = logging.getLogger(__name__)
+
+ACTIVE_MAILING_STATES = ('running', 'done')
+TOP_ACTIVE_CAMPAIGNS = 5
+
+# Champs exposés par get_marketing_insights (utilisables dans les réponses : {total_sent})
+INSIGHT_FIELDS = frozenset([
+    'total_campaigns', 'active_campaigns', 'avg_open_rate', 'avg_reply_rate', 'total_sent',
+    'total_opened', 'total_replied', 'total_clicked', 'recommendations', 'snapshot_date',
+])
+
+# Recouvrement des filigranes : write_date vaut le début de la transaction qui écrit,
+# une écriture validée après notre lecture peut donc porter une date antérieure.
+# Les mailings touchés dans cette marge sont ré-agrégés (upsert idempotent).
+WATERMARK_OVERLAP = timedelta(minutes=15)
+
+# Insights par (base, société) partagés entre les requêtes du worker
+INSIGHTS_CACHE_TTL = 60
+_insights_cache = TTLCache(INSIGHTS_CACHE_TTL, maxsize=256, name='insights')
+
+# Analyses par (base, langue, campagne, write_date) : une modification du mailing change la clé,
+# la langue choisit la traduction des messages des règles
+CAMPAIGN_ANALYSIS_CACHE_TTL = 300
+_campaign_analysis_cache = TTLCache(CAMPAIGN_ANALYSIS_CACHE_TTL, maxsize=4096, name='campaign_analysis')
+
+
+class AIMarketingSnapshot(models.Model):
+    _name = 'ai.marketing.snapshot'
+    _description = 'Instantané des insights marketing'
+    _rec_name = 'company_id'
+    _order = 'company_id'
+
+    company_id = fields.Many2one('res.company', string='Société', required=True, ondelete='cascade', index=True)
+    total_campaigns = fields.Integer(string='Total campagnes', readonly=True)
+    total_sent = fields.Integer(string='Messages envoyés', readonly=True)
+    total_opened = fields.Integer(string='Messages ouverts', readonly=True)
+    total_replied = fields.Integer(string='Réponses', readonly=True)
+    total_clicked = fields.Integer(string='Clics', readonly=True)
+    avg_open_rate = fields.Float(string='Taux d\'ouverture moyen', readonly=True)
+    avg_reply_rate = fields.Float(string='Taux de réponse moyen', readonly=True)
+    active_campaigns = fields.Text(string='Campagnes actives', readonly=True, help="Top des campagnes actives (JSON)")
+    watermark = fields.Datetime(string='Dernier write_date traité', readonly=True,
+                                help="Les mailings modifiés après cette date seront ré-agrégés au prochain passage")
+    refreshed_at = fields.Datetime(string='Rafraîchi le', readonly=True)
+    line_ids = fields.One2many('ai.marketing.snapshot.line', 'snapshot_id', string='Détail par campagne')
+
+    _sql_constraints = [
+        ('company_uniq', 'unique(company_id)', 'Un seul instantané par société.'),
+    ]
+
+    @api.model
+    def _get_insights(self, company=None):
+        """Insights de la société, mis en cache quelques secondes et calculés une seule fois"""
+        company = company or self.env.company
+        return _insights_cache.get_or_compute(
+            (self.env.cr.dbname, company.id), lambda: self._read_insights(company)
+        )
+
+    @api.model
+    def _read_insights(self, company):
+        """Lire les insights de la société depuis l'instantané"""
+        return self._get_snapshot(company)._to_insights()
+
+    @api.model
+    def _get_snapshot(self, company=None):
+        """Instantané de la société (calculé au premier appel)"""
+        company = company or self.env.company
+        snapshot = self.search([('company_id', '=', company.id)], limit=1)
+        if not snapshot:
+            snapshot = self._refresh_company(company)
+        return snapshot
+
+    def _to_insights(self):
+        """Convertir l'instantané au format historique de get_marketing_insights"""
+        self.ensure_one()
+        try:
+            active_campaigns = json.loads(self.active_campaigns or '[]')
+        except (json.JSONDecodeError, TypeError):
+            active_campaigns = []
+        return {
+            'total_campaigns': self.total_campaigns,
+            'active_campaigns': active_campaigns,
+            'avg_open_rate': self.avg_open_rate,
+            'avg_reply_rate': self.avg_reply_rate,
+            'total_sent': self.total_sent,
+            'total_opened': self.total_opened,
+            'total_replied': self.total_replied,
+            'total_clicked': self.total_clicked,
+            'recommendations': [],
+            'snapshot_date': fields.Datetime.to_string(self.refreshed_at) if self.refreshed_at else False,
+        }
+
+    @api.model
+    def _cron_refresh_snapshots(self):
+        """Cron : rafraîchir incrémentalement l'instantané de chaque société"""
+        for company in self.env['res.company'].search([]):
+            try:
+                self._refresh_company(company)
+            except Exception as e:
+                _logger.error("Erreur rafraîchissement instantané marketing (%s): %s", company.name, e, exc_info=True)
+
+    @api.model
+    def _refresh_company(self, company):
+        """Ré-agréger uniquement les mailings modifiés depuis le dernier filigrane"""
+        snapshot = self.search([('company_id', '=', company.id)], limit=1)
+        if not snapshot:
+            snapshot = self.create({'company_id': company.id})
+
+        now = fields.Datetime.now()
+        watermark = now - WATERMARK_OVERLAP
+        if 'mailing.mailing' not in self.env:
+            snapshot.write({'refreshed_at': now, 'watermark': watermark})
+            return snapshot
+
+        Line = self.env['ai.marketing.snapshot.line']
+        changed_ids = self._get_changed_mailing_ids(company, snapshot.watermark)
+        if changed_ids:
+            Line._upsert_mailings(snapshot, changed_ids)
+        Line._purge_deleted_mailings(snapshot)
+
+        snapshot._recompute_totals()
+        snapshot.write({'refreshed_at': now, 'watermark': watermark})
+        _insights_cache.invalidate((self.env.cr.dbname, company.id))
+        _logger.info("Instantané marketing %s rafraîchi (%s mailing(s) ré-agrégé(s))", company.name, len(changed_ids))
+        return snapshot
+
+    @api.model
+    def _mailing_company_clause(self, company, alias='m'):
+        """Clause SQL de filtrage société (mailing.mailing n'a pas toujours de company_id)"""
+        if 'company_id' in self.env['mailing.mailing']._fields:
+            return f" AND ({alias}.company_id = %(company_id)s OR {alias}.company_id IS NULL)", {'company_id': company.id}
+        return "", {}
+
+    @api.model
+    def _get_changed_mailing_ids(self, company, watermark):
+        """Mailings créés/modifiés, ou dont les traces ont bougé, depuis le filigrane"""
+        return self._get_changed_mailings(company, watermark)[0]
+
+    @api.model
+    def _get_changed_mailings(self, company, watermark):
+        """(ids des mailings modifiés depuis le filigrane, plus grand write_date lu ou None)
+
+        Sans filigrane, tous les mailings de la société sont retournés.
+        """
+        clause, params = self._mailing_company_clause(company)
+        mailing_filter = "m.write_date > %(watermark)s" if watermark else "TRUE"
+        trace_filter = "t.write_date > %(watermark)s" if watermark else "TRUE"
+        params['watermark'] = watermark
+        self.env.cr.execute(f"""
+            SELECT m.id, MAX(m.write_date) FROM mailing_mailing m
+             WHERE {mailing_filter}{clause}
+          GROUP BY m.id
+            UNION ALL
+            SELECT m.id, MAX(t.write_date) FROM mailing_trace t
+              JOIN mailing_mailing m ON m.id = t.mass_mailing_id
+             WHERE {trace_filter}{clause}
+          GROUP BY m.id
+        """, params)
+        rows = self.env.cr.fetchall()
+        last_write_date = max((row[1] for row in rows if row[1]), default=None)
+        return sorted({row[0] for row in rows}), last_write_date
+
+    @api.model
+    def _read_mailing_statistics(self, mailing_ids):
+        """Agréger les traces des mailings donnés en une seule requête"""
+        if not mailing_ids:
+            return {}
+        self.env.cr.execute("""
+            SELECT m.id AS mailing_id,
+                   COUNT(t.id) AS expected,
+                   COUNT(t.sent_datetime) AS sent,
+                   COUNT(t.id) FILTER (WHERE t.trace_status IN ('sent', 'open', 'reply')) AS delivered,
+                   COUNT(t.id) FILTER (WHERE t.trace_status IN ('open', 'reply')) AS opened,
+                   COUNT(t.links_click_datetime) AS clicked,
+                   COUNT(t.id) FILTER (WHERE t.trace_status = 'reply') AS replied,
+                   COUNT(t.id) FILTER (WHERE t.trace_status = 'bounce') AS bounced,
+                   COUNT(t.id) FILTER (WHERE t.trace_status = 'error') AS failed
+              FROM mailing_mailing m
+              LEFT JOIN mailing_trace t ON t.mass_mailing_id = m.id
+             WHERE m.id IN %s
+          GROUP BY m.id
+        """, [tuple(mailing_ids)])
+        return {row['mailing_id']: row for row in self.env.cr.dictfetchall()}
+
+    @api.model
+    def _analyze_mailings(self, mailing_ids):
+        """Analyse réelle de chaque mailing, en cache tant que son write_date ne change pas
+
+        :return: dict {mailing_id: analyse} (les ids inexistants sont absents)
+        """
+        mailings = self.env['mailing.mailing'].with_context(active_test=False).search_read(
+            [('id', 'in', list(mailing_ids))], ['name', 'state', 'write_date']
+        )
+        dbname, lang = self.env.cr.dbname, self.env.lang
+        analyses, missing = {}, []
+        for mailing in mailings:
+            cached = _campaign_analysis_cache.get((dbname, lang, mailing['id'], mailing['write_date']))
+            if cached is None:
+                missing.append(mailing)
+            else:
+                analyses[mailing['id']] = cached
+
+        if missing:
+            # Une seule requête d'agrégation pour toutes les campagnes absentes du cache
+            statistics = self._read_mailing_statistics([mailing['id'] for mailing in missing])
+            Rule = self.env['ai.recommendation.rule'].sudo()
+            for mailing in missing:
+                analysis = self._build_campaign_analysis(mailing, statistics.get(mailing['id'], {}), Rule)
+                _campaign_analysis_cache.set((dbname, lang, mailing['id'], mailing['write_date']), analysis)
+                analyses[mailing['id']] = analysis
+        return analyses
+
+    @api.model
+    def _build_campaign_analysis(self, mailing, stats, rules):
+        """Construire l'analyse d'un mailing à partir de ses compteurs agrégés"""
+        sent = stats.get('sent', 0)
+        delivered = stats.get('delivered', 0)
+
+        def rate(count, base=sent):
+            return round(count / base * 100, 2) if base > 0 else 0
+
+        metrics = {
+            'total_expected': stats.get('expected', 0),
+            'total_sent': sent,
+            'total_delivered': delivered,
+            'total_opened': stats.get('opened', 0),
+            'total_clicked': stats.get('clicked', 0),
+            'total_replied': stats.get('replied', 0),
+            'total_bounced': stats.get('bounced', 0),
+            'total_failed': stats.get('failed', 0),
+            'open_rate': rate(stats.get('opened', 0)),
+            'click_rate': rate(stats.get('clicked', 0)),
+            'reply_rate': rate(stats.get('replied', 0)),
+            'bounce_rate': rate(stats.get('bounced', 0), stats.get('expected', 0)),
+        }
+        return {
+            'campaign_id': mailing['id'],
+            'name': mailing['name'],
+            'state': mailing['state'],
+            'metrics': metrics,
+            'recommendations': rules._match_campaign(mailing['name'], metrics),
+            'computed_at': fields.Datetime.to_string(fields.Datetime.now()),
+        }
+
+    def _recompute_totals(self):
+        """Recalculer totaux, taux et top campagnes depuis les lignes pré-agrégées"""
+        self.ensure_one()
+        Line = self.env['ai.marketing.snapshot.line']
+        domain = [('snapshot_id', '=', self.id)]
+        [(count, sent, opened, replied, clicked)] = Line._read_group(
+            domain, [], ['__count', 'sent:sum', 'opened:sum', 'replied:sum', 'clicked:sum']
+        )
+        sent, opened, replied, clicked = sent or 0, opened or 0, replied or 0, clicked or 0
+
+        top_active = Line.search(
+            domain + [('state', 'in', ACTIVE_MAILING_STATES)],
+            order='sent desc, mailing_id desc', limit=TOP_ACTIVE_CAMPAIGNS
+        )
+        self.write({
+            'total_campaigns': count,
+            'total_sent': sent,
+            'total_opened': opened,
+            'total_replied': replied,
+            'total_clicked': clicked,
+            'avg_open_rate': (opened / sent * 100) if sent > 0 else 0,
+            'avg_reply_rate': (replied / sent * 100) if sent > 0 else 0,
+            'active_campaigns': json.dumps([{
+                'id': line.mailing_id,
+                'name': line.name,
+                'state': line.state,
+                'sent': line.sent,
+                'opened': line.opened,
+                'replied': line.replied
+            } for line in top_active]),
+        })
+
+
+class AIMarketingSnapshotLine(models.Model):
+    _name = 'ai.marketing.snapshot.line'
+    _description = 'Statistiques pré-agrégées par campagne'
+    _order = 'sent desc'
+
+    snapshot_id = fields.Many2one('ai.marketing.snapshot', string='Instantané', required=True, ondelete='cascade', index=True)
+    company_id = fields.Many2one(related='snapshot_id.company_id', store=True)
+    mailing_id = fields.Integer(string='ID Mailing', required=True, index=True,
+                                help="Identifiant mailing.mailing (mass_mailing est optionnel)")
+    name = fields.Char(string='Campagne')
+    state = fields.Char(string='État')
+    sent = fields.Integer(string='Envoyés')
+    opened = fields.Integer(string='Ouverts')
+    replied = fields.Integer(string='Réponses')
+    clicked = fields.Integer(string='Clics')
+    mailing_write_date = fields.Datetime(string='Modifié le (mailing)')
+
+    _sql_constraints = [
+        ('snapshot_mailing_uniq', 'unique(snapshot_id, mailing_id)', 'Une seule ligne par campagne et par instantané.'),
+    ]
+
+    @api.model
+    def _upsert_mailings(self, snapshot, mailing_ids):
+        """Mettre à jour (ou créer) les lignes des mailings donnés"""
+        Snapshot = self.env['ai.marketing.snapshot']
+        statistics = Snapshot._read_mailing_statistics(mailing_ids)
+        mailings = self.env['mailing.mailing'].sudo().with_context(active_test=False).search_read(
+            [('id', 'in', list(mailing_ids))], ['name', 'state', 'write_date']
+        )
+        existing = {
+            line.mailing_id: line
+            for line in self.search([('snapshot_id', '=', snapshot.id), ('mailing_id', 'in', list(mailing_ids))])
+        }
+
+        to_create = []
+        for mailing in mailings:
+            stats = statistics.get(mailing['id'], {})
+            vals = {
+                'name': mailing['name'],
+                'state': mailing['state'],
+                'sent': stats.get('sent', 0),
+                'opened': stats.get('opened', 0),
+                'replied': stats.get('replied', 0),
+                'clicked': stats.get('clicked', 0),
+                'mailing_write_date': mailing['write_date'],
+            }
+            line = existing.get(mailing['id'])
+            if line:
+                line.write(vals)
+            else:
+                to_create.append(dict(vals, snapshot_id=snapshot.id, mailing_id=mailing['id']))
+
+        if to_create:
+            self.create(to_create)
+
+    @api.model
+    def _purge_deleted_mailings(self, snapshot):
+        """Supprimer les lignes dont le mailing n'existe plus"""
+        self.env.cr.execute("""
+            DELETE FROM ai_marketing_snapshot_line l
+             WHERE l.snapshot_id = %s
+               AND NOT EXISTS (SELECT 1 FROM mailing_mailing m WHERE m.id = l.mailing_id)
+        """, [snapshot.id])
+        if self.env.cr.rowcount:
+            self.invalidate_model()
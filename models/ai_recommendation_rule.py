@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+import logging
+import operator
+
+import numpy as np
+
+_logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+METRICS = [
+    ('open_rate', 'Taux d\'ouverture'),
+    ('reply_rate', 'Taux de réponse'),
+    ('click_rate', 'Taux de clic'),
+]
+
+# Recommandations génériques quand mass_mailing n'est pas installé
+GENERIC_RECOMMENDATIONS = [
+    {
+        'type': 'info',
+        'message': "📊 Analysez régulièrement vos métriques de campagne pour identifier les opportunités d'amélioration.",
+        'action': 'analyze_metrics'
+    },
+    {
+        'type': 'info',
+        'message': "🎯 Segmentez votre audience pour des messages plus personnalisés et un meilleur engagement.",
+        'action': 'segment_audience'
+    },
+    {
+        'type': 'info',
+        'message': "📧 Testez différents objets de mail pour optimiser vos taux d'ouverture.",
+        'action': 'test_subjects'
+    }
+]
+
+
+class AIRecommendationRule(models.Model):
+    _name = 'ai.recommendation.rule'
+    _description = 'Règle de recommandation de campagne'
+    _order = 'sequence, id'
+
+    name = fields.Char(string='Nom', required=True)
+    sequence = fields.Integer(string='Séquence', default=10)
+    active = fields.Boolean(string='Actif', default=True)
+    metric = fields.Selection(METRICS, string='Métrique', required=True, default='open_rate')
+    comparator = fields.Selection([(op, op) for op in OPERATORS], string='Opérateur', required=True, default='<')
+    threshold = fields.Float(string='Seuil (%)', required=True)
+    second_metric = fields.Selection(METRICS, string='Seconde métrique', help="Condition supplémentaire (ET)")
+    second_comparator = fields.Selection([(op, op) for op in OPERATORS], string='Second opérateur', default='<')
+    second_threshold = fields.Float(string='Second seuil (%)')
+    min_sent = fields.Integer(string='Envois minimum', default=1, help="Ignorer les campagnes ayant moins d'envois")
+    impact_weight = fields.Float(string='Poids d\'impact', default=1.0,
+                                 help="Impact = poids × envois × écart au seuil ; sert au classement")
+    recommendation_type = fields.Selection([
+        ('warning', 'Avertissement'),
+        ('success', 'Succès'),
+        ('info', 'Information')
+    ], string='Type', required=True, default='info')
+    action = fields.Char(string='Action', required=True)
+    message = fields.Char(string='Message', required=True, translate=True,
+                          help="Variables : {name}, {open_rate}, {reply_rate}, {click_rate}, {sent}")
+
+    @api.model
+    def _match_campaign(self, name, metrics):
+        """Messages des règles satisfaites par une seule campagne (analyse détaillée)"""
+        sent = metrics['total_sent']
+        if not sent:
+            return []
+        values = {
+            'name': name,
+            'sent': sent,
+            'open_rate': metrics['open_rate'],
+            'reply_rate': metrics['reply_rate'],
+            'click_rate': metrics['click_rate'],
+        }
+        messages = []
+        for rule in self.search([]):
+            if sent < rule.min_sent or not OPERATORS[rule.comparator](values[rule.metric], rule.threshold):
+                continue
+            if rule.second_metric and not OPERATORS[rule.second_comparator](values[rule.second_metric], rule.second_threshold):
+                continue
+            try:
+                messages.append(rule.message.format(**values))
+            except (KeyError, IndexError, ValueError) as e:
+                _logger.warning("Message de la règle '%s' invalide: %s", rule.name, e)
+                messages.append(rule.message)
+        return messages
+
+    @api.model
+    def _evaluate(self, company=None, offset=0, limit=5):
+        """Évaluer toutes les règles sur toutes les campagnes envoyées, classées par impact
+
+        :return: (nombre total de recommandations, page de recommandations)
+        """
+        snapshot = self.env['ai.marketing.snapshot'].sudo()._get_snapshot(company)
+        self.env.cr.execute("""
+            SELECT mailing_id, name, sent, opened, replied, clicked
+              FROM ai_marketing_snapshot_line
+             WHERE snapshot_id = %s AND sent > 0
+        """, [snapshot.id])
+        rows = self.env.cr.fetchall()
+        rules = self.search([])
+        if not rows or not rules:
+            return 0, []
+
+        mailing_ids, names, sent, opened, replied, clicked = zip(*rows)
+        sent = np.asarray(sent, dtype=np.float64)
+        rates = {
+            'open_rate': np.asarray(opened, dtype=np.float64) / sent * 100,
+            'reply_rate': np.asarray(replied, dtype=np.float64) / sent * 100,
+            'click_rate': np.asarray(clicked, dtype=np.float64) / sent * 100,
+        }
+
+        impacts, rule_indexes, mailing_indexes = [], [], []
+        for rule_index, rule in enumerate(rules):
+            values = rates[rule.metric]
+            mask = OPERATORS[rule.comparator](values, rule.threshold) & (sent >= rule.min_sent)
+            if rule.second_metric:
+                mask &= OPERATORS[rule.second_comparator](rates[rule.second_metric], rule.second_threshold)
+            matched = np.flatnonzero(mask)
+            if not matched.size:
+                continue
+            impacts.append(rule.impact_weight * sent[matched] * np.abs(values[matched] - rule.threshold) / 100)
+            rule_indexes.append(np.full(matched.size, rule_index))
+            mailing_indexes.append(matched)
+
+        if not impacts:
+            return 0, []
+
+        impacts = np.concatenate(impacts)
+        rule_indexes = np.concatenate(rule_indexes)
+        mailing_indexes = np.concatenate(mailing_indexes)
+        total = int(impacts.size)
+
+        # Tri stable par impact décroissant, puis pagination
+        page = np.argsort(-impacts, kind='stable')[offset:offset + limit]
+
+        recommendations = []
+        for position in page:
+            rule = rules[int(rule_indexes[position])]
+            index = int(mailing_indexes[position])
+            values = {
+                'name': names[index],
+                'sent': int(sent[index]),
+                'open_rate': float(rates['open_rate'][index]),
+                'reply_rate': float(rates['reply_rate'][index]),
+                'click_rate': float(rates['click_rate'][index]),
+            }
+            try:
+                message = rule.message.format(**values)
+            except (KeyError, IndexError, ValueError) as e:
+                _logger.warning("Message de la règle '%s' invalide: %s", rule.name, e)
+                message = rule.message
+            recommendations.append({
+                'type': rule.recommendation_type,
+                'campaign_id': mailing_ids[index],
+                'campaign_name': names[index],
+                'message': message,
+                'action': rule.action,
+                'impact': round(float(impacts[position]), 2),
+            })
+        return total, recommendations
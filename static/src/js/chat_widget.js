@@ -0,0 +1,680 @@
+/** @odoo-module ignore **/
+// Widget de chat de l'assistant IA (bundle ai_chat_assistant.chat_widget)
+//
+// Chargé à la demande par le stub de views/chatbot_templates.xml au premier
+// clic sur la bulle : rien de ce fichier n'est analysé ni exécuté sur les
+// pages où le chat n'est pas ouvert. Le stub appelle ensuite toggleAIChatbot().
+
+// Variables globales pour le chatbot
+window.aiChatbotOpen = false;
+window.aiSessionId = null;
+window.aiSessionToken = null;
+window.aiHistoryCursor = null;
+window.aiHistoryLoaded = false;
+window.aiHistoryLoading = false;
+try {
+    // Session de l'onglet (rechargement de page) : l'historique est relu depuis le serveur
+    window.aiSessionId = parseInt(window.sessionStorage.getItem('aiChatSessionId'), 10) || null;
+} catch (e) {
+    window.aiSessionId = null;
+}
+window.aiKbVersion = null;
+window.aiDetectedLanguage = 'en'; // Langue par défaut : anglais
+
+// Cache local des réponses fixes (même format que chatbot.js), par message
+// normalisé et langue, vidé quand la version de la base change
+window.aiAnswerCache = {
+    storageKey: 'aiChatAnswerCache',
+    maxEntries: 200,
+    load: function() {
+        try {
+            return JSON.parse(window.localStorage.getItem(this.storageKey)) || {};
+        } catch (e) {
+            return {};
+        }
+    },
+    save: function(data) {
+        try {
+            window.localStorage.setItem(this.storageKey, JSON.stringify(data));
+        } catch (e) {
+            // Stockage plein ou indisponible (navigation privée) : pas de cache
+        }
+    },
+    key: function(message, language) {
+        return (language || '') + '|' + message.toLowerCase().replace(/[\s?!.،؟]+/g, ' ').trim();
+    },
+    get: function(message, language) {
+        const data = this.load();
+        return data.version ? (data.entries || {})[this.key(message, language)] : undefined;
+    },
+    setVersion: function(version) {
+        window.aiKbVersion = version || window.aiKbVersion;
+        if (version && this.load().version !== version) {
+            this.save({version: version, entries: {}});
+        }
+    },
+    put: function(message, language, result) {
+        if (!result.cacheable || !result.kb_version) {
+            return;
+        }
+        this.setVersion(result.kb_version);
+        const data = this.load();
+        const keys = Object.keys(data.entries);
+        if (keys.length >= this.maxEntries) {
+            delete data.entries[keys[0]];
+        }
+        data.entries[this.key(message, language)] = {
+            answer: result.answer || result.response,
+            quick_actions: result.quick_actions || []
+        };
+        this.save(data);
+    }
+};
+
+// Détection automatique de la langue sans interface de changement
+window.detectMessageLanguage = function(message) {
+    const arabicRegex = /[\u0600-\u06FF]/;
+    const frenchWords = ['le', 'la', 'les', 'de', 'du', 'des', 'et', 'est', 'une', 'pour', 'avec', 'sur', 'dans', 'bonjour', 'salut', 'comment', 'quel', 'que'];
+
+    if (arabicRegex.test(message)) {
+        return 'ar';
+    }
+
+    const lowerMessage = message.toLowerCase();
+    for (let word of frenchWords) {
+        if (lowerMessage.includes(word)) {
+            return 'fr';
+        }
+    }
+
+    return 'en'; // Par défaut anglais
+};
+
+window.toggleAIChatbot = function() {
+    if (window.aiChatbotOpen) {
+        window.closeAIChatbot();
+    } else {
+        window.openAIChatbot();
+    }
+};
+
+window.openAIChatbot = function() {
+    const chatWindow = document.getElementById('aiChatWindow');
+
+    if (chatWindow) {
+        chatWindow.style.display = 'flex';
+        window.aiChatbotOpen = true;
+
+        // Un seul appel d'initialisation ; la session est créée au premier message
+        if (!window.aiSessionId && !window.aiSessionToken) {
+            window.bootstrapAIChat();
+        } else if (window.aiSessionId && !window.aiHistoryLoaded) {
+            window.aiHistoryLoaded = true;
+            window.loadAIHistory();
+            const messagesContainer = document.getElementById('aiChatMessages');
+            if (messagesContainer) {
+                // Remonter en haut de la conversation charge la page précédente
+                messagesContainer.addEventListener('scroll', function() {
+                    if (messagesContainer.scrollTop === 0 && window.aiHistoryCursor) {
+                        window.loadAIHistory();
+                    }
+                });
+            }
+        }
+
+        setTimeout(function() {
+            const input = document.getElementById('aiChatInput');
+            if (input) input.focus();
+        }, 100);
+    }
+};
+
+window.closeAIChatbot = function() {
+    const chatWindow = document.getElementById('aiChatWindow');
+    if (chatWindow) {
+        chatWindow.style.display = 'none';
+        window.aiChatbotOpen = false;
+    }
+};
+
+window.handleAIKeyPress = function(event) {
+    if (event.key === 'Enter' && !event.shiftKey) {
+        event.preventDefault();
+        window.sendAIMessage();
+    }
+};
+
+window.sendAIMessage = function() {
+    const input = document.getElementById('aiChatInput');
+    if (!input) return;
+
+    const message = input.value.trim();
+    if (!message) return;
+
+    // Détection de la langue
+    window.aiDetectedLanguage = window.detectMessageLanguage(message);
+
+    window.hideAISuggestions();
+    window.addAIMessage(message, 'user');
+    input.value = '';
+
+    // Auto-resize
+    input.style.height = 'auto';
+
+    window.showAITyping();
+    window.processAIMessage(message);
+};
+
+window.sendAIQuickMessage = function(message) {
+    window.addAIMessage(message, 'user');
+    window.showAITyping();
+    window.processAIMessage(message);
+};
+
+window.addAIMessage = function(message, type, prepend) {
+    const messagesContainer = document.getElementById('aiChatMessages');
+    if (!messagesContainer) return;
+
+    const messageContainerDiv = document.createElement('div');
+    messageContainerDiv.className = 'ai-message-container ' + type;
+
+    // Créer la section d'information avec nom et avatar
+    const messageInfoDiv = document.createElement('div');
+    messageInfoDiv.className = 'ai-message-info';
+
+    // Créer le nom d'utilisateur
+    const nameDiv = document.createElement('div');
+    nameDiv.className = 'ai-message-name';
+    nameDiv.textContent = type === 'user' ? 'You' : 'AI Assistant';
+
+    // Créer l'avatar avec l'image appropriée selon le type
+    const avatarDiv = document.createElement('div');
+    avatarDiv.className = 'ai-message-avatar';
+
+    const avatarImg = document.createElement('img');
+    if (type === 'user') {
+        avatarImg.src = '/ai_chat_assistant/static/src/img/user_avatar.svg';
+        avatarImg.alt = 'User';
+    } else {
+        avatarImg.src = '/ai_chat_assistant/static/src/img/user_avatar.svg';
+        avatarImg.alt = 'AI Assistant';
+    }
+
+    avatarDiv.appendChild(avatarImg);
+    messageInfoDiv.appendChild(nameDiv);
+    messageInfoDiv.appendChild(avatarDiv);
+    messageContainerDiv.appendChild(messageInfoDiv);
+
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'ai-message ' + type;
+
+    const bubble = document.createElement('div');
+    bubble.className = 'ai-message-bubble';
+    bubble.innerHTML = message;
+
+    messageDiv.appendChild(bubble);
+    messageContainerDiv.appendChild(messageDiv);
+
+    if (prepend) {
+        messagesContainer.insertBefore(messageContainerDiv, messagesContainer.firstChild);
+        return;
+    }
+    messagesContainer.appendChild(messageContainerDiv);
+
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+};
+
+window.processAIMessage = function(message) {
+    // Question déjà posée depuis la dernière version de la base : pas d'appel serveur
+    const cached = window.aiAnswerCache.get(message, window.aiDetectedLanguage);
+    if (cached) {
+        window.hideAITyping();
+        window.addAIMessage(cached.answer, 'bot');
+        if (cached.quick_actions.length > 0) {
+            window.showQuickActions(cached.quick_actions);
+        }
+        return;
+    }
+
+    // Appel RPC vers le contrôleur Odoo (mêmes paramètres, donc même
+    // identifiant de requête, à chaque nouvel essai)
+    if (typeof odoo !== 'undefined' && odoo.session && odoo.session.rpc) {
+        window.callAIProcess({
+            message: message,
+            session_id: window.aiSessionId,
+            session_token: window.aiSessionToken,
+            language: window.aiDetectedLanguage,
+            client_request_id: window.newAIRequestId()
+        }, 0).then(function(result) {
+            window.hideAITyping();
+
+            if (result.session_id) {
+                window.aiSessionId = result.session_id;
+                try {
+                    window.sessionStorage.setItem('aiChatSessionId', result.session_id);
+                } catch (e) {
+                    // Stockage indisponible (navigation privée) : historique non rechargé
+                }
+            }
+
+            if (result.kb_version) {
+                window.aiAnswerCache.setVersion(result.kb_version);
+            }
+
+            if (result.success) {
+                window.addAIMessage(result.response, 'bot');
+                window.aiAnswerCache.put(message, window.aiDetectedLanguage, result);
+
+                // Afficher les actions rapides si disponibles
+                if (result.quick_actions && result.quick_actions.length > 0) {
+                    window.showQuickActions(result.quick_actions);
+                }
+            } else if (result.rate_limited) {
+                window.addAIMessage(result.error, 'bot');
+            } else {
+                window.addAIMessage('Désolé, une erreur est survenue. Veuillez réessayer.', 'bot');
+            }
+        }).catch(function(error) {
+            console.error('Erreur API:', error);
+            window.hideAITyping();
+            // Fallback avec réponses statiques
+            const response = window.getStaticAIResponse(message);
+            window.addAIMessage(response, 'bot');
+        });
+    } else {
+        // Fallback si Odoo RPC n'est pas disponible
+        window.hideAITyping();
+        const response = window.getStaticAIResponse(message);
+        window.addAIMessage(response, 'bot');
+    }
+};
+
+// Nouveaux essais après une erreur réseau : backoff exponentiel avec gigue
+window.aiRetry = {maxAttempts: 4, baseDelay: 500, maxDelay: 8000};
+
+window.newAIRequestId = function() {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+};
+
+window.aiRetryDelay = function(attempt, retryAfter) {
+    let delay = Math.min(window.aiRetry.maxDelay, window.aiRetry.baseDelay * Math.pow(2, attempt));
+    delay = delay / 2 + Math.random() * delay / 2;
+    return Math.max(delay, (retryAfter || 0) * 1000);
+};
+
+window.callAIProcess = function(params, attempt) {
+    const retry = function(retryAfter) {
+        return new Promise(function(resolve) {
+            setTimeout(resolve, window.aiRetryDelay(attempt, retryAfter));
+        }).then(function() {
+            return window.callAIProcess(params, attempt + 1);
+        });
+    };
+    return odoo.session.rpc('/ai_chat/process', 'call', params).then(function(result) {
+        // Premier envoi encore en cours côté serveur : attendre sa réponse
+        if (result.in_progress && attempt + 1 < window.aiRetry.maxAttempts) {
+            return retry(result.retry_after);
+        }
+        return result;
+    }, function(error) {
+        if (attempt + 1 >= window.aiRetry.maxAttempts) {
+            throw error;
+        }
+        return retry(0);
+    });
+};
+
+// Fonction de fallback avec réponses statiques
+window.getStaticAIResponse = function(message) {
+    const msg = message.toLowerCase();
+    const language = window.detectMessageLanguage(message);
+
+    // Définir les réponses localement pour éviter l'erreur ReferenceError
+    const responses = {
+        'fr': {
+            'greeting': '👋 Bonjour ! Je suis votre assistant IA marketing. Comment puis-je vous aider ?',
+            'overview': '📊 Aperçu marketing : Vos campagnes performent bien avec un taux d\'ouverture moyen de 22%.',
+            'performance': '📈 Performance : Vos dernières campagnes montrent une amélioration de 15% par rapport au mois dernier.',
+            'default': '🤖 Je comprends votre question. Veuillez reformuler pour une réponse plus précise.'
+        },
+        'en': {
+            'greeting': '👋 Hello! I\'m your AI marketing assistant. How can I help you?',
+            'overview': '📊 Marketing overview: Your campaigns are performing well with an average open rate of 22%.',
+            'performance': '📈 Performance: Your latest campaigns show a 15% improvement compared to last month.',
+            'default': '🤖 I understand your question. Please rephrase for a more accurate response.'
+        },
+        'ar': {
+            'greeting': '👋 مرحبا! أنا مساعدك للتسويق بالذكاء الاصطناعي. كيف يمكنني مساعدتك؟',
+            'overview': '📊 نظرة عامة على التسويق: حملاتك تؤدي بشكل جيد بمعدل فتح متوسط 22%.',
+            'performance': '📈 الأداء: حملاتك الأخيرة تظهر تحسنا بنسبة 15% مقارنة بالشهر الماضي.',
+            'default': '🤖 أفهم سؤالك. يرجى إعادة الصياغة للحصول على إجابة أكثر دقة.'
+        }
+    };
+
+    const lang = responses[language] || responses['en'];
+
+    if (msg.includes('hello') || msg.includes('hi') || msg.includes('bonjour') || msg.includes('salut') || msg.includes('مرحبا') || msg.includes('السلام')) {
+        return lang.greeting;
+    }
+
+    if (msg.includes('aperçu') || msg.includes('overview') || msg.includes('نظرة')) {
+        return lang.overview;
+    }
+
+    if (msg.includes('performance') || msg.includes('campagne') || msg.includes('campaign') || msg.includes('أداء') || msg.includes('حملة')) {
+        return lang.performance;
+    }
+
+    return lang.default;
+};
+
+// Historique de la session, page par page (pagination par clé côté serveur)
+window.loadAIHistory = function() {
+    if (window.aiHistoryLoading || typeof odoo === 'undefined' || !odoo.session || !odoo.session.rpc) {
+        return;
+    }
+    const params = window.aiHistoryCursor || {};
+    window.aiHistoryLoading = true;
+    odoo.session.rpc('/ai_chat/session/' + window.aiSessionId + '/messages', 'call', params)
+        .then(function(result) {
+            window.aiHistoryLoading = false;
+            if (!result.success) {
+                return;
+            }
+            const messagesContainer = document.getElementById('aiChatMessages');
+            const previousHeight = messagesContainer ? messagesContainer.scrollHeight : 0;
+            // Messages en ordre chronologique : insérer du plus récent au plus ancien en tête
+            for (let i = result.messages.length - 1; i >= 0; i--) {
+                const item = result.messages[i];
+                const text = item.type === 'user' ? window.escapeAIHtml(item.text) : item.text;
+                window.addAIMessage(text, item.type, true);
+            }
+            window.aiHistoryCursor = result.has_more ? result.next_cursor : null;
+            if (messagesContainer) {
+                // Garder la position de lecture après l'insertion
+                messagesContainer.scrollTop = messagesContainer.scrollHeight - previousHeight;
+            }
+        })
+        .catch(function(error) {
+            window.aiHistoryLoading = false;
+            console.error('Erreur chargement historique:', error);
+        });
+};
+
+// Suggestions de questions pendant la frappe (espacées de 150 ms)
+window.aiSuggestTimer = null;
+window.aiSuggestSequence = 0;
+
+window.requestAISuggestions = function(text) {
+    clearTimeout(window.aiSuggestTimer);
+    if (text.trim().length < 2 || typeof odoo === 'undefined' || !odoo.session || !odoo.session.rpc) {
+        window.hideAISuggestions();
+        return;
+    }
+    window.aiSuggestTimer = setTimeout(function() {
+        // Seule la réponse à la dernière frappe est affichée
+        const sequence = ++window.aiSuggestSequence;
+        odoo.session.rpc('/ai_chat/suggest', 'call', {
+            prefix: text,
+            language: window.detectMessageLanguage(text)
+        }).then(function(result) {
+            if (sequence === window.aiSuggestSequence) {
+                window.showAISuggestions(result.success ? result.suggestions : []);
+            }
+        }).catch(function() {
+            window.hideAISuggestions();
+        });
+    }, 150);
+};
+
+window.showAISuggestions = function(suggestions) {
+    const container = document.getElementById('aiChatSuggestions');
+    if (!container) return;
+    container.innerHTML = '';
+    suggestions.forEach(function(suggestion) {
+        const button = document.createElement('button');
+        button.className = 'ai-chat-suggestion';
+        button.textContent = suggestion.question;
+        button.title = suggestion.question;
+        button.onclick = function() {
+            const input = document.getElementById('aiChatInput');
+            if (input) {
+                input.value = suggestion.question;
+            }
+            window.sendAIMessage();
+        };
+        container.appendChild(button);
+    });
+    container.style.display = suggestions.length ? 'block' : 'none';
+};
+
+window.hideAISuggestions = function() {
+    clearTimeout(window.aiSuggestTimer);
+    window.aiSuggestSequence++;
+    window.showAISuggestions([]);
+};
+
+window.escapeAIHtml = function(text) {
+    const div = document.createElement('div');
+    div.textContent = text || '';
+    return div.innerHTML;
+};
+
+// Initialisation : bienvenue, actions rapides et jeton de session en un appel
+window.bootstrapAIChat = function() {
+    if (typeof odoo !== 'undefined' && odoo.session && odoo.session.rpc) {
+        odoo.session.rpc('/ai_chat/bootstrap', 'call', {})
+            .then(function(result) {
+                if (result.success) {
+                    window.aiSessionToken = result.session_token;
+                    window.aiAnswerCache.setVersion(result.kb_version);
+
+                    // Mettre à jour le message de bienvenue
+                    const welcomeElement = document.getElementById('aiWelcomeMessage');
+                    if (welcomeElement && result.welcome_message) {
+                        welcomeElement.innerHTML = result.welcome_message;
+                    }
+
+                    if (result.quick_actions && result.quick_actions.length > 0) {
+                        window.showQuickActions(result.quick_actions);
+                    }
+                }
+            })
+            .catch(function(error) {
+                // Sans jeton, le serveur créera la session au premier message
+                console.error('Erreur initialisation chat:', error);
+            });
+    }
+};
+
+// Fonction pour les actions rapides
+window.executeQuickAction = function(actionType) {
+    if (typeof odoo !== 'undefined' && odoo.session && odoo.session.rpc) {
+        odoo.session.rpc('/ai_chat/quick_action', 'call', {
+            action: actionType,
+            language: window.aiDetectedLanguage
+        }).then(function(result) {
+            if (result.success) {
+                window.addAIMessage(result.response, 'bot');
+            } else {
+                window.addAIMessage(result.rate_limited ? result.error : 'Action non disponible actuellement.', 'bot');
+            }
+        }).catch(function(error) {
+            console.error('Erreur action rapide:', error);
+            window.addAIMessage('Erreur lors de l\'exécution de l\'action.', 'bot');
+        });
+    } else {
+        // Fallback statique
+        const responses = {
+            'marketing_overview': window.getStaticAIResponse('overview'),
+            'view_campaigns': window.getStaticAIResponse('performance')
+        };
+        const response = responses[actionType] || 'Action non reconnue.';
+        window.addAIMessage(response, 'bot');
+    }
+};
+
+// Fonction pour afficher les actions rapides
+window.showQuickActions = function(actions) {
+    const messagesContainer = document.getElementById('aiChatMessages');
+    if (!messagesContainer || !actions.length) return;
+
+    const actionsDiv = document.createElement('div');
+    actionsDiv.className = 'ai-quick-actions-inline';
+    actionsDiv.style.cssText = 'display: flex; flex-wrap: wrap; gap: 8px; margin: 10px 0; padding: 12px; background: #f8f9fa; border-radius: 12px; border: 1px solid #e9ecef;';
+
+    actions.forEach(function(action) {
+        const actionBtn = document.createElement('button');
+        actionBtn.textContent = action.text;
+        actionBtn.onclick = function() {
+            window.executeQuickAction(action.action);
+            actionsDiv.remove();
+        };
+        actionBtn.style.cssText = 'background: linear-gradient(45deg, #714B67, #875A7B); color: white; border: none; padding: 8px 12px; border-radius: 16px; font-size: 12px; cursor: pointer; transition: all 0.2s ease;';
+        actionBtn.onmouseover = function() { this.style.transform = 'scale(1.05)'; };
+        actionBtn.onmouseout = function() { this.style.transform = 'scale(1)'; };
+
+        actionsDiv.appendChild(actionBtn);
+    });
+
+    messagesContainer.appendChild(actionsDiv);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+};
+
+window.showAITyping = function() {
+    const messagesContainer = document.getElementById('aiChatMessages');
+    if (!messagesContainer) return;
+
+    const typingMessages = {
+        'ar': 'مساعد الذكاء الاصطناعي يكتب...',
+        'fr': 'Assistant IA tape...',
+        'en': 'AI Assistant typing...'
+    };
+
+    const typingDiv = document.createElement('div');
+    typingDiv.className = 'ai-message bot';
+    typingDiv.id = 'ai-typing-indicator';
+
+    const bubble = document.createElement('div');
+    bubble.className = 'ai-typing';
+    bubble.innerHTML = typingMessages[window.aiDetectedLanguage] || typingMessages['en'];
+
+    typingDiv.appendChild(bubble);
+    messagesContainer.appendChild(typingDiv);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+};
+
+window.hideAITyping = function() {
+    const typing = document.getElementById('ai-typing-indicator');
+    if (typing) {
+        typing.remove();
+    }
+};
+
+// Auto-resize textarea (champ créé par renderAIChatWindow)
+window.initAIChatInput = function() {
+    const textarea = document.getElementById('aiChatInput');
+    if (textarea) {
+        function autoResize() {
+            textarea.style.height = 'auto';
+
+            const scrollHeight = textarea.scrollHeight;
+            const maxHeight = 120;
+            const minHeight = 20;
+
+            if (scrollHeight > maxHeight) {
+                textarea.style.height = maxHeight + 'px';
+                textarea.style.overflowY = 'auto';
+            } else if (scrollHeight < minHeight) {
+                textarea.style.height = minHeight + 'px';
+                textarea.style.overflowY = 'hidden';
+            } else {
+                textarea.style.height = scrollHeight + 'px';
+                textarea.style.overflowY = 'hidden';
+            }
+        }
+
+        textarea.addEventListener('input', autoResize);
+        textarea.addEventListener('input', function() {
+            window.requestAISuggestions(textarea.value);
+        });
+        textarea.addEventListener('keydown', function(event) {
+            if (event.key === 'Escape') {
+                window.hideAISuggestions();
+            }
+        });
+        autoResize();
+
+        textarea.addEventListener('keydown', function(event) {
+            if (event.key === 'Enter' && !event.shiftKey) {
+                event.preventDefault();
+                window.sendAIMessage();
+            }
+        });
+
+        textarea.addEventListener('keyup', function() {
+            setTimeout(autoResize, 0);
+        });
+    }
+};
+
+// Fenêtre de chat : insérée dans le conteneur du stub, à côté de la bulle
+window.renderAIChatWindow = function() {
+    const container = document.getElementById('ai-chatbot-widget');
+    if (!container || document.getElementById('aiChatWindow')) {
+        return;
+    }
+    container.insertAdjacentHTML('beforeend', `
+        <div class="ai-chat-window" id="aiChatWindow">
+            <div class="ai-chat-header">
+                <div class="ai-header-content">
+                    <div class="ai-avatar-container">
+                        <img src="/ai_chat_assistant/static/src/img/user_avatar.svg" alt="AI Assistant" />
+                    </div>
+                    <div class="ai-header-text">
+                        <h4>AI Assistant</h4>
+                        <span class="ai-status">En ligne</span>
+                    </div>
+                </div>
+                <div class="ai-header-actions">
+                    <button class="ai-minimize-btn" onclick="window.closeAIChatbot()" title="Minimize">−</button>
+                </div>
+            </div>
+
+            <div class="ai-chat-messages" id="aiChatMessages">
+                <div class="ai-message-container bot">
+                    <div class="ai-message-info">
+                        <div class="ai-message-name">AI Assistant</div>
+                        <div class="ai-message-avatar">
+                            <img src="/ai_chat_assistant/static/src/img/user_avatar.svg" alt="AI Assistant" />
+                        </div>
+                    </div>
+                    <div class="ai-message bot">
+                        <div class="ai-message-bubble" id="aiWelcomeMessage">
+                            Hello! I am AI Assistant. How can I help you?
+                        </div>
+                    </div>
+                </div>
+            </div>
+
+            <div class="ai-chat-suggestions" id="aiChatSuggestions"></div>
+
+            <div class="ai-chat-input-container">
+                <textarea 
+                    class="ai-chat-input" 
+                    id="aiChatInput" 
+                    placeholder="Type your message..."
+                    onkeypress="window.handleAIKeyPress(event)"
+                    rows="1"></textarea>
+                <button class="ai-chat-send" onclick="window.sendAIMessage()"></button>
+            </div>
+        </div>
+    `);
+    window.initAIChatInput();
+};
+
+window.renderAIChatWindow();
+console.log('AI Chat Assistant Loaded Successfully!');
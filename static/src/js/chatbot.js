@@ -7,6 +7,63 @@ odoo.define('ai_chat_assistant.chat_widget', function (require) {
 
     var _t = core._t;
 
+    // Cache local des réponses fixes, par message normalisé et langue, invalidé
+    // quand la version de la base de connaissances renvoyée par le serveur change
+    var ANSWER_CACHE_KEY = 'aiChatAnswerCache';
+    var ANSWER_CACHE_MAX = 200;
+
+    // Nouveaux essais d'envoi après une erreur réseau (délais en ms)
+    var RETRY_MAX_ATTEMPTS = 4;
+    var RETRY_BASE_DELAY = 500;
+    var RETRY_MAX_DELAY = 8000;
+
+    var answerCache = {
+        _load: function () {
+            try {
+                return JSON.parse(window.localStorage.getItem(ANSWER_CACHE_KEY)) || {};
+            } catch (e) {
+                return {};
+            }
+        },
+        _save: function (data) {
+            try {
+                window.localStorage.setItem(ANSWER_CACHE_KEY, JSON.stringify(data));
+            } catch (e) {
+                // Stockage plein ou indisponible (navigation privée) : pas de cache
+            }
+        },
+        key: function (message, language) {
+            var normalized = message.toLowerCase().replace(/[\s?!.،؟]+/g, ' ').trim();
+            return (language || '') + '|' + normalized;
+        },
+        get: function (message, language) {
+            var data = this._load();
+            return data.version ? (data.entries || {})[this.key(message, language)] : undefined;
+        },
+        setVersion: function (version) {
+            var data = this._load();
+            if (version && data.version !== version) {
+                this._save({version: version, entries: {}});
+            }
+        },
+        put: function (message, language, result) {
+            if (!result.cacheable || !result.kb_version) {
+                return;
+            }
+            this.setVersion(result.kb_version);
+            var data = this._load();
+            var keys = Object.keys(data.entries);
+            if (keys.length >= ANSWER_CACHE_MAX) {
+                delete data.entries[keys[0]];
+            }
+            data.entries[this.key(message, language)] = {
+                answer: result.answer || result.response,
+                quick_actions: result.quick_actions || []
+            };
+            this._save(data);
+        }
+    };
+
     var AIChatWidget = Widget.extend({
         template: 'ai_chat_assistant.chat_widget',
         
@@ -19,6 +76,7 @@ odoo.define('ai_chat_assistant.chat_widget', function (require) {
         init: function (parent, options) {
             this._super.apply(this, arguments);
             this.session_id = options.session_id || false;
+            this.session_token = false;
             this.language = options.language || 'fr';
         },
 
@@ -29,21 +87,29 @@ odoo.define('ai_chat_assistant.chat_widget', function (require) {
         },
 
         _initializeChat: function () {
-            // Créer une nouvelle session si nécessaire
+            // Un seul appel : bienvenue, actions rapides et jeton (pas de session créée)
             if (!this.session_id) {
-                this._createNewSession();
+                this._bootstrap();
+            } else {
+                this._addWelcomeMessage();
             }
-            
-            // Message de bienvenue
-            this._addWelcomeMessage();
         },
 
-        _createNewSession: function () {
+        _bootstrap: function () {
             var self = this;
-            ajax.rpc('/ai_chat/create_session', {
-                session_type: 'marketing'
-            }).then(function (result) {
-                self.session_id = result.session_id;
+            ajax.rpc('/ai_chat/bootstrap', {}).then(function (result) {
+                if (!result.success) {
+                    self._addWelcomeMessage();
+                    return;
+                }
+                self.session_token = result.session_token;
+                answerCache.setVersion(result.kb_version);
+                self._addMessageToChat(result.welcome_message, 'bot');
+                if (result.quick_actions && result.quick_actions.length > 0) {
+                    self._addQuickActions(result.quick_actions);
+                }
+            }).catch(function () {
+                self._addWelcomeMessage();
             });
         },
 
@@ -89,29 +155,51 @@ odoo.define('ai_chat_assistant.chat_widget', function (require) {
             // Ajouter le message utilisateur
             this._addMessageToChat(userMessage, 'user');
             
+            // Question déjà posée depuis la dernière version de la base : réponse immédiate
+            var cached = answerCache.get(userMessage, this.language);
+            if (cached) {
+                this._addMessageToChat(cached.answer, 'bot');
+                if (cached.quick_actions.length > 0) {
+                    this._addQuickActions(cached.quick_actions);
+                }
+                return;
+            }
+            
             // Afficher l'indicateur de frappe
             this._showTypingIndicator();
             
-            // Envoyer au serveur (langue détectée automatiquement)
-            ajax.rpc('/ai_chat/get_response', {
+            // Envoyer au serveur (langue détectée automatiquement) : /ai_chat/process crée la
+            // session au premier message à partir du jeton, puis la retrouve par son id. Le même
+            // identifiant est renvoyé à chaque nouvel essai pour que le serveur ne traite le message qu'une fois
+            this._requestAIResponse({
                 'message': userMessage,
-                'session_id': this.session_id
+                'session_id': this.session_id,
+                'session_token': this.session_token,
+                'client_request_id': this._newRequestId()
                 // Note: langue détectée automatiquement par le backend
-            }).then(function (result) {
+            }, 0).then(function (result) {
                 self._hideTypingIndicator();
+                if (result.session_id) {
+                    self.session_id = result.session_id;
+                }
+                if (result.kb_version) {
+                    answerCache.setVersion(result.kb_version);
+                }
                 
                 if (!result.success || result.error) {
-                    self._addMessageToChat(result.answer || result.response || 'Erreur de connexion', 'bot');
+                    self._addMessageToChat(result.answer || result.response || result.error || 'Erreur de connexion', 'bot');
                 } else {
-                    // L'endpoint retourne 'answer' pas 'response'
+                    // /ai_chat/process retourne 'response' (anciennes réponses en cache : 'answer')
                     self._addMessageToChat(result.answer || result.response, 'bot');
+                    answerCache.put(userMessage, self.language, result);
                     
                     // Log pour debug
                     console.log('🤖 Réponse reçue:', {
                         success: result.success,
                         language: result.language,
                         source: result.source,
-                        confidence: result.confidence
+                        confidence: result.confidence,
+                        replayed: result.replayed
                     });
                     
                     // Ajouter les actions rapides si disponibles
@@ -122,30 +210,47 @@ odoo.define('ai_chat_assistant.chat_widget', function (require) {
             }).catch(function (error) {
                 self._hideTypingIndicator();
                 console.error('🚨 Erreur connexion serveur:', error);
-                
-                // Réessayer une fois avant le fallback
-                console.log('🔄 Tentative de reconnexion à la base de données...');
-                
-                setTimeout(function() {
-                    ajax.rpc('/ai_chat/get_response', {
-                        'message': userMessage,
-                        'session_id': self.session_id
-                        // Note: langue détectée automatiquement par le backend
-                    }).then(function (retryResult) {
-                        if (retryResult && retryResult.success && !retryResult.error) {
-                            console.log('✅ Reconnexion réussie - réponse de la base de données');
-                            self._addMessageToChat(retryResult.answer || retryResult.response, 'bot');
-                        } else {
-                            console.log('⚠️ Reconnexion échouée - utilisation fallback temporaire');
-                            const fallbackResponse = self._getDatabaseConnectionError(userMessage, self.language);
-                            self._addMessageToChat(fallbackResponse, 'bot');
-                        }
-                    }).catch(function() {
-                        console.log('❌ Reconnexion impossible - fallback temporaire');
-                        const fallbackResponse = self._getDatabaseConnectionError(userMessage, self.language);
-                        self._addMessageToChat(fallbackResponse, 'bot');
-                    });
-                }, 1000); // Attendre 1 seconde avant de réessayer
+                console.log('❌ Reconnexion impossible - fallback temporaire');
+                const fallbackResponse = self._getDatabaseConnectionError(userMessage, self.language);
+                self._addMessageToChat(fallbackResponse, 'bot');
+            });
+        },
+
+        _newRequestId: function () {
+            if (window.crypto && window.crypto.randomUUID) {
+                return window.crypto.randomUUID();
+            }
+            return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+        },
+
+        _retryDelay: function (attempt, retryAfter) {
+            // Backoff exponentiel, gigue sur la moitié du délai pour étaler les renvois des clients
+            var delay = Math.min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * Math.pow(2, attempt));
+            delay = delay / 2 + Math.random() * delay / 2;
+            return Math.max(delay, (retryAfter || 0) * 1000);
+        },
+
+        _requestAIResponse: function (params, attempt) {
+            var self = this;
+            var retry = function (retryAfter) {
+                console.log('🔄 Nouvel essai ' + (attempt + 1) + '/' + (RETRY_MAX_ATTEMPTS - 1));
+                return new Promise(function (resolve) {
+                    setTimeout(resolve, self._retryDelay(attempt, retryAfter));
+                }).then(function () {
+                    return self._requestAIResponse(params, attempt + 1);
+                });
+            };
+            return ajax.rpc('/ai_chat/process', params).then(function (result) {
+                // Premier envoi encore en cours côté serveur : attendre sa réponse
+                if (result.in_progress && attempt + 1 < RETRY_MAX_ATTEMPTS) {
+                    return retry(result.retry_after);
+                }
+                return result;
+            }, function (error) {
+                if (attempt + 1 >= RETRY_MAX_ATTEMPTS) {
+                    throw error;
+                }
+                return retry(0);
             });
         },
 
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+from . import activity_buffer
+from . import admission
+from . import answer_template
+from . import base64_stream
+from . import history_cursor
+from . import metrics
+from . import minhash
+from . import prefix_index
+from . import timing
+from . import ttl_cache
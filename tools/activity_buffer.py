@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Tampon par worker des dernières activités de session
+
+Au lieu d'un UPDATE par message, la dernière activité de chaque session est
+gardée en mémoire et écrite en lot, au plus une fois par intervalle et par base.
+"""
+import threading
+import time
+
+
+class ActivityBuffer(object):
+
+    def __init__(self):
+        self._pending = {}
+        self._last_flush = {}
+        self._lock = threading.Lock()
+
+    def touch(self, dbname, session_id, when, interval):
+        """Enregistrer une activité ; retourne True si le lot de la base doit être écrit"""
+        now = time.monotonic()
+        with self._lock:
+            pending = self._pending.setdefault(dbname, {})
+            previous = pending.get(session_id)
+            if previous is None or previous < when:
+                pending[session_id] = when
+            last_flush = self._last_flush.setdefault(dbname, now)
+            return now - last_flush >= interval
+
+    def drain(self, dbname):
+        """Retirer et retourner les activités en attente de la base {session_id: datetime}"""
+        with self._lock:
+            self._last_flush[dbname] = time.monotonic()
+            return self._pending.pop(dbname, {})
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Contrôle d'admission des routes de chat : seaux à jetons et requêtes en cours
+
+Utilisable sans Odoo. L'état est propre au worker : le seau « global » limite
+le débit de chat d'un worker (limite effective = débit × nombre de workers) et
+le compteur de requêtes en cours laisse des threads libres pour le reste de
+l'ERP. Un refus est immédiat et indique après combien de secondes réessayer.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket(object):
+    """Seau de `capacity` jetons rechargé de `rate` jetons par seconde"""
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, capacity, now):
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def refill(self, rate, capacity, now):
+        self.tokens = min(float(capacity), self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        return self.tokens
+
+    @staticmethod
+    def wait_time(tokens, rate):
+        """Secondes avant qu'un jeton soit disponible"""
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / rate if rate > 0 else float('inf')
+
+
+class AdmissionController(object):
+
+    def __init__(self, max_buckets=10000):
+        self.max_buckets = max_buckets
+        self.inflight = 0
+        self.rejected = 0
+        # Ordre d'utilisation : le moins récemment utilisé en tête
+        self._user_buckets = OrderedDict()
+        self._global_buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, scope, user_key, user_rate, user_burst, global_rate, global_burst,
+                max_inflight, now=None):
+        """Admettre une requête ; retourne (admise, secondes avant de réessayer)
+
+        Les jetons ne sont consommés que si la requête est admise. Toute requête
+        admise doit être suivie d'un appel à release().
+
+        :param scope: portée du seau global (nom de la base)
+        :param user_key: clé du seau de l'utilisateur, ex. (base, uid)
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if max_inflight and self.inflight >= max_inflight:
+                self.rejected += 1
+                return False, 1.0
+
+            user_bucket = self._bucket(self._user_buckets, user_key, user_burst, now)
+            global_bucket = self._bucket(self._global_buckets, scope, global_burst, now)
+            retry_after = max(
+                TokenBucket.wait_time(user_bucket.refill(user_rate, user_burst, now), user_rate),
+                TokenBucket.wait_time(global_bucket.refill(global_rate, global_burst, now), global_rate),
+            )
+            if retry_after > 0:
+                self.rejected += 1
+                return False, retry_after
+
+            user_bucket.tokens -= 1
+            global_bucket.tokens -= 1
+            self.inflight += 1
+            return True, 0.0
+
+    def release(self):
+        with self._lock:
+            self.inflight = max(0, self.inflight - 1)
+
+    def stats(self):
+        with self._lock:
+            return {'inflight': self.inflight, 'rejected': self.rejected, 'users': len(self._user_buckets)}
+
+    def _bucket(self, buckets, key, capacity, now):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            buckets.move_to_end(key)
+            return bucket
+        if len(buckets) >= self.max_buckets:
+            # Oublier les seaux les moins récemment utilisés : un seau recréé est plein,
+            # ce qui ne relâche que des utilisateurs inactifs depuis longtemps
+            for _i in range(len(buckets) // 2 or 1):
+                buckets.popitem(last=False)
+        bucket = buckets[key] = TokenBucket(capacity, now)
+        return bucket
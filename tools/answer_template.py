@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Pré-compilation des réponses de la base de connaissances utilisant des insights
+
+Une réponse est un « template » seulement si toutes ses accolades référencent
+des champs d'insights connus (ex. {total_sent:,}). Les accolades de CSS ou de
+code dans les réponses HTML ne déclenchent donc plus le calcul des insights.
+"""
+import functools
+import string
+
+_formatter = string.Formatter()
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_answer_template(template, allowed_fields):
+    """Champs d'insights référencés par la réponse, ou None si ce n'est pas un template
+
+    :param str template: texte de la réponse
+    :param frozenset allowed_fields: noms des champs d'insights disponibles
+    :return: frozenset des champs utilisés (vide si aucune accolade), ou None
+    """
+    if not template or '{' not in template:
+        return frozenset()
+    try:
+        parsed = list(_formatter.parse(template))
+    except ValueError:
+        return None
+
+    used = set()
+    for _literal, field_name, _spec, _conversion in parsed:
+        if field_name is None:
+            continue
+        root = field_name.split('.', 1)[0].split('[', 1)[0]
+        if root not in allowed_fields:
+            return None
+        used.add(root)
+    return frozenset(used)
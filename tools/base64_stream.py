@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Lecture d'un contenu base64 décodé au fil de l'eau
+
+Utilisable sans Odoo. Un champ Binary arrive encodé en base64 : le décoder
+d'un bloc en ferait une seconde copie complète en mémoire. Base64Reader ne
+décode que le morceau en cours de lecture.
+"""
+import base64
+import io
+
+# Caractères base64 lus par morceau (multiple de 4)
+CHUNK_SIZE = 1 << 20
+_WHITESPACE = b' \t\r\n'
+
+
+class Base64Reader(io.RawIOBase):
+
+    def __init__(self, data, chunk_size=CHUNK_SIZE):
+        """:param data: contenu base64 (bytes ou str)"""
+        self._data = data.encode('ascii') if isinstance(data, str) else data
+        self._chunk_size = max(chunk_size - chunk_size % 4, 4)
+        self._position = 0
+        self._carry = b''
+        self._buffer = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer and (self._position < len(self._data) or self._carry):
+            chunk = self._data[self._position:self._position + self._chunk_size]
+            self._position += len(chunk)
+            encoded = self._carry + bytes(chunk).translate(None, _WHITESPACE)
+            # Garder la fin incomplète (moins de 4 caractères) pour le morceau suivant
+            cut = len(encoded) if self._position >= len(self._data) else len(encoded) - len(encoded) % 4
+            encoded, self._carry = encoded[:cut], encoded[cut:]
+            self._buffer = memoryview(base64.b64decode(encoded))
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def open_base64(data, chunk_size=CHUNK_SIZE):
+    """Flux binaire bufferisé (utilisable par io.TextIOWrapper) sur un contenu base64"""
+    return io.BufferedReader(Base64Reader(data, chunk_size))
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""Curseur de pagination par clé (timestamp, id) de l'historique du chat
+
+Utilisable sans Odoo. Les messages sont enregistrés avec leurs microsecondes :
+le curseur les conserve (ISO 8601 complet). Tronqué à la seconde, il serait
+antérieur au dernier message reçu et la page suivante sauterait les messages
+plus anciens de la même seconde.
+"""
+from datetime import datetime
+
+
+def encode_cursor(timestamp, record_id):
+    """Curseur JSON de la page suivante, à partir du dernier message de la page"""
+    return {'before_timestamp': timestamp.isoformat(sep=' '), 'before_id': record_id}
+
+
+def decode_cursor(before_timestamp, before_id):
+    """(timestamp, id) ; accepte aussi les anciens curseurs sans microsecondes. ValueError si invalide"""
+    return datetime.fromisoformat(str(before_timestamp)), int(before_id)
+
+
+def is_before(timestamp, record_id, cursor):
+    """Même condition que le domaine de la page : (timestamp, id) strictement avant le curseur"""
+    return (timestamp, record_id) < cursor
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""Compteurs de métriques par worker, fusionnés au format texte Prometheus
+
+Utilisable sans Odoo. Chaque worker incrémente ses compteurs en mémoire (un
+verrou, pas d'E/S) et les écrit périodiquement dans un fichier JSON qui lui est
+propre ; la route de métriques fusionne les fichiers de tous les workers. Les
+fichiers des workers terminés (même hôte) sont cumulés dans `retired.json` pour
+que les compteurs ne diminuent pas au recyclage des workers.
+"""
+import bisect
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+
+# Bornes (secondes) des histogrammes de latence
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+RETIRED_FILE = 'retired.json'
+
+
+def _freeze(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class MetricsRegistry(object):
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._last_dump = time.monotonic()
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _freeze(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_counter(self, name, labels, value):
+        """Reporter un compteur cumulé ailleurs (ex. statistiques d'un TTLCache)"""
+        with self._lock:
+            self._counters[(name, _freeze(labels))] = value
+
+    def observe(self, name, value, labels=None):
+        key = (name, _freeze(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            histogram['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            histogram['sum'] += value
+
+    def due(self, interval):
+        """Vrai au plus une fois par intervalle : moment d'écrire le fichier du worker"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_dump < interval:
+                return False
+            self._last_dump = now
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, dict(labels), list(h['counts']), h['sum']]
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+
+def merge_snapshots(snapshots):
+    """Additionner compteurs et histogrammes de plusieurs workers"""
+    counters, histograms, buckets = {}, {}, None
+    for snapshot in snapshots:
+        if not snapshot:
+            continue
+        if buckets is None:
+            buckets = snapshot.get('buckets')
+        for name, labels, value in snapshot.get('counters', []):
+            key = (name, _freeze(labels))
+            counters[key] = counters.get(key, 0) + value
+        if snapshot.get('buckets') != buckets:
+            continue
+        for name, labels, counts, total in snapshot.get('histograms', []):
+            key = (name, _freeze(labels))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = [list(counts), total]
+            else:
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+    return {
+        'buckets': buckets or list(LATENCY_BUCKETS),
+        'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, dict(labels), counts, total] for (name, labels), (counts, total) in histograms.items()],
+    }
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_prometheus(snapshot, gauges=(), descriptions=None):
+    """Texte d'exposition Prometheus (format 0.0.4)
+
+    :param gauges: [(nom, labels, valeur)] calculées au moment de la collecte
+    :param descriptions: {nom: texte HELP}
+    """
+    descriptions = descriptions or {}
+    families = {}
+    for name, labels, value in snapshot.get('counters', []):
+        families.setdefault((name, 'counter'), []).append(f'{name}{_format_labels(labels)} {value}')
+    for name, labels, value in gauges:
+        families.setdefault((name, 'gauge'), []).append(f'{name}{_format_labels(labels)} {value}')
+    bounds = [str(bound) for bound in snapshot.get('buckets', [])] + ['+Inf']
+    for name, labels, counts, total in snapshot.get('histograms', []):
+        lines = families.setdefault((name, 'histogram'), [])
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(dict(labels, le=bound))} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+        lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    output = []
+    for (name, kind), lines in sorted(families.items()):
+        if name in descriptions:
+            output.append(f'# HELP {name} {descriptions[name]}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(sorted(lines))
+    return '\n'.join(output) + '\n'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsFileStore(object):
+    """Répertoire des fichiers `<hôte>-<pid>.json` des workers d'une base"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.prefix = f'{socket.gethostname()}-'
+
+    def dump(self, snapshot):
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(f'{self.prefix}{os.getpid()}.json', snapshot)
+
+    def collect(self):
+        """Instantanés de tous les workers, après avoir cumulé ceux des workers terminés"""
+        if not os.path.isdir(self.directory):
+            return []
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired = self._load(RETIRED_FILE)
+            snapshots, dead = [], []
+            for filename in os.listdir(self.directory):
+                if not filename.endswith('.json') or filename == RETIRED_FILE:
+                    continue
+                snapshot = self._load(filename)
+                pid = filename[len(self.prefix):-len('.json')]
+                if filename.startswith(self.prefix) and pid.isdigit() and not _pid_alive(int(pid)):
+                    dead.append((filename, snapshot))
+                else:
+                    snapshots.append(snapshot)
+            if dead:
+                retired = merge_snapshots([retired] + [snapshot for _f, snapshot in dead])
+                self._write(RETIRED_FILE, retired)
+                for filename, _snapshot in dead:
+                    os.unlink(os.path.join(self.directory, filename))
+        return [retired] + snapshots
+
+    def _load(self, filename):
+        try:
+            with open(os.path.join(self.directory, filename)) as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, filename, snapshot):
+        """Écriture atomique : un lecteur ne voit jamais de fichier partiel"""
+        path = os.path.join(self.directory, filename)
+        with open(f'{path}.tmp', 'w') as handle:
+            json.dump(snapshot, handle)
+        os.replace(f'{path}.tmp', path)
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(dbname):
+    """Registre du worker courant pour une base"""
+    registry = _registries.get(dbname)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(dbname, MetricsRegistry())
+    return registry
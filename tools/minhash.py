@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Détection de quasi-doublons par MinHash + LSH (bandes)
+
+Utilisable sans Odoo (numpy uniquement). Chaque texte est réduit à une
+signature MinHash de ses shingles (n-grammes de caractères du texte normalisé) ;
+les signatures sont découpées en bandes et seuls les textes partageant une
+bande entière deviennent candidats. La similarité de Jaccard estimée des
+candidats est ensuite vérifiée, et les paires retenues sont regroupées par
+union-find : le coût reste proche du linéaire, sans comparer toutes les paires.
+"""
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+# Nombre premier de Mersenne 2^31 - 1 : (a * x + b) tient dans un entier 64 bits
+MERSENNE_PRIME = (1 << 31) - 1
+NUM_PERM = 128
+# 16 bandes de 8 lignes : seuil de collision des candidats ≈ (1/16)^(1/8) ≈ 0.71
+BANDS = 16
+SHINGLE_SIZE = 5
+# Au-delà, un compartiment n'est comparé qu'à son premier élément (doublons exacts en masse)
+MAX_BUCKET_PAIRS = 50
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """Minuscules, sans balises HTML, accents, diacritiques ni ponctuation"""
+    text = unicodedata.normalize('NFKD', _TAG_RE.sub(' ', text or '').lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_WORD_RE.findall(text))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Empreintes (crc32) des n-grammes de caractères du texte normalisé"""
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))} if text else set()
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+class MinHasher(object):
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = generator.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.uint64)[:, None]
+        self._b = generator.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.uint64)[:, None]
+
+    def signature(self, hashes):
+        """Signature MinHash (num_perm entiers) d'un ensemble d'empreintes"""
+        if not hashes:
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes)) % MERSENNE_PRIME
+        return ((self._a * values[None, :] + self._b) % MERSENNE_PRIME).min(axis=1)
+
+
+def estimated_similarity(signature_a, signature_b):
+    """Jaccard estimé : part des permutations dont le minimum coïncide"""
+    return float(np.mean(signature_a == signature_b))
+
+
+class UnionFind(object):
+
+    def __init__(self):
+        self._parent = {}
+
+    def find(self, item):
+        root = self._parent.setdefault(item, item)
+        while self._parent[root] != root:
+            root = self._parent[root]
+        # Compression du chemin, sans récursion
+        while item != root:
+            self._parent[item], item = root, self._parent[item]
+        return root
+
+    def union(self, item_a, item_b):
+        root_a, root_b = self.find(item_a), self.find(item_b)
+        if root_a != root_b:
+            self._parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def groups(self):
+        groups = {}
+        for item in self._parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    """Paires (i, j) dont au moins une bande de signature est identique"""
+    rows = signatures.shape[1] // bands
+    seen = set()
+    for band in range(bands):
+        buckets = {}
+        for index, row in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(row.tobytes(), []).append(index)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) <= MAX_BUCKET_PAIRS:
+                pairs = ((a, b) for position, a in enumerate(members) for b in members[position + 1:])
+            else:
+                pairs = ((members[0], b) for b in members[1:])
+            for pair in pairs:
+                if pair not in seen:
+                    seen.add(pair)
+                    yield pair
+
+
+def find_clusters(texts, threshold=0.8, num_perm=NUM_PERM, bands=BANDS, shingle_size=SHINGLE_SIZE):
+    """Groupes de quasi-doublons
+
+    :param texts: {clé: texte}
+    :return: [(clés triées, similarité estimée minimale des paires retenues)],
+             groupes les plus grands d'abord
+    """
+    # Les textes vides auraient tous la même signature : ils sont écartés
+    shingled = {key: shingles(text, shingle_size) for key, text in texts.items()}
+    keys = [key for key, hashes in shingled.items() if hashes]
+    if len(keys) < 2:
+        return []
+    hasher = MinHasher(num_perm)
+    signatures = np.vstack([hasher.signature(shingled[key]) for key in keys])
+
+    clusters = UnionFind()
+    similarities = {}
+    for i, j in candidate_pairs(signatures, bands):
+        similarity = estimated_similarity(signatures[i], signatures[j])
+        if similarity >= threshold:
+            clusters.union(i, j)
+            similarities[(i, j)] = similarity
+
+    minimum = {}
+    for (i, _j), similarity in similarities.items():
+        root = clusters.find(i)
+        minimum[root] = min(minimum.get(root, 1.0), similarity)
+    result = [
+        (sorted(keys[index] for index in group), minimum[clusters.find(group[0])])
+        for group in clusters.groups()
+    ]
+    result.sort(key=lambda cluster: (-len(cluster[0]), cluster[0]))
+    return result
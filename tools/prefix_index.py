@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Index de préfixes pour l'autocomplétion des questions (tableau trié + bisect)
+
+Utilisable sans Odoo. Chaque texte est indexé à partir du début de ses
+premiers mots, pour que « taux d'ouv » trouve « Quel est mon taux
+d'ouverture ? ». Les préfixes courts (très fréquents à la frappe) ont leurs
+meilleurs résultats pré-calculés ; les autres sont une plage du tableau trié,
+trouvée par bisect, dont on garde les mieux classés.
+"""
+import bisect
+import heapq
+import re
+import unicodedata
+
+# Débuts de mots indexés par texte
+MAX_WORD_STARTS = 8
+# Préfixes pré-calculés jusqu'à cette longueur, avec leurs meilleurs résultats
+SHORT_PREFIX_LENGTH = 3
+SHORT_PREFIX_RESULTS = 20
+# Clés examinées au plus pour un préfixe long
+MAX_SCAN = 5000
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize_prefix(text):
+    """Minuscules, sans accents, diacritiques ni ponctuation"""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_WORD_RE.findall(text))
+
+
+class PrefixIndex(object):
+
+    def __init__(self, items, max_word_starts=MAX_WORD_STARTS):
+        """:param items: [(valeur retournée, texte, rang)] ; rang comparable, le plus grand d'abord"""
+        self._values = []
+        self._ranks = []
+        keys = []
+        for position, (value, text, rank) in enumerate(items):
+            self._values.append(value)
+            self._ranks.append(rank)
+            normalized = normalize_prefix(text)
+            for match in list(_WORD_RE.finditer(normalized))[:max_word_starts]:
+                keys.append((normalized[match.start():], position))
+        keys.sort()
+        self._keys = [key for key, _position in keys]
+        self._positions = [position for _key, position in keys]
+
+        short = {}
+        for key, position in keys:
+            for length in range(1, min(len(key), SHORT_PREFIX_LENGTH) + 1):
+                short.setdefault(key[:length], set()).add(position)
+        self._short = {
+            prefix: self._best(positions, SHORT_PREFIX_RESULTS)
+            for prefix, positions in short.items()
+        }
+
+    def __len__(self):
+        return len(self._values)
+
+    def _best(self, positions, limit):
+        return heapq.nlargest(limit, positions, key=lambda position: (self._ranks[position], -position))
+
+    def search(self, prefix, limit=8):
+        """Valeurs des textes dont un début de mot commence par prefix, les mieux classées d'abord"""
+        prefix = normalize_prefix(prefix)
+        if not prefix or limit <= 0:
+            return []
+        if len(prefix) <= SHORT_PREFIX_LENGTH:
+            positions = self._short.get(prefix, [])[:limit]
+        else:
+            start = bisect.bisect_left(self._keys, prefix)
+            end = bisect.bisect_left(self._keys, prefix + '\uffff', start, min(start + MAX_SCAN, len(self._keys)))
+            positions = self._best(set(self._positions[start:end]), limit)
+        return [self._values[position] for position in positions]
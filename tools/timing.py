@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Mesure légère des étapes d'un traitement : durée et nombre de requêtes SQL
+
+Utilisable sans Odoo : le curseur est optionnel et seul son compteur
+`sql_log_count` est lu, sans activer le journal SQL.
+"""
+import contextlib
+import time
+
+
+class StageTimer(object):
+
+    def __init__(self, cursor=None):
+        self.cursor = cursor
+        self.stages = []
+        self._started = time.perf_counter()
+        self._start_queries = self.query_count()
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        """Chronométrer le bloc ; l'étape est enregistrée même en cas d'exception"""
+        start = time.perf_counter()
+        queries = self.query_count()
+        try:
+            yield
+        finally:
+            self.stages.append((stage, (time.perf_counter() - start) * 1000, self.query_count() - queries))
+
+    def query_count(self):
+        return getattr(self.cursor, 'sql_log_count', 0) if self.cursor is not None else 0
+
+    def total_ms(self):
+        """Durée écoulée depuis la création du chronomètre"""
+        return (time.perf_counter() - self._started) * 1000
+
+    def total_queries(self):
+        """Requêtes SQL émises depuis la création du chronomètre"""
+        return self.query_count() - self._start_queries
+
+    def as_dict(self):
+        """Durées (ms) par étape, cumulées si une étape est répétée"""
+        durations = {}
+        for stage, duration_ms, _queries in self.stages:
+            durations[stage] = durations.get(stage, 0.0) + duration_ms
+        return durations
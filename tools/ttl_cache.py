@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Cache mémoire par worker avec expiration (TTL) et calcul unique (single-flight)
+
+Utilisable sans Odoo : les clés doivent inclure le nom de la base (et la société
+si besoin) pour ne pas mélanger les données de plusieurs bases servies par le
+même worker. Les valeurs sont partagées entre threads et doivent être traitées
+en lecture seule.
+"""
+import threading
+import time
+import weakref
+
+# Caches existants, pour exporter leurs statistiques (voir all_caches)
+_instances = weakref.WeakSet()
+
+
+def all_caches():
+    """Caches nommés du worker courant"""
+    return [cache for cache in list(_instances) if cache.name]
+
+
+class _Flight(object):
+    """Calcul en cours pour une clé, attendu par les requêtes concurrentes"""
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache(object):
+
+    def __init__(self, ttl, maxsize=1024, name=None, wait_timeout=30.0):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.name = name
+        self.wait_timeout = wait_timeout
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        _instances.add(self)
+
+    def get(self, key, default=None):
+        """Valeur en cache si elle n'a pas expiré"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """Retourner la valeur en cache ou la calculer une seule fois pour tous les appelants"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            # Un autre thread calcule déjà cette clé : attendre son résultat
+            if flight.event.wait(self.wait_timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            return compute()
+
+        try:
+            value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            flight.value = value
+            with self._lock:
+                self._store(key, value, ttl)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def invalidate(self, key=None):
+        """Supprimer une clé, ou tout le cache si aucune clé n'est donnée"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def invalidate_matching(self, predicate):
+        """Supprimer toutes les clés pour lesquelles predicate(key) est vrai"""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+    def _store(self, key, value, ttl):
+        now = time.monotonic()
+        self._data.pop(key, None)
+        self._data[key] = (now + (self.ttl if ttl is None else ttl), value)
+        if len(self._data) > self.maxsize:
+            for stale in [k for k, (expires, _v) in self._data.items() if expires <= now]:
+                del self._data[stale]
+            # Encore trop grand : retirer les entrées les plus anciennes
+            while len(self._data) > self.maxsize:
+                del self._data[next(iter(self._data))]